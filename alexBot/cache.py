@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, Iterator, Optional, Tuple, TypeVar
+
+_K = TypeVar("_K", bound=Hashable)
+_V = TypeVar("_V")
+
+
+class LRUCache(Generic[_K, _V]):
+    """
+    a least recently used cache bounded by total weight instead of entry count.
+    each entry carries a weight (usually an approximate size in bytes); when the total goes over
+    `max_weight` the least recently used entries are dropped until it fits again.
+    """
+
+    def __init__(self, max_weight: int, default_weight: int = 1):
+        self.max_weight = max_weight
+        self.default_weight = default_weight
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[_K, Tuple[_V, int]]" = OrderedDict()
+
+    def __contains__(self, key: _K) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def items(self) -> Iterator[Tuple[_K, _V]]:
+        """every entry, least recently used first, without touching their recency"""
+        for key, (value, _) in self._data.items():
+            yield key, value
+
+    def get(self, key: _K, default: Optional[_V] = None) -> Optional[_V]:
+        try:
+            value, _ = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: _K, value: _V, weight: Optional[int] = None):
+        """
+        insert or replace `key`. when `weight` is not given, the weight of the existing entry is kept,
+        or `default_weight` is used for a new one.
+        """
+        if weight is None:
+            weight = self._data[key][1] if key in self._data else self.default_weight
+        self.pop(key)
+        self._data[key] = (value, weight)
+        self.weight += weight
+        while self.weight > self.max_weight and len(self._data) > 1:
+            _, (_, old_weight) = self._data.popitem(last=False)
+            self.weight -= old_weight
+            self.evictions += 1
+
+    def reweigh(self, key: _K, weight: int):
+        """update the weight of an entry without touching its recency"""
+        if key in self._data:
+            value, old_weight = self._data[key]
+            self._data[key] = (value, weight)
+            self.weight += weight - old_weight
+
+    def pop(self, key: _K, default: Optional[_V] = None) -> Optional[_V]:
+        try:
+            value, weight = self._data.pop(key)
+        except KeyError:
+            return default
+        self.weight -= weight
+        return value
+
+    def clear(self):
+        self._data.clear()
+        self.weight = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._data),
+            "weight": self.weight,
+            "max_weight": self.max_weight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
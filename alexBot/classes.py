@@ -57,6 +57,26 @@ class RecurringReminder:
     message: str  # the message to send
     UTC_minute: int  # the minute of the day in UTC to remind at
     require_clearing: bool = False  # if the reminder requires interaction to clear
+    id: Optional[int] = None  # primary key, set once saved
+
+
+@dataclass
+class Highlight:
+    guildId: int
+    userId: int  # who to notify
+    keyword: str  # lowercase
+    id: Optional[int] = None  # primary key, set once saved
+
+
+@dataclass
+class VoiceRollup:
+    """one day of voice sessions in one channel, summed. see Data.log_voice_session."""
+
+    day: int  # days since the unix epoch, of the sessions' start
+    channelId: int  # 0 when unknown
+    seconds: float
+    sessions: int
+    longest: float
 
 
 @dataclass
@@ -70,6 +90,7 @@ class ReactionRoleConfig:
 class FeedConfig:
     tagId: Optional[int]
     feedUrl: str
+    id: Optional[int] = None  # primary key, set once saved
 
 
 @dataclass
@@ -161,6 +182,7 @@ class MovieSuggestion:
     watched: bool
     suggestor: int
     watchdate: str
+    id: Optional[int] = None  # primary key, set once saved
 
 
 class ButtonType(int, enum.Enum):
@@ -179,6 +201,7 @@ class ButtonRole:
     type: ButtonType
     label: Optional[str] = None
     emoji: Optional[str] = None
+    id: Optional[int] = None  # primary key, set once saved
 
 
 @dataclass
@@ -124,9 +124,9 @@ class autoRoles(Cog):
             )
         mid = self.roles[btntype][0].message
         br = ButtonRole(role=role.id, message=mid, type=btntype, label=name, emoji=str(emoji) if emoji else None)
+        await self.bot.db.add_role(br)
         self.roles[btntype].append(br)
         self.flat_roles.append(br)
-        await self.bot.db.save_roles_data(self.flat_roles)
         await self.cog_load()
         await (await self.bot.get_channel(791528974442299415).fetch_message(mid)).edit(view=self.views[btntype])
         await interaction.followup.send("added role")
@@ -143,7 +143,7 @@ class autoRoles(Cog):
         self.roles[btntype] = [r for r in self.roles[btntype] if r.role != role.role]
         self.flat_roles = [r for r in self.flat_roles if r.role != role.role]
 
-        await self.bot.db.save_roles_data(self.flat_roles)
+        await self.bot.db.delete_role(role.id)
         await self.cog_load()
         await (await self.bot.get_channel(791528974442299415).fetch_message(self.roles[btntype][0].message)).edit(
             view=self.views[btntype]
@@ -44,27 +44,25 @@ class Configs(Cog):
         if typekey == "guild":
             if not ctx.author.guild_permissions.manage_guild:
                 raise commands.errors.MissingPermissions([discord.Permissions(manage_guild=True)])
-            gd = await self.bot.db.get_guild_data(ctx.guild.id)
-            if isinstance(getattr(gd.config, key, list()), list):
-                raise commands.errors.BadArgument(f"cannot set that key {key}")
-            if (t := type(getattr(gd.config, key))) in typeMap:
-                value = typeMap[t](rawvalue)
-            else:
-                raise commands.errors.BadArgument(f"cannot set that key {key}")
-            setattr(gd.config, key, value)
-            await self.bot.db.save_guild_data(ctx.guild.id, gd)
+            async with self.bot.db.update_guild(ctx.guild.id) as gd:
+                if isinstance(getattr(gd.config, key, list()), list):
+                    raise commands.errors.BadArgument(f"cannot set that key {key}")
+                if (t := type(getattr(gd.config, key))) in typeMap:
+                    value = typeMap[t](rawvalue)
+                else:
+                    raise commands.errors.BadArgument(f"cannot set that key {key}")
+                setattr(gd.config, key, value)
             await ctx.send(f"successfully set {typekey}.{key} to {value}")
             return
         elif typekey == "user":
-            ud = await self.bot.db.get_user_data(ctx.author.id)
-            if isinstance(getattr(ud.config, key, list()), list):
-                raise commands.errors.BadArgument(f"cannot set that key {key}")
-            if (t := type(getattr(ud.config, key))) in typeMap:
-                value = typeMap[t](rawvalue)
-            else:
-                raise commands.errors.BadArgument(f"cannot set that key {key}")
-            setattr(ud.config, key, value)
-            await self.bot.db.save_user_data(ctx.author.id, ud)
+            async with self.bot.db.update_user(ctx.author.id) as ud:
+                if isinstance(getattr(ud.config, key, list()), list):
+                    raise commands.errors.BadArgument(f"cannot set that key {key}")
+                if (t := type(getattr(ud.config, key))) in typeMap:
+                    value = typeMap[t](rawvalue)
+                else:
+                    raise commands.errors.BadArgument(f"cannot set that key {key}")
+                setattr(ud.config, key, value)
             await ctx.send(f"successfully set {typekey}.{key} to {value}")
             return
         else:
@@ -86,9 +84,8 @@ class Configs(Cog):
             default = getattr(defaultGDC, key, None)
             if default is None:
                 raise commands.BadArgument(f"The key {key} is not a valid key on {typekey}")
-            currGD = await self.bot.db.get_guild_data(ctx.guild.id)
-            setattr(currGD.config, key, default)  # currGD.config.$KEY = default
-            await self.bot.db.save_guild_data(currGD)
+            async with self.bot.db.update_guild(ctx.guild.id) as currGD:
+                setattr(currGD.config, key, default)  # currGD.config.$KEY = default
             await ctx.send(f"set {typekey}.{key} to {default}, the default value.")
 
         elif typekey == "user":
@@ -96,9 +93,8 @@ class Configs(Cog):
             default = getattr(defaultUD.config, key, None)  # default = defaultUD.config.$KEY or None
             if default is None:
                 raise commands.BadArgument(f"The key {key} is not a valid key on {typekey}")
-            ud = await self.bot.db.get_user_data(ctx.author.id)
-            setattr(ud.config, key, default)  # ud.config.$KEY = defualt
-            await self.bot.db.save_user_data(ctx.author.id, ud)
+            async with self.bot.db.update_user(ctx.author.id) as ud:
+                setattr(ud.config, key, default)  # ud.config.$KEY = defualt
             await ctx.send(f"set {typekey}.{key} to {default}, the default value.")
         else:
             raise commands.errors.BadArgument(
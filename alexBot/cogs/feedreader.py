@@ -4,7 +4,6 @@ import re
 from time import mktime
 from typing import List, Optional
 
-import aiohttp
 import discord
 import feedparser
 from discord.ext import commands, tasks
@@ -35,45 +34,44 @@ class FeedReader(Cog):
         forumChannel: discord.ForumChannel = self.bot.get_channel(1054582714495414343)
         feeds = await self.bot.db.get_feeds()
         for feedData in feeds:
-            async with aiohttp.ClientSession() as session:
-                text = await get_text(session, feedData.feedUrl)
-                feed = feedparser.parse(text)
-                lastPostedStamp = await self.bot.db.get_feed_data(feedData.feedUrl)
-
-                if lastPostedStamp != mktime(feed.entries[0].published_parsed):
-                    if lastPostedStamp is None:  # handle new feeds
-                        try:
-                            lastPostedStamp = mktime(feed.entries[1].published_parsed)
-                        except IndexError:
-                            if len(feed.entries) == 0:
-                                await self.bot.db.save_feed_data(feedData.feedUrl, None)
-                            else:  # one entry?
-                                await forumChannel.create_thread(
-                                    name=f"{feed.feed.title}  -  {self.bot.clean_clean(feed.entries[0].title)}"[:100],
-                                    content=f"{entry.link}\n\n{self.bot.clean_clean(feed.entries[0].summary[:500])}",
-                                    applied_tags=[forumChannel.get_tag(feedData.tagId)]
-                                    if feedData.tagId is not None
-                                    else [],
-                                )
-                                await self.bot.db.save_feed_data(
-                                    feedData.feedUrl, int(mktime(feed.entries[0].published_parsed))
-                                )
-                    #  there's new posts!
-                    # ... how many?
-                    # loop over the entries until we find our last post!
-                    for entry in feed.entries:
-                        if int(mktime(entry.published_parsed)) <= lastPostedStamp:
-                            break
-                        else:
+            session = self.bot.http_clients['default']
+            # ttl 0: always check, but a feed that hasn't changed answers with a 304 and no body
+            text = await get_text(session, feedData.feedUrl, ttl=0)
+            feed = feedparser.parse(text)
+            lastPostedStamp = await self.bot.db.get_feed_data(feedData.feedUrl)
+
+            if lastPostedStamp != mktime(feed.entries[0].published_parsed):
+                if lastPostedStamp is None:  # handle new feeds
+                    try:
+                        lastPostedStamp = mktime(feed.entries[1].published_parsed)
+                    except IndexError:
+                        if len(feed.entries) == 0:
+                            await self.bot.db.save_feed_data(feedData.feedUrl, None)
+                        else:  # one entry?
                             await forumChannel.create_thread(
-                                name=f"{feed.feed.title}  -  {self.bot.clean_clean(entry.title)}"[:100],
+                                name=f"{feed.feed.title}  -  {self.bot.clean_clean(feed.entries[0].title)}"[:100],
                                 content=f"{entry.link}\n\n{self.bot.clean_clean(feed.entries[0].summary[:500])}",
-                                applied_tags=([forumChannel.get_tag(feedData.tagId)])
+                                applied_tags=[forumChannel.get_tag(feedData.tagId)]
                                 if feedData.tagId is not None
                                 else [],
                             )
-
-                    await self.bot.db.save_feed_data(feedData.feedUrl, int(mktime(feed.entries[0].published_parsed)))
+                            await self.bot.db.save_feed_data(
+                                feedData.feedUrl, int(mktime(feed.entries[0].published_parsed))
+                            )
+                #  there's new posts!
+                # ... how many?
+                # loop over the entries until we find our last post!
+                for entry in feed.entries:
+                    if int(mktime(entry.published_parsed)) <= lastPostedStamp:
+                        break
+                    else:
+                        await forumChannel.create_thread(
+                            name=f"{feed.feed.title}  -  {self.bot.clean_clean(entry.title)}"[:100],
+                            content=f"{entry.link}\n\n{self.bot.clean_clean(feed.entries[0].summary[:500])}",
+                            applied_tags=([forumChannel.get_tag(feedData.tagId)]) if feedData.tagId is not None else [],
+                        )
+
+                await self.bot.db.save_feed_data(feedData.feedUrl, int(mktime(feed.entries[0].published_parsed)))
 
     @feedGroup.command(name="nerdiowo-feed", description="Add a feed to the nerdiowo FeedChannel")
     async def nerdiowoFeed(self, interaction: discord.Interaction, feedurl: str, tag: Optional[int]):
@@ -86,23 +84,22 @@ class FeedReader(Cog):
         feeds = await self.bot.db.get_feeds()
         if 'youtube' in feedurl:
             # youtube channel, need to convert to rss
-            async with aiohttp.ClientSession() as session:
-                text = await get_text(session, feedurl)
-                channel_id = extractYoutubeId.finditer(text).__next__().group(1)
-                feedurl = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
+            session = self.bot.http_clients['default']
+            text = await get_text(session, feedurl)
+            channel_id = extractYoutubeId.finditer(text).__next__().group(1)
+            feedurl = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
 
         if feedurl in [feed.feedUrl for feed in feeds]:
             await interaction.response.send_message("Feed already added!", ephemeral=True)
             return
-        async with aiohttp.ClientSession() as session:
-            text = await get_text(session, feedurl)
-            try:
-                feed = feedparser.parse(text)
-            except Exception as e:
-                await interaction.response.send_message("Invalid feed!", ephemeral=True)
-                return
-        feeds.append(FeedConfig(tag if tag is not None else None, feedurl))
-        await self.bot.db.save_feeds(feeds)
+        session = self.bot.http_clients['default']
+        text = await get_text(session, feedurl)
+        try:
+            feed = feedparser.parse(text)
+        except Exception as e:
+            await interaction.response.send_message("Invalid feed!", ephemeral=True)
+            return
+        await self.bot.db.add_feed(FeedConfig(tag if tag is not None else None, feedurl))
         await interaction.response.send_message("Feed added!", ephemeral=True)
 
     @feedGroup.command(name="remove-feed", description="Remove a feed from the nerdiowo FeedChanel")
@@ -111,8 +108,9 @@ class FeedReader(Cog):
         if feedurl not in [feed.feedUrl for feed in feeds]:
             await interaction.response.send_message("Feed not found!", ephemeral=True)
             return
-        feeds = [feed for feed in feeds if feed.feedUrl != feedurl]
-        await self.bot.db.save_feeds(feeds)
+        for feed in feeds:
+            if feed.feedUrl == feedurl:
+                await self.bot.db.delete_feed(feed.id)
         await interaction.response.send_message("Feed removed!", ephemeral=True)
 
     @removeFeed.autocomplete('feedurl')
@@ -5,19 +5,20 @@ import re
 import time
 from typing import Dict, List
 
-import aiohttp
 import discord
 from discord import MessageType, PartialEmoji, app_commands, ui
-from discord.ext import commands, tasks
+from discord.ext import tasks
 from emoji_data import EmojiSequence
 
-from ..tools import Cog, get_json
+from ..tools import Cog, KeywordSet, MessageContext, get_json, message_handler
 
 log = logging.getLogger(__name__)
 AYYGEN = re.compile("[aA][yY][Yy][yY]*")
 YOUTUBE_REGEX = re.compile(r"https?:\/\/(?:www\.)?(?:youtube\.com\/watch\?v=|youtu\.be\/)([\w-]{11})")
 VOTE_EMOJIS = ["<:greentick:1074791788205854731>", "<:yellowtick:872631240010899476>", "<:redtick:968969232870178896>"]
 ARSON_STRINGS = ["fire", "arson", "kat", "cat", "arsn"]
+FIRST_AMENDMENT_STRINGS = ["free speech", "first amendment"]
+YOUTUBE_TTL = 24 * 60 * 60  # a video's length doesn't change, cache lookups for a day
 
 
 class Fun(Cog):
@@ -28,6 +29,10 @@ class Fun(Cog):
             r":(?P<animated>a?):(?P<name>[a-zA-Z0-9_]{2,32}):(?P<id>\d{18,22})>>"
         )  # matches :a?:name:ID>> for manual addition from emoji ID. the a is indicating if the emoji is animated or not
         self.last_posted: Dict[int, float] = {}
+        # one pass over each message finds banned phrases, arson words and first amendment talk alike
+        self.keywords = KeywordSet(
+            lambda: self.bot.config.nerdiowoBannedPhrases, lambda: ARSON_STRINGS, lambda: FIRST_AMENDMENT_STRINGS
+        )
 
         self.stealEmojiMenu = app_commands.ContextMenu(
             name='Steal Emojis',
@@ -86,37 +91,38 @@ class Fun(Cog):
             return
         lengths = {}
         for match in matches:
-            async with aiohttp.ClientSession() as session:
-                data = await get_json(
-                    session,
-                    f"https://www.googleapis.com/youtube/v3/videos?part=contentDetails&id={matches[0]}&key={self.bot.config.youtube_token}",
-                )
-                if len(data["items"]) == 0:
-                    await interaction.response.send_message("that's not a valid youtube link :(", ephemeral=True)
-                    return
-                duration = data["items"][0]["contentDetails"]["duration"]
-                duration = duration[2:]  # remove the "PT" prefix
-                days = 0
-                hours = 0
-                minutes = 0
-                seconds = 0
-                if "D" in duration:
-                    parts = duration.split("D")
-                    days = int(parts[0])
-                    duration = parts[1]
-                if "H" in duration:
-                    parts = duration.split("H")
-                    hours = int(parts[0])
-                    duration = parts[1]
-                if "M" in duration:
-                    parts = duration.split("M")
-                    minutes = int(parts[0])
-                    duration = parts[1]
-                if "S" in duration:
-                    parts = duration.split("S")
-                    seconds = int(parts[0])
-                duration_string = f"{days}{' days, ' if days > 0 else ''}{hours:02d}:{minutes:02d}:{seconds:02d}"
-                lengths[match] = duration_string
+            session = self.bot.http_clients['default']
+            data = await get_json(
+                session,
+                f"https://www.googleapis.com/youtube/v3/videos?part=contentDetails&id={matches[0]}&key={self.bot.config.youtube_token}",
+                ttl=YOUTUBE_TTL,
+            )
+            if len(data["items"]) == 0:
+                await interaction.response.send_message("that's not a valid youtube link :(", ephemeral=True)
+                return
+            duration = data["items"][0]["contentDetails"]["duration"]
+            duration = duration[2:]  # remove the "PT" prefix
+            days = 0
+            hours = 0
+            minutes = 0
+            seconds = 0
+            if "D" in duration:
+                parts = duration.split("D")
+                days = int(parts[0])
+                duration = parts[1]
+            if "H" in duration:
+                parts = duration.split("H")
+                hours = int(parts[0])
+                duration = parts[1]
+            if "M" in duration:
+                parts = duration.split("M")
+                minutes = int(parts[0])
+                duration = parts[1]
+            if "S" in duration:
+                parts = duration.split("S")
+                seconds = int(parts[0])
+            duration_string = f"{days}{' days, ' if days > 0 else ''}{hours:02d}:{minutes:02d}:{seconds:02d}"
+            lengths[match] = duration_string
         await interaction.response.send_message(
             f"{' and '.join([f'{link} is {length}' for link, length in lengths.items()])}", ephemeral=True
         )
@@ -214,59 +220,45 @@ class Fun(Cog):
     @app_commands.command(name="cat")
     async def slash_cat(self, interaction: discord.Interaction):
         """Posts a pretty photo of a cat"""
-        async with aiohttp.ClientSession() as session:
-            self.bot.loop.create_task(interaction.response.defer(thinking=True))
-            cat = await get_json(
-                session,
-                f"https://thecatapi.com/api/images/get?format=json" f"&api_key={self.bot.config.cat_token}",
-            )
-            cat = cat[0]
-            embed = discord.Embed()
-            embed.set_image(url=cat["url"])
-            embed.url = "http://thecatapi.com"
-            embed.title = "cat provided by the cat API"
-            await interaction.followup.send(embed=embed)
+        session = self.bot.http_clients['default']
+        self.bot.loop.create_task(interaction.response.defer(thinking=True))
+        cat = await get_json(
+            session,
+            f"https://thecatapi.com/api/images/get?format=json" f"&api_key={self.bot.config.cat_token}",
+            ttl=0,
+        )
+        cat = cat[0]
+        embed = discord.Embed()
+        embed.set_image(url=cat["url"])
+        embed.url = "http://thecatapi.com"
+        embed.title = "cat provided by the cat API"
+        await interaction.followup.send(embed=embed)
 
     @app_commands.command(name="dog")
     async def dog(self, interaction: discord.Interaction):
         """Posts a pretty picture of a dog."""
         self.bot.loop.create_task(interaction.response.defer(thinking=True))
-        async with aiohttp.ClientSession() as session:
-            dog = None
-            while dog is None or dog["url"][-3:].lower() == "mp4":
-                dog = await get_json(session, "https://random.dog/woof.json")
-                log.debug(dog["url"])
-            ret = discord.Embed()
-            ret.set_image(url=dog["url"])
-            await interaction.followup.send(embed=ret)
+        session = self.bot.http_clients['default']
+        dog = None
+        while dog is None or dog["url"][-3:].lower() == "mp4":
+            dog = await get_json(session, "https://random.dog/woof.json")
+            log.debug(dog["url"])
+        ret = discord.Embed()
+        ret.set_image(url=dog["url"])
+        await interaction.followup.send(embed=ret)
+
+    def shake_channel(self, interaction: discord.Interaction) -> discord.VoiceChannel | discord.StageChannel | None:
+        """where to shake people into: the afk channel, or else an empty channel, near the user's if possible"""
+        if interaction.guild.afk_channel is not None:
+            return interaction.guild.afk_channel
+        return self.bot.voice_events.occupancy.find_empty(
+            interaction.guild, interaction.user, interaction.user.voice.channel.category_id
+        )
 
     async def target_autocomplete(self, interaction: discord.Interaction, guess: str) -> List[app_commands.Choice]:
         if interaction.user.voice is None:
             return [app_commands.Choice(name="err: not in a voice channel", value="0")]
-        channel: discord.VoiceChannel | discord.StageChannel | None = interaction.guild.afk_channel
-        if channel is None:
-            if interaction.user.voice.channel.category is not None:
-                for chan in interaction.user.voice.channel.category.channels:
-                    if (
-                        (isinstance(chan, discord.VoiceChannel) or isinstance(chan, discord.StageChannel))
-                        and len(chan.members) == 0
-                        and chan.permissions_for(interaction.user).view_channel
-                    ):
-                        channel = chan
-                        break
-            if channel is None:
-                for chan in interaction.guild.voice_channels:
-                    if len(chan.members) == 0 and chan.permissions_for(interaction.user).view_channel:
-                        channel = chan
-                        break
-            if channel is None:
-                for chan in interaction.guild.stage_channels:
-                    if len(chan.members) == 0 and chan.permissions_for(interaction.user).view_channel:
-                        channel = chan
-                        break
-            if channel is None:
-                await interaction.response.send_message("No suitable channel to shake into found", ephemeral=True)
-                return
+        channel = self.shake_channel(interaction)
         if channel is None or interaction.user.voice.channel == channel:
             return [app_commands.Choice(name="err: no suitable shake channel found", value="0")]
 
@@ -299,30 +291,10 @@ class Fun(Cog):
         if interaction.user.voice is None:
             await interaction.response.send_message("you are not in a voice channel", ephemeral=True)
             return
-        channel: discord.VoiceChannel | discord.StageChannel | None = interaction.guild.afk_channel
+        channel = self.shake_channel(interaction)
         if channel is None:
-            if interaction.user.voice.channel.category is not None:
-                for chan in interaction.user.voice.channel.category.channels:
-                    if (
-                        (isinstance(chan, discord.VoiceChannel) or isinstance(chan, discord.StageChannel))
-                        and len(chan.members) == 0
-                        and chan.permissions_for(interaction.user).view_channel
-                    ):
-                        channel = chan
-                        break
-            if channel is None:
-                for chan in interaction.guild.voice_channels:
-                    if len(chan.members) == 0 and chan.permissions_for(interaction.user).view_channel:
-                        channel = chan
-                        break
-            if channel is None:
-                for chan in interaction.guild.stage_channels:
-                    if len(chan.members) == 0 and chan.permissions_for(interaction.user).view_channel:
-                        channel = chan
-                        break
-            if channel is None:
-                await interaction.response.send_message("No suitable channel to shake into found", ephemeral=True)
-                return
+            await interaction.response.send_message("No suitable channel to shake into found", ephemeral=True)
+            return
 
         if interaction.user.voice.channel == channel:
             await interaction.response.send_message("you are in the shaking channel, somehow", ephemeral=True)
@@ -360,27 +332,25 @@ class Fun(Cog):
         if voiceLog:
             del voiceLog.beingShaken[user.id]
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if self.bot.location == "dev" or message.guild is None:
-            return
-
+    @message_handler(guild_only=True, predicate=lambda self, ctx: self.bot.location != "dev")
+    async def on_message(self, ctx: MessageContext):
+        message = ctx.message
+        content = ctx.content_lower
+        hits = self.keywords.find(content)
         if message.guild.id == 791528974442299412 and message.channel.category_id != 822958326249816095:
-            if any(
-                [banned_phrase in message.content.lower() for banned_phrase in self.bot.config.nerdiowoBannedPhrases]
-            ):
+            if any(word.lower() in hits for word in self.bot.config.nerdiowoBannedPhrases):
                 await message.delete()
                 await message.channel.send("BAD WORD DETECTED. MESSAGE DESTROYED.", delete_after=5)
                 return
-        cfg = (await self.bot.db.get_guild_data(message.guild.id)).config
+        cfg = (await ctx.guild_data()).config
         if cfg.ayy:
             if AYYGEN.fullmatch(message.content):
                 await message.reply("lmao", mention_author=False)
         if cfg.veryCool:
-            if message.content.lower().startswith("thank you "):
+            if content.startswith("thank you "):
                 await message.reply("very cool", mention_author=False)
         if cfg.firstAmendment:
-            if any([check in message.content.lower() for check in ["free speech", "first amendment"]]):
+            if any(check in hits for check in FIRST_AMENDMENT_STRINGS):
                 if self.last_posted.get(message.channel.id, time.time() - 60 * 60 * 24) < time.time() - 60 * 60:
                     await message.reply("https://xkcd.com/1357/", mention_author=True)
                     self.last_posted[message.channel.id] = time.time()
@@ -431,11 +401,7 @@ class Fun(Cog):
                     pass
 
                 await message.delete()
-        if (
-            message.guild
-            and message.guild.id == 791528974442299412
-            and any(word in message.content.lower() for word in ARSON_STRING)
-        ):
+        if message.guild.id == 791528974442299412 and any(word in hits for word in ARSON_STRINGS):
             await message.reply("arson", mention_author=False)
 
 
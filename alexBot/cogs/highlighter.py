@@ -1,39 +1,199 @@
+import asyncio
 import logging
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
 
 import discord
-from discord.ext import commands
+from discord import app_commands
 
-from ..tools import Cog
+from alexBot.classes import Highlight
+
+from ..tools import Cog, KeywordMatcher, KeywordSet, MessageContext, message_handler
 
 log = logging.getLogger(__name__)
 
+MAX_KEYWORDS = 25  # per user, per guild
+MIN_KEYWORD_LENGTH = 2  # shorter would match almost every message
+BATCH_SECONDS = 10  # gather highlights this long before sending a DM
+DM_INTERVAL = 60  # at most one highlight DM per user this often
+
+
+class HighlightIndex:
+    """
+    keyword -> subscribers for one guild, with one automaton over all of the guild's keywords.
+    a message is scanned once no matter how many people subscribe to how many words.
+    """
+
+    def __init__(self, highlights: Iterable[Highlight] = ()):
+        self.subscribers: Dict[str, Set[int]] = defaultdict(set)
+        for highlight in highlights:
+            self.subscribers[highlight.keyword].add(highlight.userId)
+        self.matcher = KeywordMatcher(self.subscribers)
+
+    def match(self, text: str) -> Dict[int, Set[str]]:
+        """the subscribers to notify, and which of their keywords were found"""
+        hits: Dict[int, Set[str]] = defaultdict(set)
+        for keyword in self.matcher.find(text):
+            for userId in self.subscribers[keyword]:
+                hits[userId].add(keyword)
+        return hits
+
 
 class Highlighter(Cog):
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if self.bot.location == 'dev' or message.guild is None:
-            return
-        if (
-            message.guild.id in self.bot.config.listenServers
-            and message.author.id != self.bot.owner.id
-            and not message.author.bot
-        ):
-            if any(each.lower() in message.content.lower() for each in self.bot.config.listens):
+    def __init__(self, bot):
+        super().__init__(bot)
+        self.listens = KeywordSet(lambda: self.bot.config.listens)
+        self.indexes: Dict[int, HighlightIndex] = {}
+        self.pending: Dict[int, List[str]] = defaultdict(list)
+        self.senders: Dict[int, asyncio.Task] = {}
+        self.last_sent: Dict[int, float] = {}
+
+    async def cog_load(self):
+        byGuild: Dict[int, List[Highlight]] = defaultdict(list)
+        for highlight in await self.bot.db.get_highlights():
+            byGuild[highlight.guildId].append(highlight)
+        self.indexes = {guildId: HighlightIndex(highlights) for guildId, highlights in byGuild.items()}
+
+    async def cog_unload(self):
+        for task in self.senders.values():
+            task.cancel()
+
+    async def rebuild(self, guildId: int):
+        highlights = await self.bot.db.get_highlights(guildId)
+        if highlights:
+            self.indexes[guildId] = HighlightIndex(highlights)
+        else:
+            self.indexes.pop(guildId, None)
+
+    @message_handler(
+        guilds=lambda self: self.bot.config.listenServers,
+        ignore_bots=True,
+        predicate=lambda self, ctx: self.bot.location != 'dev' and ctx.author != self.bot.owner,
+    )
+    async def on_message(self, ctx: MessageContext):
+        message = ctx.message
+        if self.listens.search(ctx.content_lower):
+            tosend = (
+                f"highlight: {message.author.mention} ({message.author})"
+                f"in {message.channel.mention}({message.channel})"
+                f"\n{message.jump_url}\n\n{message.content}"
+            )
+            if len(tosend) > 2000:
+                # message too long to send, crop content
                 tosend = (
                     f"highlight: {message.author.mention} ({message.author})"
                     f"in {message.channel.mention}({message.channel})"
-                    f"\n{message.jump_url}\n\n{message.content}"
+                    f"\n{message.jump_url}\n\n{message.content[:500]}"
                 )
-                if len(tosend) > 2000:
-                    # message too long to send, crop content
-                    tosend = (
-                        f"highlight: {message.author.mention} ({message.author})"
-                        f"in {message.channel.mention}({message.channel})"
-                        f"\n{message.jump_url}\n\n{message.content[:500]}"
-                    )
-
-                allowed_mentions = discord.AllowedMentions(users=True)
-                await self.bot.owner.send(tosend, allowed_mentions=allowed_mentions)
+
+            allowed_mentions = discord.AllowedMentions(users=True)
+            await self.bot.owner.send(tosend, allowed_mentions=allowed_mentions)
+
+    @message_handler(
+        guild_only=True,
+        ignore_bots=True,
+        predicate=lambda self, ctx: self.bot.location != 'dev' and ctx.guild.id in self.indexes,
+    )
+    async def on_subscribed_message(self, ctx: MessageContext):
+        message = ctx.message
+        for userId, keywords in self.indexes[ctx.guild.id].match(ctx.content_lower).items():
+            if userId == ctx.author.id:
+                continue
+            member = ctx.guild.get_member(userId)
+            if member is None or not ctx.channel.permissions_for(member).read_messages:
+                continue
+            self.queue_notification(
+                userId,
+                f"**{', '.join(sorted(keywords))}** in {message.channel.mention} from {message.author}: "
+                f"{discord.utils.escape_mentions(message.content[:200])} {message.jump_url}",
+            )
+
+    def queue_notification(self, userId: int, line: str):
+        self.pending[userId].append(line)
+        if userId not in self.senders:
+            self.senders[userId] = asyncio.create_task(self.send_notifications(userId))
+
+    async def send_notifications(self, userId: int):
+        """send everything queued for a user in one DM, once the batch window and their rate limit have passed."""
+        await asyncio.sleep(max(BATCH_SECONDS, self.last_sent.get(userId, 0) + DM_INTERVAL - time.monotonic()))
+        # anything queued after this point starts a new batch
+        del self.senders[userId]
+        lines = self.pending.pop(userId, [])
+        user = self.bot.get_user(userId)
+        if not lines or user is None:
+            return
+        self.last_sent[userId] = time.monotonic()
+
+        content = "highlights:"
+        for sent, line in enumerate(lines):
+            if len(content) + len(line) + 1 > 1950:
+                content += f"\n...and {len(lines) - sent} more"
+                break
+            content += f"\n{line}"
+        try:
+            await user.send(content, allowed_mentions=discord.AllowedMentions.none())
+        except discord.HTTPException as e:
+            log.debug(f"could not send highlights to {userId}: {e}")
+
+    highlightGroup = app_commands.Group(
+        name="highlight",
+        description="get a DM when someone says a word in this server",
+        guild_only=True,
+    )
+
+    @highlightGroup.command(name="add", description="get a DM when someone says this word here")
+    async def highlight_add(
+        self, interaction: discord.Interaction, keyword: app_commands.Range[str, MIN_KEYWORD_LENGTH, 50]
+    ):
+        keyword = keyword.lower().strip()
+        # the Range is checked before stripping, so " a " would get through it
+        if len(keyword) < MIN_KEYWORD_LENGTH:
+            await interaction.response.send_message(
+                f"highlights need at least {MIN_KEYWORD_LENGTH} characters", ephemeral=True
+            )
+            return
+        mine = [h for h in await self.bot.db.get_highlights(interaction.guild_id) if h.userId == interaction.user.id]
+        if any(h.keyword == keyword for h in mine):
+            await interaction.response.send_message("you already highlight that", ephemeral=True)
+            return
+        if len(mine) >= MAX_KEYWORDS:
+            await interaction.response.send_message(
+                f"you can only have {MAX_KEYWORDS} highlights per server", ephemeral=True
+            )
+            return
+        await self.bot.db.add_highlight(Highlight(interaction.guild_id, interaction.user.id, keyword))
+        await self.rebuild(interaction.guild_id)
+        await interaction.response.send_message(f"added highlight `{keyword}`", ephemeral=True)
+
+    @highlightGroup.command(name="remove", description="stop highlighting a word")
+    async def highlight_remove(self, interaction: discord.Interaction, keyword: str):
+        keyword = keyword.lower().strip()
+        for highlight in await self.bot.db.get_highlights(interaction.guild_id):
+            if highlight.userId == interaction.user.id and highlight.keyword == keyword:
+                await self.bot.db.delete_highlight(highlight.id)
+                await self.rebuild(interaction.guild_id)
+                await interaction.response.send_message(f"removed highlight `{keyword}`", ephemeral=True)
+                return
+        await interaction.response.send_message("you don't highlight that", ephemeral=True)
+
+    @highlight_remove.autocomplete('keyword')
+    async def autocomplete_remove(self, interaction: discord.Interaction, current: str):
+        return [
+            app_commands.Choice(name=h.keyword, value=h.keyword)
+            for h in await self.bot.db.get_highlights(interaction.guild_id)
+            if h.userId == interaction.user.id and current.lower() in h.keyword
+        ][:25]
+
+    @highlightGroup.command(name="list", description="list your highlights in this server")
+    async def highlight_list(self, interaction: discord.Interaction):
+        keywords = sorted(
+            h.keyword for h in await self.bot.db.get_highlights(interaction.guild_id) if h.userId == interaction.user.id
+        )
+        await interaction.response.send_message(
+            f"your highlights: {', '.join(f'`{k}`' for k in keywords)}" if keywords else "you have no highlights here",
+            ephemeral=True,
+        )
 
 
 async def setup(bot):
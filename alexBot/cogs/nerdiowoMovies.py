@@ -104,8 +104,7 @@ class NerdiowoMovies(Cog):
             await interaction.response.send_message("That movie has already been suggested", ephemeral=True)
             return
         suggestion = MovieSuggestion(title=movie_name, watched=False, suggestor=interaction.user.id, watchdate="")
-        all_movies.append(suggestion)
-        await self.bot.db.save_movies_data(all_movies)
+        await self.bot.db.add_movie(suggestion)
         await interaction.response.send_message(f"Your movie suggestion, {suggestion.title} has been submitted.")
         for ip in self.active_paginators:
             await ip.add_line(
@@ -129,8 +128,7 @@ class NerdiowoMovies(Cog):
         except IndexError:
             await interaction.response.send_message("That movie has not been suggested", ephemeral=True)
             return
-        all_movies.remove(movie)
-        await self.bot.db.save_movies_data(all_movies)
+        await self.bot.db.delete_movie(movie.id)
         await interaction.response.send_message(f"The movie suggestion, {movie.title} has been removed.")
 
     async def autocomplete_unwatched_own_or_admin(self, interaction: discord.Interaction, movie_name: str):
@@ -248,7 +246,7 @@ class NerdiowoMovies(Cog):
             return
         movie.watched = True
         movie.watchdate = datetime.datetime.now().strftime("%Y-%m-%d")
-        await self.bot.db.save_movies_data(all_movies)
+        await self.bot.db.update_movie(movie)
         await interaction.response.send_message(f"{movie.title} has been marked as watched.")
 
     @watched.autocomplete('movie_name')
@@ -271,7 +269,7 @@ class NerdiowoMovies(Cog):
             await interaction.response.send_message("You did not suggest that movie", ephemeral=True)
             return
         movie.title = new_name
-        await self.bot.db.save_movies_data(all_movies)
+        await self.bot.db.update_movie(movie)
         await interaction.response.send_message(f"`{old_name}` has been renamed to `{new_name}`.")
 
     @rename.autocomplete('old_name')
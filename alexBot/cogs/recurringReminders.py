@@ -126,8 +126,8 @@ class RecurringReminders(Cog):
             UTC_minute=time_min,
             require_clearing=require_clearing,
         )
+        await self.bot.db.add_recurring_reminder(reminder)
         self.reminders.append(reminder)
-        await self.bot.db.save_recurring_reminders(self.reminders)
         self.tasks.append(self.bot.loop.create_task(self.setup_remind(reminder)))
         await interaction.response.send_message("Reminder added")
 
@@ -156,7 +156,7 @@ class RecurringReminders(Cog):
                     )
                     return
                 self.reminders.remove(reminder)
-                await self.bot.db.save_recurring_reminders(self.reminders)
+                await self.bot.db.delete_recurring_reminder(reminder.id)
                 await interaction.response.send_message("Reminder removed")
                 await self.bot.reload_extension("alexBot.cogs.recurringReminders")
                 return
@@ -4,13 +4,13 @@ import typing
 from collections import defaultdict
 from typing import TYPE_CHECKING, Dict, List
 
-import aiohttp
 import asyncio_mqtt as aiomqtt
 import discord
 from asyncio_mqtt.types import PayloadType
 from discord.ext import tasks
 
-from ..tools import Cog, get_json
+from ..tools import Cog, MessageContext, get_json, message_handler
+from ..voiceevents import VoiceEvent, VoiceEventKind, voice_handler
 
 if TYPE_CHECKING:
     from alexBot.cogs.mqttDispatcher import HomeAssistantIntigreation
@@ -43,22 +43,21 @@ class PhoneMonitor(Cog):
         super().__init__(bot)
         self.notifiable: List[int] = list(USER_TO_HA_DEVICE.keys())
 
-    @Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if not message.guild:
-            return
-        if message.channel.id not in self.bot.config.ha_voice_message_broadcast:
+    @message_handler(
+        channels=lambda self: self.bot.config.ha_voice_message_broadcast,
+        guild_only=True,
+        predicate=lambda self, ctx: ctx.is_voice_message,
+    )
+    async def on_message(self, ctx: MessageContext):
+        message = ctx.message
+        if message.attachments[0].content_type != "audio/ogg":
             return
-
-        if message.flags.value >> 13 and len(message.attachments) == 1:
-            if message.attachments[0].content_type != "audio/ogg":
-                return
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.bot.config.ha_voice_message_broadcast[message.channel.id],
-                    json={"url": message.attachments[0].url},
-                ) as resp:
-                    log.debug(f"Sent voice message to HA: {resp.status}")
+        session = self.bot.http_clients['homeassistant']
+        async with session.post(
+            self.bot.config.ha_voice_message_broadcast[message.channel.id],
+            json={"url": message.attachments[0].url},
+        ) as resp:
+            log.debug(f"Sent voice message to HA: {resp.status}")
 
     @discord.app_commands.command(name="ha-vc-notifs", description="Toggle voice channel notifications for your phone")
     @discord.app_commands.guilds(GUILD)
@@ -121,9 +120,9 @@ class PhoneMonitor(Cog):
             if not targets:
                 hook = self.bot.config.ha_webhook_notifs.get(user.id)
                 if hook:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.post(hook, json={"content": "Err: i can't see what VC you are in"}) as resp:
-                            log.debug(f"Sent voice message to HA: {resp.status}")
+                    session = self.bot.http_clients['homeassistant']
+                    async with session.post(hook, json={"content": "Err: i can't see what VC you are in"}) as resp:
+                        log.debug(f"Sent voice message to HA: {resp.status}")
                 return
             member = targets[0].get_member(user.id)
             channel = member.voice.channel
@@ -138,11 +137,11 @@ class PhoneMonitor(Cog):
             except discord.errors.Forbidden as e:
                 hook = self.bot.config.ha_webhook_notifs.get(user.id)
                 if hook:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.post(
-                            hook, json={"content": f"Err: i don't have permissions in {channel.guild}"}
-                        ) as resp:
-                            log.debug(f"Sent voice message to HA: {resp.status}")
+                    session = self.bot.http_clients['homeassistant']
+                    async with session.post(
+                        hook, json={"content": f"Err: i don't have permissions in {channel.guild}"}
+                    ) as resp:
+                        log.debug(f"Sent voice message to HA: {resp.status}")
                 return
 
     @staticmethod
@@ -164,11 +163,12 @@ class PhoneMonitor(Cog):
             s += "🔴 "
         return s
 
-    @Cog.listener()
-    async def on_voice_state_update(
-        self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState
-    ):
-        if member.id in self.notifiable and before.channel and not after.channel and before.mute:
+    @voice_handler(predicate=lambda self, event: bool(self.notifiable))
+    async def on_voice_state_update(self, event: VoiceEvent):
+        member = event.member
+        before = event.before
+        after = event.after
+        if member.id in self.notifiable and event.kind is VoiceEventKind.LEAVE and before.mute:
             # member we care about, left a channel
             log.debug(
                 f"{member.name} left {before.channel.name}, waiting 5 minutes to see if they come back, then remembering to unmute them"
@@ -185,28 +185,26 @@ class PhoneMonitor(Cog):
             )
             await member.edit(mute=False)
 
-        channel: discord.VoiceChannel = before.channel or after.channel
-        if before.channel and after.channel and before.channel == after.channel:
+        channel: discord.VoiceChannel = event.channel
+        if event.kind is VoiceEventKind.UPDATE:
             log.debug(f"no one moved in {channel.name}")
             # no one moved, check if user acted on is notifiable
             if member.id in self.notifiable:
                 log.debug(f"checking {member.name} in {channel.guild.name} ({channel.guild.id}) for self_voice changes")
                 log.debug(f"{before=} {after=}")
-                # find the differences between before.voice and after.voice
-                # if there is a difference, send a notification
-                # if there is no difference, ignore
+                # say which of the changes we care about happened, if any
                 message = ""
-                if before.self_mute != after.self_mute:
+                if 'self_mute' in event.changes:
                     message += f"you were {'' if after.self_mute else 'un'}muted\n"
-                if before.self_deaf != after.self_deaf:
+                if 'self_deaf' in event.changes:
                     message += f"you were {'' if after.self_deaf else 'un'}deafened\n"
-                if before.mute != after.mute:
+                if 'mute' in event.changes:
                     message += f"you were {'' if after.mute else 'un'}server muted\n"
-                if before.deaf != after.deaf:
+                if 'deaf' in event.changes:
                     message += f"you were {'' if after.deaf else 'un'}server deafened\n"
-                # if before.self_video != after.self_video:
+                # if 'self_video' in event.changes:
                 #     message += f"you {'' if after.self_video else 'un'}started video\n"
-                # if before.self_stream != after.self_stream:
+                # if 'self_stream' in event.changes:
                 #     message += f"you {'' if after.self_stream else 'un'}started streaming\n"
                 log.debug(f"message: {message}")
 
@@ -215,10 +213,7 @@ class PhoneMonitor(Cog):
 
                 message = self.render_voiceState(member) + message
                 await self.send_notification(member.id, message, channel.members)
-                return
-
-            else:
-                return
+            return
 
         voiceLog = self.bot.get_cog('VoiceLog')
         if voiceLog:
@@ -226,22 +221,22 @@ class PhoneMonitor(Cog):
                 return  # ignore person being shaken
 
         for user in self.notifiable:
-            oldAfter = after.channel
             log.debug(f"checking {user}")
             SELF_MOVED = user == member.id
             message = None
             memberList: List[discord.Member] = []
             if not (targetMember := channel.guild.get_member(user)):
                 return  #  user not in server
-            if after.channel and not after.channel.permissions_for(targetMember).view_channel:
-                after.channel = None
+            # the voice states are shared with every other handler, so hide the channel locally instead
+            afterChannel = after.channel
+            if afterChannel and not afterChannel.permissions_for(targetMember).view_channel:
+                afterChannel = None
+            # where the user we'd notify is, after this update
+            targetChannel = targetMember.voice.channel if targetMember.voice else None
             log.debug(f"checking {member.name} in {channel.guild.name} ({channel.guild.id})")
-            log.debug(f"before: {before.channel} after: {after.channel}")
-            log.debug(
-                f"before.member: {before.channel.members if before.channel else None} after.members: {after.channel.members if after.channel else None}"
-            )
+            log.debug(f"before: {before.channel} after: {afterChannel}")
 
-            if before.channel and not after.channel and user == member.id:
+            if before.channel and not afterChannel and user == member.id:
                 # our current person left chat
                 # because channel.members on before is after change members, we need to insert the user into before
                 # we're just going to manually assign the message and memberList
@@ -249,41 +244,38 @@ class PhoneMonitor(Cog):
                 message = f"{member.name} left {before.channel.name}"
                 memberList = before.channel.members
 
-            if before.channel and after.channel and (before.channel != after.channel):
-                if user in [user.id for user in before.channel.members]:
+            if before.channel and afterChannel and (before.channel != afterChannel):
+                if targetChannel == before.channel:
                     # person left chat to another channel in server
-                    log.debug(f"{member.name} moved from {before.channel.name} to {after.channel.name}")
-                    message = f"{member.name} was moved to {after.channel.name}"
+                    log.debug(f"{member.name} moved from {before.channel.name} to {afterChannel.name}")
+                    message = f"{member.name} was moved to {afterChannel.name}"
                     memberList = before.channel.members
-                if user in [user.id for user in after.channel.members]:
+                if targetChannel == afterChannel:
                     # person joined chat from another channel in server
                     if SELF_MOVED:
-                        log.debug(f"Self moved from {before.channel.name} to {after.channel.name}")
-                        message = f"you were moved to {after.channel.name}"
+                        log.debug(f"Self moved from {before.channel.name} to {afterChannel.name}")
+                        message = f"you were moved to {afterChannel.name}"
                     else:
-                        log.debug(f"{member.name} moved from {before.channel.name} to {after.channel.name}")
-                        message = f"{member.name} joined {after.channel.name}"
+                        log.debug(f"{member.name} moved from {before.channel.name} to {afterChannel.name}")
+                        message = f"{member.name} joined {afterChannel.name}"
 
-                    memberList = after.channel.members
+                    memberList = afterChannel.members
 
-            if before.channel and not after.channel and user in [user.id for user in before.channel.members]:
+            if before.channel and not afterChannel and targetChannel == before.channel:
                 # person left chat
                 log.debug(f"{member.name} left {before.channel.name}")
                 message = f"{member.name} left {before.channel.name}"
                 memberList = before.channel.members
-                pass
-            if not before.channel and after.channel and user in [user.id for user in after.channel.members]:
+            if not before.channel and afterChannel and targetChannel == afterChannel:
                 # person joined chat
-                log.debug(f"{member.name} joined {after.channel.name}")
-                message = f"{member.name} joined {after.channel.name}"
-                memberList = after.channel.members
+                log.debug(f"{member.name} joined {afterChannel.name}")
+                message = f"{member.name} joined {afterChannel.name}"
+                memberList = afterChannel.members
 
             if message:
                 message = self.render_voiceState(targetMember) + message
                 await self.send_notification(user, message, memberList)
 
-            after.channel = oldAfter
-
     async def send_notification(self, user: int, message: str, members: List[discord.Member]):
         log.debug(f"message pre members: {message}")
         message = (
@@ -293,9 +285,9 @@ class PhoneMonitor(Cog):
         log.debug(f"message post members : {message}")
         webhook_target = self.bot.config.ha_webhook_notifs.get(user)
         if webhook_target:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(webhook_target, json={"content": message}) as r:
-                    log.debug(f"webhook response: {r.status}")
+            session = self.bot.http_clients['homeassistant']
+            async with session.post(webhook_target, json={"content": message}) as r:
+                log.debug(f"webhook response: {r.status}")
 
 
 async def setup(bot: "Bot"):
@@ -8,9 +8,9 @@ import discord
 import humanize
 from discord import app_commands
 from discord.ext import commands
-from discord.member import VoiceState
 
 from ..tools import Cog
+from ..voiceevents import VoiceEvent, VoiceEventKind, voice_handler
 
 DATEFORMAT = "%a, %e %b %Y %H:%M:%S (%-I:%M %p)"
 
@@ -152,23 +152,22 @@ class Utils(Cog):
             asyncio.get_event_loop().create_task(user.move_to(target, reason=f"as requested by {interaction.user}"))
         await interaction.followup.send(":ok_hand:", ephemeral=True)
 
-    @Cog.listener()
-    async def on_voice_state_update(self, member, before: Optional[VoiceState], after: Optional[VoiceState]):
-        if not (after is None or after.channel is None):
-            if after.channel.id == 889031486978785312:
-                # check for existing instance and close
-                if (not after.channel.guild.voice_client) or (not after.channel.guild.voice_client.is_connected()):
-                    vc = await after.channel.connect()
-                    vc.play(
-                        discord.PCMVolumeTransformer(
-                            discord.FFmpegPCMAudio("https://retail-music.com/walmart_radio.mp3")
-                        )
-                    )
-                    vc.source.volume = 0.25
-        if before.channel.id in self.current_thatars:
-            if len(before.channel.members) == 0:
-                await before.channel.delete(reason="no one left")
-                self.current_thatars.remove(before.channel.id)
+    @voice_handler(kinds=(VoiceEventKind.JOIN, VoiceEventKind.MOVE, VoiceEventKind.LEAVE))
+    async def on_voice_state_update(self, event: VoiceEvent):
+        after = event.after.channel
+        if after is not None and after.id == 889031486978785312:
+            # check for existing instance and close
+            if (not after.guild.voice_client) or (not after.guild.voice_client.is_connected()):
+                vc = await after.connect()
+                vc.play(
+                    discord.PCMVolumeTransformer(discord.FFmpegPCMAudio("https://retail-music.com/walmart_radio.mp3"))
+                )
+                vc.source.volume = 0.25
+        before = event.before.channel
+        if before is not None and before.id in self.current_thatars:
+            if self.bot.voice_events.occupancy.members_in(before.id) == 0:
+                await before.delete(reason="no one left")
+                self.current_thatars.remove(before.id)
 
 
 async def setup(bot):
@@ -1,52 +1,71 @@
 import asyncio
 import json
 import logging
-import math
 import os
 import re
 import shutil
-import subprocess
+import tempfile
 from functools import partial
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
 
-import aiohttp
 import discord
-import httpx
 from discord.errors import DiscordException
 from discord.ext import commands
 from slugify import slugify
+from yarl import URL
 from yt_dlp import DownloadError, YoutubeDL
 
-from ..tools import Cog, is_in_guild, timing
+from .. import transcode
+from ..jobqueue import FairJobQueue, QueueFull
+from ..tools import Cog, MessageContext, get_json, is_in_guild, message_handler, timing
+from ..videocache import CachedVideo, VideoCache, canonical_url
+
+if TYPE_CHECKING:
+    from bot import Bot
 
 log = logging.getLogger(__name__)
 
+API_TTL = 10 * 60  # how long fxtwitter and reddit answers are reused for the same post
 FIREFOX_UA = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:102.0) Gecko/20100101 Firefox/102.0'
 
-REDDIT_REGEX = re.compile(r'https?://(?:\w{2,32}\.)?reddit\.com/(?:r\/\w+\/)?(?:comments|gallery)\/[\w]+\/?\w*')
-REDDIT_APP_REGEX = re.compile(r'https?:\/\/reddit\.app\.link\/[a-zA-Z0-9]{0,20}')
-TIKTOK_SHORT_REGEX = re.compile(r'https?:\/\/(vm|www)\.tiktok\.com\/?t?\/[a-zA-Z0-9]{6,}/')
-TIKTOK_REGEX = re.compile(r'https?:\/\/(?:\w{0,32}\.)?tiktok\.com\/@.+\b\/video\/[\d]+\b')
-TWITTER_REGEX = re.compile(
-    r'https?:\/\/twitter\.com\/([a-zA-Z0-9#-_!*\(\),]{0,20})\/status\/(\d{0,25})\??[a-zA-Z0-9#-_!*\(\),]*'
+# every link we know how to handle, as one alternation. the name of the outer group says what kind of link it is.
+URL_CLASSIFIER = re.compile(
+    r'(?P<reddit_app>https?://reddit\.app\.link/[a-zA-Z0-9]{0,20})'
+    r'|(?P<tiktok_short>https?://(?:vm|www)\.tiktok\.com/?t?/[a-zA-Z0-9]{6,}/)'
+    r'|(?P<reddit>https?://(?:\w{2,32}\.)?reddit\.com/(?:r/\w+/)?(?:comments|gallery)/\w+/?\w*)'
+    r'|(?P<twitter>https?://twitter\.com/(?P<twitter_user>[a-zA-Z0-9#-_!*\(\),]{0,20})/status/'
+    r'(?P<twitter_status>\d{0,25})\??[a-zA-Z0-9#-_!*\(\),]*)'
+    r'|(?P<video>'
+    r'https?://(?:\w{0,32}\.)?tiktok\.com/@[^\s/]+/video/\d+\b'
+    r'|https?://(?:v\.)?redd\.it/[a-zA-Z0-9#-_!*\(\),]{6,}'
+    r'|https?://video\.twimg\.com/ext_tw_video/\S*'
+    r'|https?://t\.co/[a-zA-Z0-9#-_!*\(\),]{0,10}'
+    r'|https?://(?:www\.)instagram\.com/(?:p|reel)/[a-zA-Z0-9-_]{11}/'
+    r'|https?://clips\.twitch\.tv/[a-zA-Z0-9-]{0,64}'
+    r')',
+    re.I,
 )
+# cheap substring checks, so most messages never reach the regex
+KNOWN_HOSTS = ('reddit.', 'redd.it', 'tiktok.com', 'twitter.com', 'twimg.com', 't.co/', 'instagram.com', 'twitch.tv')
+
+
+def classify_url(content: str) -> Optional[re.Match]:
+    """the first link in content that Video_DL handles, or None. `match.lastgroup` is the kind of link."""
+    if 'http' not in content:
+        return None
+    lowered = content.lower()
+    if not any(host in lowered for host in KNOWN_HOSTS):
+        return None
+    return URL_CLASSIFIER.search(content)
 
-REGEXES = [
-    TIKTOK_REGEX,
-    # re.compile(r'https?:\/\/(?:.{3,42}\.)?tiktokcdn-\w{1,8}.com\/\w+/\w+/video/tos/\w+/[^/]+/[^/]+/\?.+vr='),
-    re.compile(r'https?://(?:v\.)?redd\.it/[a-zA-Z0-9#-_!*\(\),]{6,}'),
-    re.compile(r'https?://video.twimg.com/ext_tw_video/\S*'),
-    re.compile(r'https?://t\.co\/[a-zA-Z0-9#-_!*\(\),]{0,10}'),
-    re.compile(r'https?://(?:www\.)instagram\.com/(?:p|reel)/[a-zA-Z0-9-_]{11}/'),
-    re.compile(r'https?:\/\/clips.twitch.tv\/[a-zA-Z0-9-]{0,64}'),
-]
 
 MAX_VIDEO_LENGTH = 5 * 60  # 5 Minutes
-AUDIO_BITRATE = 64 * 1000  # 64 Kbits
-BUFFER_CONSTANT = 20  # Magic number, see https://unix.stackexchange.com/a/598360
+VIDEO_EXTENSIONS = ['mp4', 'gif', 'm4a', 'mov']
 
-FFPROBE_CMD = 'ffprobe -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 in.mp4'
-FFMPEG_CMD = 'ffmpeg -i in.mp4 -y -b:v {0} -maxrate:v {0} -b:a {1} -maxrate:a {1} -bufsize:v {2} {3}.mp4'
+# reactions showing a job's place in the queue: 1 through 10, then "a while"
+QUEUE_POSITION_EMOJI = ['1️⃣', '2️⃣', '3️⃣', '4️⃣', '5️⃣', '6️⃣', '7️⃣', '8️⃣', '9️⃣', '🔟']
+QUEUE_LONG_EMOJI = '⏳'
+QUEUE_FULL_EMOJI = '🚫'
 
 
 class NotAVideo(Exception):
@@ -54,21 +73,91 @@ class NotAVideo(Exception):
 
 
 class Video_DL(Cog):
-    encode_lock = asyncio.Lock()
     mirror_upload_lock = asyncio.Lock()
 
+    def __init__(self, bot: "Bot"):
+        super().__init__(bot)
+        self.jobs = FairJobQueue(
+            workers=getattr(bot.config, 'video_download_workers', 2),
+            max_pending=getattr(bot.config, 'video_max_queued', 20),
+            max_per_key=getattr(bot.config, 'video_max_queued_per_guild', 5),
+        )
+        self.encode_slots = asyncio.Semaphore(getattr(bot.config, 'video_encode_workers', 1))
+        self.scratch_dir: Optional[str] = getattr(bot.config, 'video_scratch_dir', None)
+        self.queue_reactions: Dict[int, str] = {}  # message id: the queue position reaction on it
+        self.cache = VideoCache(
+            getattr(bot.config, 'video_cache_dir', 'video_cache'),
+            getattr(bot.config, 'video_cache_bytes', 2 * 1024**3),
+            getattr(bot.config, 'video_cache_ttl', 7 * 24 * 60 * 60),
+        )
+        self.reuse_attachments: bool = getattr(bot.config, 'video_reuse_attachments', True)
+
+    async def cog_load(self):
+        if self.scratch_dir:
+            os.makedirs(self.scratch_dir, exist_ok=True)
+        await asyncio.to_thread(self.cache.load)
+        self.jobs.start()
+
+    async def cog_unload(self):
+        await self.jobs.stop()
+        await asyncio.to_thread(self.cache.evict)
+
+    @staticmethod
+    def format_for(limit: int) -> str:
+        """
+        a yt-dlp format spec preferring a file that already fits in `limit` bytes, in h264 if there's a choice,
+        and falling back to the best there is (which we'll shrink).
+        """
+        video_limit = int(limit * 0.9)  # leave room for the audio
+        return '/'.join(
+            [
+                f'b[vcodec^=avc1][filesize<{limit}]',
+                f'b[vcodec^=avc1][filesize_approx<{limit}]',
+                f'b[filesize<{limit}]',
+                f'b[filesize_approx<{limit}]',
+                f'bv*[filesize<{video_limit}]+ba',
+                f'bv*[filesize_approx<{video_limit}]+ba',
+                'bv*+ba',
+                'b',
+            ]
+        )
+
     @staticmethod
-    def download_video(url, id):
-        ytdl = YoutubeDL({'outtmpl': f'{id}.mp4'})
+    def preflight(url: str, limit: int) -> dict:
+        """
+        fetch a video's metadata without downloading it, and pick its format.
+        raises NotAVideo for anything we'd throw away after downloading: too long, not a video, or nothing there.
+        """
+        ytdl = YoutubeDL({'format': Video_DL.format_for(limit), 'merge_output_format': 'mp4', 'quiet': True})
         try:
-            data = ytdl.extract_info(url, download=True)
+            data = ytdl.extract_info(url, download=False)
         except DownloadError:
             raise NotAVideo(False)
+        if data.get('_type') == 'playlist':
+            entries = [entry for entry in data.get('entries') or [] if entry]
+            if not entries:
+                raise NotAVideo(False)
+            data = entries[0]
+        if (data.get('duration') or 0) > MAX_VIDEO_LENGTH:
+            raise NotAVideo(f"that video is too long, i only grab videos up to {MAX_VIDEO_LENGTH // 60} minutes")
+        if data.get('ext') not in VIDEO_EXTENSIONS:
+            raise NotAVideo(data.get('url', False))
+        return data
+
+    @staticmethod
+    def download_video(data: dict, directory: str, limit: int) -> Tuple[str, bool]:
+        """download the format preflight picked. returns the title, and whether to re-encode it regardless."""
+        ytdl = YoutubeDL(
+            {
+                'outtmpl': os.path.join(directory, 'video.mp4'),
+                'format': Video_DL.format_for(limit),
+                'merge_output_format': 'mp4',
+            }
+        )
         try:
-            if data['requested_downloads'][0]['ext'] not in ['mp4', 'gif', 'm4a', 'mov']:
-                raise NotAVideo(data['url'])
-        except KeyError:
-            pass
+            ytdl.process_ie_result(data, download=True)
+        except DownloadError:
+            raise NotAVideo(False)
         return (
             f"{data['title']} - {data['description']}"
             if (data.get('description') and data['description'] != data['title'])
@@ -76,6 +165,11 @@ class Video_DL(Cog):
             data['extractor_key'] == 'TikTok',
         )
 
+    @staticmethod
+    def content_key(data: dict) -> str:
+        """what the video cache knows this video by, whichever link it came from"""
+        return f"{data['extractor_key']}:{data['id']}"
+
     @staticmethod
     def download_audio(url, id):
         ydl_opts = {
@@ -96,161 +190,199 @@ class Video_DL(Cog):
         except KeyError:
             return "audio"
 
-    async def convert_twitter(self, message: discord.Message) -> Optional[Tuple[str, str]]:
-        matches = TWITTER_REGEX.match(message.content)
-        if matches:
-            async with aiohttp.ClientSession() as client:
-                resp = await client.get(f'https://api.fxtwitter.com/{matches.group(1)}/status/{matches.group(2)}')
-                data = await resp.json()
-                if data.get('tweet') and data['tweet'].get('media') and data['tweet']['media'].get('video'):
-                    # we have a video! let's download it
-                    return (
-                        data['tweet']['media']['video']['url'],
-                        f"{data['tweet']['author']['name']} - {data['tweet']['text']}",
-                    )
-                elif data.get('tweet') and data['tweet'].get('quote'):
-                    await self.on_message(
-                        await message.channel.send(data['tweet']['quote']['url']),
-                        override=True,
-                        new_deleter=message.author.id,
-                    )
+    async def convert_twitter(self, message: discord.Message, match: re.Match) -> Optional[Tuple[str, str]]:
+        data = await get_json(
+            self.bot.http_clients['media'],
+            f"https://api.fxtwitter.com/{match.group('twitter_user')}/status/{match.group('twitter_status')}",
+            ttl=API_TTL,
+        )
+        if data.get('tweet') and data['tweet'].get('media') and data['tweet']['media'].get('video'):
+            # we have a video! let's download it
+            return (
+                data['tweet']['media']['video']['url'],
+                f"{data['tweet']['author']['name']} - {data['tweet']['text']}",
+            )
+        elif data.get('tweet') and data['tweet'].get('quote'):
+            await self.on_message(
+                MessageContext(self.bot, await message.channel.send(data['tweet']['quote']['url'])),
+                override=True,
+                new_deleter=message.author.id,
+            )
 
-    async def convert_reddit_app(self, message: discord.Message) -> Optional[Tuple[str, str]]:
-        matches = REDDIT_APP_REGEX.match(message.content)
-        if matches:
-            # get the forwarded url
-            async with httpx.AsyncClient() as session:
-                resp = await session.get(url=matches.group(0), headers={'User-Agent': FIREFOX_UA})
-                message.content = str(resp.next_request.url)
-
-    async def convert_reddit(self, message: discord.Message) -> Optional[Tuple[str, str]]:
-        matches = REDDIT_REGEX.match(message.content)
-        if matches:
-            async with httpx.AsyncClient() as session:
-                resp = await session.get(url=matches.group(0) + '.json', headers={'User-Agent': 'AlexBot:v1.0.0'})
-                data = resp.json()[0]['data']['children'][0]['data']
-                # handle gallery
-                if 'gallery_data' in data:
-                    images = [item for item in data['gallery_data']['items']]
+    async def follow_redirect(self, message: discord.Message, match: re.Match) -> Optional[re.Match]:
+        """resolve a short link (reddit app, tiktok) and classify where it goes"""
+        async with self.bot.http_clients['media'].get(
+            match.group(0), headers={'User-Agent': FIREFOX_UA}, allow_redirects=False
+        ) as resp:
+            location = resp.headers.get('Location')
+            if location is None:
+                return None
+            return classify_url(str(resp.url.join(URL(location))))
+
+    async def convert_reddit(self, message: discord.Message, match: re.Match) -> Optional[Tuple[str, str]]:
+        data = await get_json(self.bot.http_clients['media'], match.group(0) + '.json', ttl=API_TTL)
+        data = data[0]['data']['children'][0]['data']
+        # handle gallery
+        if 'gallery_data' in data:
+            images = [item for item in data['gallery_data']['items']]
+            counter = 0
+            resp_text = ''
+            for image in images:
+                image_type = data['media_metadata'][image['media_id']]['m'].split('/')[1]
+                if counter == 5:
                     counter = 0
-                    resp_text = ''
-                    for image in images:
-                        image_type = data['media_metadata'][image['media_id']]['m'].split('/')[1]
-                        if counter == 5:
-                            counter = 0
-                            await message.reply(resp_text)
-                            resp_text = ''
-                        resp_text += f'https://i.redd.it/{image["media_id"]}.{image_type}'
-                        if caption := image.get('caption'):
-                            resp_text += f' ; {caption}'
-                        if link := image.get('outbound_url'):
-                            resp_text += f' ; <{link}>'
-
-                        resp_text += '\n'
-                        counter += 1
                     await message.reply(resp_text)
-                # handle videos
-                elif data['domain'] == 'v.redd.it':
-                    return (
-                        data['url_overridden_by_dest'],
-                        f"{data['title']} \N{BULLET} {data['subreddit_name_prefixed']}",
-                    )
-                # everything else
-                else:
-                    await message.reply(data['url_overridden_by_dest'])
+                    resp_text = ''
+                resp_text += f'https://i.redd.it/{image["media_id"]}.{image_type}'
+                if caption := image.get('caption'):
+                    resp_text += f' ; {caption}'
+                if link := image.get('outbound_url'):
+                    resp_text += f' ; <{link}>'
+
+                resp_text += '\n'
+                counter += 1
+            await message.reply(resp_text)
+        # handle videos
+        elif data['domain'] == 'v.redd.it':
+            return (
+                data['url_overridden_by_dest'],
+                f"{data['title']} \N{BULLET} {data['subreddit_name_prefixed']}",
+            )
+        # everything else
+        else:
+            await message.reply(data['url_overridden_by_dest'])
         return None
 
-    async def convert_tiktok(self, message: discord.Message) -> Optional[Tuple[str, Optional[str]]]:
-        # convert short links to full links
-        matches = TIKTOK_SHORT_REGEX.match(message.content)
-        if matches:
-            async with httpx.AsyncClient() as session:
-                resp = await session.get(url=matches.group(0), headers={'User-Agent': FIREFOX_UA})
-                message.content = str(resp.next_request.url)
+    async def resolve(self, message: discord.Message, match: re.Match) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        turn a classified link into (url to download, title override).
+        None when there is nothing to download, or the site handler already replied.
+        """
+        for _ in range(3):  # short links can point at other short links, but not forever
+            kind = match.lastgroup
+            if kind in ('reddit_app', 'tiktok_short'):
+                match = await self.follow_redirect(message, match)
+                if match is None:
+                    return None
+            elif kind == 'reddit':
+                return await self.convert_reddit(message, match)
+            elif kind == 'twitter':
+                return await self.convert_twitter(message, match)
+            else:
+                return match.group(0), None
         return None
 
-    @Cog.listener()
-    async def on_message(self, message: discord.Message, override=False, new_deleter=None):
-        loop = asyncio.get_running_loop()
-        if message.guild is None or (message.author == self.bot.user and not override):
+    @message_handler(guild_only=True, predicate=lambda self, ctx: classify_url(ctx.message.content) is not None)
+    async def on_message(self, ctx: MessageContext, override=False, new_deleter=None):
+        message = ctx.message
+        if message.author == self.bot.user and not override:
             return
-        if not (await self.bot.db.get_guild_data(message.guild.id)).config.tikTok:
+        url_match = classify_url(message.content)
+        if url_match is None:
+            return
+        if not (await ctx.guild_data()).config.tikTok:
             return
 
-        await self.convert_reddit_app(message)  # convert reddit app links to full links
-
-        pack = (
-            await self.convert_tiktok(message)
-            or await self.convert_reddit(message)
-            or await self.convert_twitter(message)
-        )
-        override_title = None
-        ttt = None
-        if pack:
-            ttt = pack[0]
-            override_title = pack[1]
-
-        content = ttt or message.content
-        matches = None
+        pack = await self.resolve(message, url_match)
+        if pack is None:
+            return
+        match, override_title = pack
 
-        for regex in REGEXES:
-            matches = regex.match(content)
-            if matches:
-                break
+        cached = self.cache.get([canonical_url(match)], message.guild.filesize_limit)
+        if cached is not None:
+            log.info(f'sending cached {match} for {message.author}')
+            try:
+                uploaded = await self.send_video(message, cached, override_title or cached.title)
+            except DiscordException as e:
+                log.warning(f'could not send cached video {match}: {e}')
+                return
+            asyncio.get_running_loop().create_task(self.offer_delete(message, uploaded, new_deleter))
+            return
 
-        if matches is None and not ttt:
+        try:
+            job = self.jobs.submit(
+                message.guild.id, partial(self.process_video, message, match, override_title, new_deleter)
+            )
+        except QueueFull:
+            log.info(f'video queue full, dropping {match} for {message.author}')
+            try:
+                await message.add_reaction(QUEUE_FULL_EMOJI)
+            except DiscordException:
+                pass
             return
+        position = self.jobs.position(job)
+        if position:
+            emoji = QUEUE_POSITION_EMOJI[position - 1] if position <= len(QUEUE_POSITION_EMOJI) else QUEUE_LONG_EMOJI
+            self.queue_reactions[message.id] = emoji
+            try:
+                await message.add_reaction(emoji)
+            except DiscordException:
+                pass
 
-        if ttt:
-            match = ttt
-        else:
-            match = matches.group(0)
+    async def process_video(
+        self, message: discord.Message, match: str, override_title: Optional[str], new_deleter: Optional[int]
+    ):
+        """download, shrink if needed, and upload one video. runs on a job queue worker, in its own directory."""
+        loop = asyncio.get_running_loop()
         log.info(f'collecting {match} for {message.author}')
+        if emoji := self.queue_reactions.pop(message.id, None):
+            loop.create_task(message.remove_reaction(emoji, self.bot.user))
         uploaded = None
+        workdir = tempfile.mkdtemp(prefix=f'video-{message.id}-', dir=self.scratch_dir)
+        video = os.path.join(workdir, 'video.mp4')
         async with message.channel.typing():
             try:
-                if match:
-                    await message.channel.typing()
-                    try:
-                        await message.add_reaction('📥')
-                    except discord.Forbidden:
-                        pass
+                try:
+                    await message.add_reaction('📥')
+                except discord.Forbidden:
+                    pass
 
-                    task = partial(self.download_video, match, message.id)
-                    try:
+                limit = message.guild.filesize_limit
+                try:
+                    data = await self.bot.loop.run_in_executor(None, self.preflight, match, limit)
+                    keys = [canonical_url(match), self.content_key(data)]
+                    # a different link to a video we already have
+                    entry = self.cache.get(keys[1:], limit)
+                    if entry is None:
+                        task = partial(self.download_video, data, workdir, limit)
                         title, force_transcode = await self.bot.loop.run_in_executor(None, task)
-                        title = override_title if override_title else title
-                    except NotAVideo as e:
-                        if os.path.exists(f'{message.id}.mp4'):
-                            os.remove(f'{message.id}.mp4')
-                        if e.args[0]:
-                            await message.reply(e, mention_author=False)
-                            try:
-                                await message.add_reaction('✅')
-                            except DiscordException:
-                                pass
-                        return
-                    loop.create_task(message.remove_reaction('📥', self.bot.user))
-
-                    if os.path.getsize(f'{message.id}.mp4') > message.guild.filesize_limit or force_transcode:
+                    else:
+                        title = entry.title
+                    title = override_title if override_title else title
+                except NotAVideo as e:
+                    if e.args[0]:
+                        await message.reply(e, mention_author=False)
+                        try:
+                            await message.add_reaction('✅')
+                        except DiscordException:
+                            pass
+                    return
+                loop.create_task(message.remove_reaction('📥', self.bot.user))
+
+                if entry is not None:
+                    await asyncio.to_thread(self.cache.save, self.cache.add_keys(entry, keys))
+                else:
+                    shrunk_for = None
+                    # only what doesn't fit (or yt-dlp says needs it) is transcoded; the shrink probes it itself
+                    if os.path.getsize(video) > limit or force_transcode:
                         loop.create_task(message.add_reaction('🪄'))  # magic wand
 
-                        async with self.encode_lock:
-                            task = partial(self.transcode_shrink, message.id, message.guild.filesize_limit * 0.95)
+                        async with self.encode_slots:
+                            task = partial(self.transcode_shrink, workdir, limit * 0.95)
                             await self.bot.loop.run_in_executor(None, task)
+                        shrunk_for = limit
+                    entry = await asyncio.to_thread(self.cache.put, keys, shrunk_for, video, title)
 
-                    # file is MESSAGE.ID.mp4, need to create discord.File and upload it to channel then delete out.mp4
-                    file = discord.File(f'{message.id}.mp4', 'vid.mp4')
-                    loop.create_task(message.add_reaction('📤'))
-                    uploaded = await message.reply(title, file=file, mention_author=False)
-                    loop.create_task(message.remove_reaction('📤', self.bot.user))
-                    try:
-                        await message.add_reaction('✅')
-                    except DiscordException:
-                        pass
+                loop.create_task(message.add_reaction('📤'))
+                uploaded = await self.send_video(message, entry, title)
+                loop.create_task(message.remove_reaction('📤', self.bot.user))
+                try:
+                    await message.add_reaction('✅')
+                except DiscordException:
+                    pass
 
             except Exception as e:
-                log.warn(f'Exception occurred processing video {e} -- {os.path.getsize(f"{message.id}.mp4")}')
+                log.warning(f'Exception occurred processing video {match}: {e}')
 
                 try:
                     await message.add_reaction('❌')
@@ -259,63 +391,58 @@ class Video_DL(Cog):
 
             finally:
                 await message.remove_reaction('📥', self.bot.user)
-
-                if os.path.exists(f'{message.id}.mp4'):
-                    os.remove(f'{message.id}.mp4')
+                shutil.rmtree(workdir, ignore_errors=True)
 
         if uploaded:
-            try:
-                await uploaded.add_reaction("🗑️")
-            except DiscordException:
-                return
-            try:
-                await message.edit(suppress=True)
-            except DiscordException:
-                pass
-
-            def check(reaction: discord.Reaction, user: discord.User):
-                return (
-                    reaction.emoji == "🗑️"
-                    and user.id in [message.author.id, new_deleter]
-                    and reaction.message.id == uploaded.id
-                )
-
-            try:
-                await self.bot.wait_for('reaction_add', timeout=60 * 5, check=check)
-            except asyncio.TimeoutError:
-                await uploaded.remove_reaction("🗑️", self.bot.user)
-            else:
-                # if we are here, someone with the power to do so want's to delete the upload
-                await uploaded.delete()
-
-    @staticmethod
-    @timing(log=log)
-    def transcode_shrink(id, limit: float):
-        shutil.copyfile(f'{id}.mp4', 'in.mp4')
-        os.remove(f'{id}.mp4')
-        limit = limit * 8
+            # don't hold up the queue while we wait to see if they want it gone
+            loop.create_task(self.offer_delete(message, uploaded, new_deleter))
+
+    async def send_video(self, message: discord.Message, entry: CachedVideo, title: str) -> discord.Message:
+        """reply with a cached video, linking our earlier upload of it while that link still works."""
+        if self.reuse_attachments and (url := entry.reusable_attachment()):
+            return await message.reply(f"{title}\n{url}"[:2000], mention_author=False)
+        file = discord.File(self.cache.path(entry), 'vid.mp4')
+        uploaded = await message.reply(title, file=file, mention_author=False)
+        if uploaded.attachments:
+            changed = self.cache.set_attachment(entry, uploaded.attachments[0].url)
+            await asyncio.to_thread(self.cache.save, changed)
+        return uploaded
+
+    async def offer_delete(self, message: discord.Message, uploaded: discord.Message, new_deleter: Optional[int]):
         try:
-            video_length = math.ceil(float(subprocess.check_output(FFPROBE_CMD.split(' ')).decode("utf-8")))
-
-            if video_length > MAX_VIDEO_LENGTH:
-                raise commands.CommandInvokeError('Video is too large.')
-
-            target_total_bitrate = limit / video_length
-            buffer_size = math.floor(limit / BUFFER_CONSTANT)
-            target_video_bitrate = target_total_bitrate - AUDIO_BITRATE
+            await uploaded.add_reaction("🗑️")
+        except DiscordException:
+            return
+        try:
+            await message.edit(suppress=True)
+        except DiscordException:
+            pass
 
-            command_formatted = FFMPEG_CMD.format(
-                str(target_video_bitrate), str(AUDIO_BITRATE), str(buffer_size), str(id)
+        def check(reaction: discord.Reaction, user: discord.User):
+            return (
+                reaction.emoji == "🗑️"
+                and user.id in [message.author.id, new_deleter]
+                and reaction.message.id == uploaded.id
             )
 
-            subprocess.check_call(command_formatted.split(' '))
-
-        except Exception as e:
-            log.warn(f'Exception occurred transcoding video {e}')
+        try:
+            await self.bot.wait_for('reaction_add', timeout=60 * 5, check=check)
+        except asyncio.TimeoutError:
+            await uploaded.remove_reaction("🗑️", self.bot.user)
+        else:
+            # if we are here, someone with the power to do so want's to delete the upload
+            await uploaded.delete()
+            for attachment in uploaded.attachments:
+                await asyncio.to_thread(self.cache.save, self.cache.forget_attachment(attachment.url))
 
-        finally:
-            if os.path.exists('in.mp4'):
-                os.remove('in.mp4')
+    @staticmethod
+    @timing(log=log)
+    def transcode_shrink(directory: str, limit: float):
+        """shrink `directory`/video.mp4 to fit in `limit` bytes, in place."""
+        video = os.path.join(directory, 'video.mp4')
+        shrunk = os.path.join(directory, 'shrunk.mp4')
+        transcode.shrink(video, shrunk, limit, MAX_VIDEO_LENGTH)
+        os.replace(shrunk, video)
 
     @commands.command()
     @is_in_guild(791528974442299412)
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import discord
+import numpy as np
+from discord import app_commands
+
+from alexBot import voiceanalytics
+from alexBot.cache import LRUCache
+from alexBot.data import DAY
+from alexBot.tools import Cog
+from alexBot.voiceanalytics import LENGTH_LABELS, LeaderboardRow, SessionColumns
+from alexBot.voicesessions import VoiceSession
+
+if TYPE_CHECKING:
+    from bot import Bot
+
+log = logging.getLogger(__name__)
+
+MAX_TOP = 25  # most people a leaderboard lists; the cached board is always this long
+
+
+@dataclass
+class Period:
+    """one guild's sessions over the last `days` days, and what's been worked out from them so far"""
+
+    untilDay: int
+    since: float
+    until: float
+    sessions: SessionColumns
+    board: Optional[List[LeaderboardRow]] = None
+    heat: Optional[np.ndarray] = None
+    lengths: Optional[np.ndarray] = None
+
+    def add(self, userId: int, started: float, ended: float):
+        self.sessions = self.sessions.append(userId, started, ended)
+        self.board = self.heat = self.lengths = None
+
+
+@dataclass
+class Loading:
+    """a Period being read from the database, and the sessions logged while it is"""
+
+    untilDay: int
+    since: float
+    until: float
+    logged: List[Tuple[int, float, float]] = field(default_factory=list)
+    task: Optional["asyncio.Future[Period]"] = None
+
+
+def duration(seconds: float) -> str:
+    hours, seconds = divmod(int(seconds), 3600)
+    return f"{hours}h{seconds // 60:02d}m"
+
+
+class VoiceAnalytics(Cog):
+    def __init__(self, bot: "Bot"):
+        super().__init__(bot)
+        # (guild, days): period. any guild can ask for any of 366 periods, so they're bounded by size
+        self.periods: LRUCache[Tuple[int, int], Period] = LRUCache(
+            getattr(bot.config, 'voice_analytics_cache_bytes', 32 * 1024 * 1024)
+        )
+        self.loading: Dict[Tuple[int, int], Loading] = {}  # (guild, days): the read in flight for it
+
+    async def cog_load(self):
+        for name, description, callback in [
+            ("leaderboard", "who has spent the most time in voice here", self.voiceLeaderboard),
+            ("histogram", "when this server is in voice, and for how long", self.voiceHistogram),
+        ]:
+            self.bot.voiceCommandsGroup.add_command(
+                app_commands.Command(name=name, description=description, callback=callback)
+            )
+
+    async def cog_unload(self):
+        self.bot.voiceCommandsGroup.remove_command("leaderboard")
+        self.bot.voiceCommandsGroup.remove_command("histogram")
+
+    async def period(self, guildId: int, days: int) -> Period:
+        """the guild's sessions over the last `days` days (today included), loaded once per day and then kept current"""
+        untilDay = int(time.time() // DAY) + 1
+        key = (guildId, days)
+        period = self.periods.get(key)
+        if period is not None and period.untilDay == untilDay:
+            return period
+        loading = self.loading.get(key)
+        if loading is None or loading.untilDay != untilDay:
+            # everyone asking for it while it's read waits on the same read
+            loading = self.loading[key] = Loading(untilDay, (untilDay - days) * DAY, untilDay * DAY)
+            loading.task = asyncio.ensure_future(self.load(key, loading))
+        return await asyncio.shield(loading.task)
+
+    async def load(self, key: Tuple[int, int], loading: Loading) -> Period:
+        try:
+            rows = await self.bot.db.get_voice_sessions(key[0], loading.since, loading.until)
+        finally:
+            # from here on the listener adds to the Period instead, so there's no gap between them
+            if self.loading.get(key) is loading:
+                del self.loading[key]
+        # sessions logged during the read may or may not have made it into it
+        seen = {(userId, started) for userId, started, _ in rows}
+        rows = [*rows, *(row for row in loading.logged if (row[0], row[1]) not in seen)]
+        # anything cached for an earlier day is stale now too
+        for stale in [k for k, p in self.periods.items() if p.untilDay != loading.untilDay]:
+            self.periods.pop(stale)
+        period = Period(loading.untilDay, loading.since, loading.until, SessionColumns.from_rows(rows))
+        self.periods.put(key, period, period.sessions.nbytes)
+        return period
+
+    @Cog.listener()
+    async def on_voice_session_logged(self, session: VoiceSession):
+        if session.userId is None:
+            return
+        started = session.started.timestamp()
+        ended = started + session.duration.total_seconds()
+        for key, period in self.periods.items():
+            if key[0] == session.guildId and period.since <= started < period.until:
+                period.add(session.userId, started, ended)
+                self.periods.reweigh(key, period.sessions.nbytes)
+        for (guildId, _), loading in self.loading.items():
+            if guildId == session.guildId and loading.since <= started < loading.until:
+                loading.logged.append((session.userId, started, ended))
+
+    @app_commands.describe(days="how far back to look", top="how many people to list")
+    async def voiceLeaderboard(
+        self,
+        interaction: discord.Interaction,
+        days: app_commands.Range[int, 1, 366] = 30,
+        top: app_commands.Range[int, 1, MAX_TOP] = 10,
+    ):
+        """who has spent the most time in voice here"""
+        period = await self.period(interaction.guild_id, days)
+        if period.board is None:
+            period.board = voiceanalytics.leaderboard(period.sessions, MAX_TOP)
+        board = period.board[:top]
+        embed = discord.Embed(title=f"Time in voice, last {days} days")
+        if not board:
+            embed.description = "no finished voice sessions yet"
+        else:
+            embed.description = "\n".join(
+                f"`{rank:>2}.` <@{row.userId}> **{duration(row.seconds)}** "
+                f"over {row.sessions} session{'s' if row.sessions != 1 else ''}, median {duration(row.median)}"
+                for rank, row in enumerate(board, start=1)
+            )
+            embed.set_footer(
+                text=f"{len(period.sessions)} sessions, median {duration(float(np.median(period.sessions.lengths)))}"
+            )
+        await interaction.response.send_message(embed=embed, allowed_mentions=discord.AllowedMentions.none())
+
+    @app_commands.describe(days="how far back to look")
+    async def voiceHistogram(self, interaction: discord.Interaction, days: app_commands.Range[int, 1, 366] = 30):
+        """when this server is in voice, and for how long"""
+        period = await self.period(interaction.guild_id, days)
+        if not len(period.sessions):
+            await interaction.response.send_message("no finished voice sessions yet", ephemeral=True)
+            return
+        if period.heat is None:
+            period.heat = voiceanalytics.hour_heatmap(period.sessions, period.since, period.until)
+        if period.lengths is None:
+            period.lengths = voiceanalytics.length_histogram(period.sessions)
+
+        embed = discord.Embed(title=f"Voice activity, last {days} days")
+        busiest = np.unravel_index(np.argmax(period.heat), period.heat.shape)
+        embed.add_field(
+            name="By hour (UTC)",
+            value=f"```\n{voiceanalytics.render_heatmap(period.heat)}\n```"
+            f"busiest: {voiceanalytics.WEEKDAYS[busiest[0]]} {busiest[1]:02d}:00",
+            inline=False,
+        )
+        embed.add_field(
+            name="Session lengths",
+            value=f"```\n{voiceanalytics.render_bars(LENGTH_LABELS, period.lengths.tolist())}\n```",
+            inline=False,
+        )
+        await interaction.response.send_message(embed=embed)
+
+
+async def setup(bot: "Bot"):
+    await bot.add_cog(VoiceAnalytics(bot))
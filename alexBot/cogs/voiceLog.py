@@ -3,12 +3,13 @@
 import asyncio
 import datetime
 from asyncio import Task
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import discord
-from discord.member import VoiceState
 
 from ..tools import Cog
+from ..voiceevents import VoiceEvent, voice_handler
+from ..voiceoccupancy import VoiceLike
 
 NERDIOWO_GUILD_ID = 791528974442299412
 ADMIN_CATEGORY_ID = 822958326249816095
@@ -21,20 +22,17 @@ class VoiceLog(Cog):
         self.waiting_for_afk: Dict[int, Task] = {}
         self.beingShaken: Dict[int, bool] = {}
 
-    @Cog.listener()
-    async def on_voice_state_update(self, member: discord.Member, before: VoiceState, after: VoiceState):
+    @voice_handler()
+    async def on_voice_state_update(self, event: VoiceEvent):
         """
         only for actions in nerdiowo
         hide events that do with ther admin category in any way
         """
-        gd = await self.bot.db.get_guild_data(member.guild.id)
-        if gd.config.privateOnePersonVCs:
-            if after.channel and after.channel.user_limit == 1 and len(after.channel.members) == 1:
-                # give the user channel override for manage menbers
-                await after.channel.set_permissions(member, overwrite=discord.PermissionOverwrite(move_members=True))
-            if before.channel and before.channel.user_limit == 1:
-                # remove the user channel override for manage menbers
-                await before.channel.set_permissions(member, overwrite=None)
+        member = event.member
+        if event.channel_changed:
+            gd = await event.guild_data()
+            if gd.config.privateOnePersonVCs:
+                await self.one_person_permissions(event, event.before.channel, event.after.channel)
 
         if member.id in self.waiting_for_afk:
             self.waiting_for_afk[member.id].cancel()
@@ -42,11 +40,14 @@ class VoiceLog(Cog):
 
         if member.guild.id != NERDIOWO_GUILD_ID:
             return
-        if before.channel and before.channel.category_id == ADMIN_CATEGORY_ID:
-            before.channel = None
-        if after.channel and after.channel.category_id == ADMIN_CATEGORY_ID:
-            after.channel = None
-        if after.channel == member.guild.afk_channel:
+        # the voice states are shared with every other handler, so don't change them
+        before = event.before.channel
+        after = event.after.channel
+        if before and before.category_id == ADMIN_CATEGORY_ID:
+            before = None
+        if after and after.category_id == ADMIN_CATEGORY_ID:
+            after = None
+        if after is not None and after == member.guild.afk_channel:
             self.waiting_for_afk[member.id] = self.bot.loop.create_task(self.afk(member))
         channel = self.bot.get_channel(LOGGING_CHANNEL)
         if not channel:
@@ -57,22 +58,29 @@ class VoiceLog(Cog):
                 self.beingShaken[member.id] = True
             return
         stamp = discord.utils.format_dt(datetime.datetime.now(), style="T")
-        if before.channel is None and after.channel is not None:
+        if before is None and after is not None:
             # joined
-            await channel.send(f"{stamp} 🎤 {member.mention} joined {after.channel.name}")
-        elif before.channel is not None and after.channel is None:
+            await channel.send(f"{stamp} 🎤 {member.mention} joined {after.name}")
+        elif before is not None and after is None:
             # left
-            await channel.send(f"{stamp} ☎️ {member.mention} left {before.channel.name}")
-        elif before.channel != after.channel:
+            await channel.send(f"{stamp} ☎️ {member.mention} left {before.name}")
+        elif before != after:
             # moved
-            await channel.send(f"{stamp} 🎚️ {member.mention}  moved from {before.channel.name} to {after.channel.name}")
+            await channel.send(f"{stamp} 🎚️ {member.mention}  moved from {before.name} to {after.name}")
 
-        if after.channel and after.channel.user_limit == 1 and len(after.channel.members) == 1:
+        if event.channel_changed:
+            # with the admin category hidden, as above
+            await self.one_person_permissions(event, before, after)
+
+    @staticmethod
+    async def one_person_permissions(event: VoiceEvent, before: Optional[VoiceLike], after: Optional[VoiceLike]):
+        """let whoever is alone in a one person channel move people out of it, until they leave"""
+        if after and after.user_limit == 1 and event.bot.voice_events.occupancy.members_in(after.id) == 1:
             # give the user channel override for manage menbers
-            await after.channel.set_permissions(member, overwrite=discord.PermissionOverwrite(move_members=True))
-        if before.channel and before.channel.user_limit == 1:
+            await after.set_permissions(event.member, overwrite=discord.PermissionOverwrite(move_members=True))
+        if before and before.user_limit == 1:
             # remove the user channel override for manage menbers
-            await before.channel.set_permissions(member, overwrite=None)
+            await before.set_permissions(event.member, overwrite=None)
 
     async def afk(self, member: discord.Member):
         await asyncio.sleep(60 * 60)  # 1 hour
@@ -6,21 +6,16 @@ import discord
 import pydub
 import speech_recognition
 
-from ..tools import Cog
+from ..tools import Cog, MessageContext, message_handler
 
 log = logging.getLogger(__name__)
 
 
 class VoiceMessageTranscriber(Cog):
-    @Cog.listener()
-    async def on_message(self, message: discord.Message):
-        # message in a guild
-        if not message.guild:
-            return
-        if not (message.flags.value >> 13 and len(message.attachments) == 1):
-            return
-        log.debug(f"Getting guild data for {message.guild}")
-        gd = await self.bot.db.get_guild_data(message.guild.id)
+    @message_handler(guild_only=True, predicate=lambda self, ctx: ctx.is_voice_message)
+    async def on_message(self, ctx: MessageContext):
+        message = ctx.message
+        gd = await ctx.guild_data()
 
         if gd.config.transcribeVoiceMessages:
             if message.attachments[0].content_type != "audio/ogg":
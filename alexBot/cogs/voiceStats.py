@@ -1,19 +1,47 @@
-import asyncio
 import datetime
 import logging
+import math
 import time
-from typing import Optional
+from collections import defaultdict
+from typing import TYPE_CHECKING, AsyncContextManager, Dict, List, Optional, Tuple, Union
 
 import discord
 from discord import app_commands
 
 from alexBot.classes import GuildData, UserData, VoiceStat
+from alexBot.data import DAY
 from alexBot.tools import Cog
+from alexBot.voiceevents import VoiceEvent, VoiceEventKind, voice_handler
+from alexBot.voicesessions import SessionKey, VoiceSession, VoiceSessionTracker
+
+if TYPE_CHECKING:
+    from bot import Bot
 
 log = logging.getLogger(__name__)
 
 
+RECONNECT_GRACE = 30  # seconds someone can be gone before their session counts as over
+ANNOUNCE_GUILD = 791528974442299412
+ANNOUNCE_CHANNEL = 791530687102451712
+
+
+def percentile(values: List[float], p: float) -> float:
+    """nearest-rank percentile of already sorted values"""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def seconds(value: float) -> datetime.timedelta:
+    return datetime.timedelta(seconds=int(value))
+
+
 class VoiceStats(Cog):
+    def __init__(self, bot: "Bot"):
+        super().__init__(bot)
+        self.sessions = VoiceSessionTracker(
+            self.session_finished, grace=RECONNECT_GRACE, on_started=self.session_started
+        )
+        self.peaks: Dict[int, Tuple[int, int]] = {}  # guild: (day, most people in voice at once that day)
+
     async def cog_load(self):
         self.bot.voiceCommandsGroup.add_command(
             app_commands.Command(
@@ -22,148 +50,144 @@ class VoiceStats(Cog):
                 callback=self.voiceStats,
             )
         )
+        self.sessions.start()
+        if self.bot.is_ready():  # reloaded while running; on_ready won't come
+            await self.rebuild()
 
     async def cog_unload(self):
         self.bot.voiceCommandsGroup.remove_command("stats")
+        await self.sessions.stop()
 
     @Cog.listener()
-    async def on_voice_state_update(
-        self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState
-    ):
-        if before.channel is not None and after.channel is not None:  # check that joined or left a voice call
-            return
-        channel = before.channel or after.channel
+    async def on_ready(self):
+        await self.rebuild()
+
+    async def rebuild(self):
+        """
+        start sessions for everyone already in voice (after a restart, or a reconnect that may have missed events).
+        a session that was running before a restart carries on from its saved start.
+        """
+        live: Dict[SessionKey, int] = {}
+        for guild in self.bot.guilds:
+            if not (await self.bot.db.get_guild_data(guild.id)).config.collectVoiceData:
+                continue
+            # stage channels too: the live tracking counts joins and leaves in either
+            for vc in (*guild.voice_channels, *guild.stage_channels):
+                for member in vc.members:
+                    if not member.bot:
+                        live[(guild.id, member.id)] = vc.id
+                        live.setdefault((guild.id, None), vc.id)
+        started: Dict[SessionKey, datetime.datetime] = {}
+        for key in live:
+            if self.sessions.get(key) is None:
+                vs = await self.voice_stat(key)
+                if vs.currently_running:
+                    started[key] = vs.last_started
+        self.sessions.reconcile(live, started)
+        for guildId in {guildId for guildId, _ in live}:
+            await self.note_peak(guildId)
+        log.debug(f"rebuilt voice sessions, {len(self.sessions.sessions)} live")
+
+    @voice_handler(kinds=(VoiceEventKind.JOIN, VoiceEventKind.LEAVE), ignore_bots=True)
+    async def on_voice_state_update(self, event: VoiceEvent):
+        guild = event.guild
         # ?? can we gather data from this guild?
-        gd = await self.bot.db.get_guild_data(channel.guild.id)
+        gd = await event.guild_data()
         if not gd.config.collectVoiceData:
             return
 
-        # ?? are we getting an event for someone leaving?
-        if before.channel:
-            LEAVING = True
-        else:
-            LEAVING = False
-        # ?? were they the last person?
-        if len([m for m in channel.members if not m.bot]) == 0:
-            LAST = True
+        if event.kind is VoiceEventKind.JOIN:
+            self.sessions.join((guild.id, event.member.id), event.after.channel.id)
+            self.sessions.join((guild.id, None), event.after.channel.id)
+            await self.note_peak(guild.id)
         else:
-            LAST = False
-        if not LEAVING and len([m for m in after.channel.members if not m.bot]) == 1:
-            FIRST = True
-        else:
-            FIRST = False
-        if LEAVING and LAST:
-            # definitly ending of a call
-            await self.ending_a_call(channel, gd)
-
-        if not LEAVING and FIRST:
-            await self.starting_a_call(channel, gd)
+            self.sessions.leave((guild.id, event.member.id))
+            if event.guild_humans == 0:
+                self.sessions.leave((guild.id, None))
 
-        ud = await self.bot.db.get_user_data(member.id)
-        if LEAVING:
-            await self.member_leaving_call(member, channel, ud)
-        else:
-            await self.member_joining_call(member, channel, ud)
-
-        log.debug(f"{LAST=}, {LEAVING=}, {FIRST=}")
-
-    async def starting_a_call(self, channel: discord.VoiceChannel, guildData: GuildData):
-        log.debug(f"starting a call: {channel=}")
-        if guildData.voiceStat.recently_ended:
-            log.debug("late return: recently_ended is true")
-            return  # they reconnected
-        guildData.voiceStat.recently_ended = False
-        if guildData.voiceStat.currently_running:
-            log.debug("second call started in guild")
+    async def note_peak(self, guildId: int):
+        """save today's most-in-voice-at-once for a guild, when it goes up"""
+        day = int(time.time() // DAY)
+        active = self.sessions.active(guildId)
+        if self.peaks.get(guildId, (day, 0)) >= (day, active):
             return
-        guildData.voiceStat.last_started = datetime.datetime.now()
-        guildData.voiceStat.currently_running = True
+        self.peaks[guildId] = (day, active)
+        await self.bot.db.record_voice_peak(guildId, day, active)
 
-        await self.bot.db.save_guild_data(channel.guild.id, guildData)
+    async def voice_stat(self, key: SessionKey) -> VoiceStat:
+        guildId, userId = key
+        if userId is None:
+            return (await self.bot.db.get_guild_data(guildId)).voiceStat
+        return (await self.bot.db.get_user_data(userId)).voiceStat
 
-    async def member_joining_call(self, member: discord.Member, channel: discord.VoiceChannel, userData: UserData):
-        log.debug(f"{member=} joined {channel=}")
-        if userData.voiceStat.recently_ended:
-            log.debug("late return: recently_ended is true")
-            return  # they reconnected
+    def update_voice_stat(self, session: VoiceSession) -> AsyncContextManager[Union[GuildData, UserData]]:
+        if session.userId is None:
+            return self.bot.db.update_guild(session.guildId)
+        return self.bot.db.update_user(session.userId)
 
-        userData.voiceStat.recently_ended = False
+    def running_elsewhere(self, session: VoiceSession) -> Optional[VoiceSession]:
+        """the same person's session in another guild, if they have one. users have one VoiceStat for every guild."""
+        if session.userId is None:
+            return None
+        return next((other for other in self.sessions.of_user(session.userId) if other is not session), None)
 
-        userData.voiceStat.last_started = datetime.datetime.now()
-        userData.voiceStat.currently_running = True
+    async def session_started(self, session: VoiceSession):
+        """save when a session started, so it can carry on from there after a restart."""
+        async with self.update_voice_stat(session) as data:
+            vs = data.voiceStat
+            if vs.currently_running and self.running_elsewhere(session) is not None:
+                return
+            vs.last_started = session.started
+            vs.currently_running = True
 
-        await self.bot.db.save_user_data(member.id, userData)
+    async def session_finished(self, session: VoiceSession):
+        """a session's grace period ran out: log it, and fold it into the saved stats."""
+        length = session.duration
+        started = session.started.timestamp()
+        await self.bot.db.log_voice_session(
+            session.guildId, session.userId, session.channelId, started, started + length.total_seconds()
+        )
+        self.bot.dispatch('voice_session_logged', session)
+        async with self.update_voice_stat(session) as data:
+            self.record(data.voiceStat, session)
+            other = self.running_elsewhere(session)
+            if other is not None:
+                data.voiceStat.last_started = other.started
+                data.voiceStat.currently_running = True
 
-    async def member_leaving_call(self, member: discord.Member, channel: discord.VoiceChannel, userData: UserData):
-        log.debug(f"{member=} left {channel=}")
-        if not userData.voiceStat.currently_running:
-            # odd state, ignore
-            return
-        userData.voiceStat.recently_ended = True
-        await self.bot.db.save_user_data(member.id, userData)
-        await asyncio.sleep(30)  # wait 30 seconds for momnetary reconnects
-        userData = await self.bot.db.get_user_data(member.id)  # refresh data
-        if not userData.voiceStat.recently_ended:
-            log.debug("late return: recently_ended is false")
-
-            return  # they reconnected
-        userData.voiceStat.recently_ended = False
-
-        current_session_length = datetime.datetime.now() - userData.voiceStat.last_started
-        if userData.voiceStat.longest_session < current_session_length:
-            userData.voiceStat.longest_session = current_session_length
-
-        userData.voiceStat.average_duration_raw = (
-            (userData.voiceStat.total_sessions * userData.voiceStat.average_duration_raw)
-            + current_session_length.total_seconds()
-        ) / (userData.voiceStat.total_sessions + 1)
-        userData.voiceStat.total_sessions += 1
-        # check if user is active in another server we know about
-        for guild in member.mutual_guilds:
-            if guild.get_member(member.id).voice is not None:
-                log.debug(f"{member=} is active in {guild=}")
-                break
-        else:
-            userData.voiceStat.currently_running = False
-        await self.bot.db.save_user_data(member.id, userData)
-
-        return
-
-    async def ending_a_call(self, channel: discord.VoiceChannel, gd: GuildData):
-        log.debug(f"ending a call: {channel=}")
-        guild = channel.guild
-        if self.any_other_voice_chats(guild):
-            log.debug("late return: other VC in guild")
-            return  # the call continues in another channel
-        if not gd.voiceStat.currently_running:
-            # odd state, ignore
-            return
-        gd.voiceStat.recently_ended = True
-        await self.bot.db.save_guild_data(channel.guild.id, gd)
-        await asyncio.sleep(30)  # wait 30 seconds for momnetary reconnects
-        gd = await self.bot.db.get_guild_data(channel.guild.id)  # refresh data
-        if not gd.voiceStat.recently_ended:
-            log.debug("late return: recently_ended is false")
-            return
-        gd.voiceStat.recently_ended = False
-        current_session_length = datetime.datetime.now() - gd.voiceStat.last_started
-        if gd.voiceStat.longest_session < current_session_length:
-            gd.voiceStat.longest_session = current_session_length
-
-        gd.voiceStat.average_duration_raw = (
-            (gd.voiceStat.total_sessions * gd.voiceStat.average_duration_raw) + current_session_length.total_seconds()
-        ) / (gd.voiceStat.total_sessions + 1)
-        gd.voiceStat.total_sessions += 1
-        gd.voiceStat.currently_running = False
-        await self.bot.db.save_guild_data(channel.guild.id, gd)
-        if channel.guild.id == 791528974442299412:
+        if session.userId is None and session.guildId == ANNOUNCE_GUILD:
             log.debug("ending a call: alex's server")
-            await self.bot.get_channel(791530687102451712).send(
-                f"Voice chat ended. It started at <t:{int(time.mktime(gd.voiceStat.last_started.timetuple()))}:f>, and lasted for {current_session_length}"
+            await self.bot.get_channel(ANNOUNCE_CHANNEL).send(
+                f"Voice chat ended. It started at <t:{int(time.mktime(session.started.timetuple()))}:f>, and lasted for {length}"
             )
 
-    async def voiceStats(self, interaction: discord.Interaction, target: Optional[discord.User]):
-        """tells you how long your average, longest, and current voice sessions is."""
+    @staticmethod
+    def record(vs: VoiceStat, session: VoiceSession):
+        length = session.duration
+        vs.last_started = session.started
+        if vs.longest_session < length:
+            vs.longest_session = length
+        vs.average_duration_raw = ((vs.total_sessions * vs.average_duration_raw) + length.total_seconds()) / (
+            vs.total_sessions + 1
+        )
+        vs.total_sessions += 1
+        vs.currently_running = False
+
+    async def voiceStats(
+        self,
+        interaction: discord.Interaction,
+        target: Optional[discord.User],
+        days: Optional[app_commands.Range[int, 1, 366]] = None,
+    ):
+        """tells you how long your average, longest, and current voice sessions is.
+
+        Parameters
+        -----------
+        target: Optional[discord.User]
+            whose stats to show, instead of yours and the server's
+        days: Optional[int]
+            also show totals for this server over the last this many days
+        """
         targets = [interaction.user, interaction.guild] if target is None else [target]
         embeds = []
         for target in targets:
@@ -171,30 +195,64 @@ class VoiceStats(Cog):
             embed = discord.Embed()
             if isinstance(target, discord.Member):
                 vs = (await self.bot.db.get_user_data(target.id)).voiceStat
+                userId = target.id
+                session = self.sessions.get((interaction.guild_id, target.id))
                 embed.title = f"{target.display_name}'s Voice Stats"
                 embed.set_author(
                     name=target.display_name, icon_url=target.avatar.url if target.avatar else target.default_avatar.url
                 )
             elif isinstance(target, discord.Guild):
                 vs = (await self.bot.db.get_guild_data(target.id)).voiceStat
+                userId = None
+                session = self.sessions.get((target.id, None))
                 embed.title = f"{target.name}'s Voice Stats"
                 embed.set_author(name=target.name, icon_url=target.icon.url if target.icon else None)
             if vs is None:
                 return
-            if vs.currently_running:
+            if session is not None:
                 embed.add_field(
                     name="Current Session Length",
-                    value=datetime.timedelta(seconds=int((datetime.datetime.now() - vs.last_started).total_seconds())),
+                    value=datetime.timedelta(seconds=int(session.duration.total_seconds())),
                 )
             embed.add_field(name="longest session", value=vs.longest_session)
             embed.add_field(name="Average Session Length", value=vs.average_duration)
             embed.add_field(name="Total Sessions", value=vs.total_sessions)
+            if days is not None:
+                await self.add_history(embed, interaction.guild_id, userId, days)
             embeds.append(embed)
         await interaction.response.send_message(embeds=embeds)
 
-    @staticmethod
-    def any_other_voice_chats(guild: discord.Guild) -> bool:
-        return any([len([m for m in vc.members if not m.bot]) > 0 for vc in guild.voice_channels])
+    async def add_history(self, embed: discord.Embed, guildId: int, userId: Optional[int], days: int):
+        """totals over the last `days` days (today included), from the daily rollups and the session log"""
+        untilDay = int(time.time() // DAY) + 1
+        sinceDay = untilDay - days
+        rollups = await self.bot.db.get_voice_rollups(guildId, userId, sinceDay, untilDay)
+        lengths = await self.bot.db.get_voice_durations(guildId, userId, sinceDay * DAY, untilDay * DAY)
+        period = f"last {days} days" if days > 1 else "today"
+        if not lengths:
+            embed.add_field(name=f"Voice ({period})", value="no finished sessions", inline=False)
+            return
+
+        byDay: Dict[int, float] = defaultdict(float)
+        byChannel: Dict[int, float] = defaultdict(float)
+        for rollup in rollups:
+            byDay[rollup.day] += rollup.seconds
+            byChannel[rollup.channelId] += rollup.seconds
+        embed.add_field(name=f"Time in Voice ({period})", value=seconds(sum(lengths)))
+        embed.add_field(name=f"Sessions ({period})", value=len(lengths))
+        embed.add_field(
+            name="Median / 90th Percentile Session",
+            value=f"{seconds(percentile(lengths, 50))} / {seconds(percentile(lengths, 90))}",
+        )
+        busiestDay = max(byDay, key=byDay.get)
+        embed.add_field(name="Busiest Day", value=f"<t:{busiestDay * DAY}:D> ({seconds(byDay[busiestDay])})")
+        busiestChannel = max(byChannel, key=byChannel.get)
+        if busiestChannel:
+            embed.add_field(name="Busiest Channel", value=f"<#{busiestChannel}> ({seconds(byChannel[busiestChannel])})")
+        if userId is None:
+            peak, peakDay = await self.bot.db.get_voice_peak(guildId, sinceDay, untilDay)
+            if peakDay is not None:
+                embed.add_field(name="Most in Voice at Once", value=f"{peak}, <t:{peakDay * DAY}:D>")
 
 
 async def setup(bot):
@@ -17,7 +17,8 @@ from asyncgTTS import (
 from discord import app_commands
 
 from alexBot.fixes import FFmpegPCMAudioBytes
-from alexBot.tools import Cog
+from alexBot.tools import Cog, MessageContext, message_handler
+from alexBot.voiceevents import VoiceEvent, VoiceEventKind, voice_handler
 
 log = logging.getLogger(__name__)
 
@@ -43,16 +44,20 @@ class VoiceTTS(Cog):
         await self.gtts.__aexit__(None, None, None)
         self.bot.voiceCommandsGroup.remove_command("tts")
 
-    @Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if message.author.id in self.runningTTS and message.channel.id == self.runningTTS[message.author.id][0].id:
-            await self.sendTTS(message.content, self.runningTTS[message.author.id])
+    @message_handler(
+        predicate=lambda self, ctx: ctx.author.id in self.runningTTS
+        and ctx.channel.id == self.runningTTS[ctx.author.id][0].id
+    )
+    async def on_message(self, ctx: MessageContext):
+        await self.sendTTS(ctx.message.content, self.runningTTS[ctx.author.id])
 
-    @Cog.listener()
-    async def on_voice_state_update(
-        self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState
-    ):
-        if member.id in self.runningTTS and after.channel != self.runningTTS[member.id][1].channel:
+    @voice_handler(
+        kinds=(VoiceEventKind.LEAVE, VoiceEventKind.MOVE),
+        predicate=lambda self, event: event.member.id in self.runningTTS,
+    )
+    async def on_voice_state_update(self, event: VoiceEvent):
+        member = event.member
+        if event.after.channel != self.runningTTS[member.id][1].channel:
             await self.runningTTS[member.id][1].disconnect()
             del self.runningTTS[member.id]
 
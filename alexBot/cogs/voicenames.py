@@ -5,6 +5,7 @@ import discord
 from discord import app_commands
 
 from ..tools import Cog
+from ..voiceevents import VoiceEvent, VoiceEventKind, voice_handler
 
 if TYPE_CHECKING:
     from bot import Bot
@@ -37,13 +38,10 @@ class VoiceNames(Cog):
         self.namesGroup.remove_command('remove')
         self.bot.voiceCommandsGroup.remove_command('names')
 
-    @Cog.listener()
-    async def on_voice_state_update(
-        self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState
-    ):
-        if after.channel is None:
-            return
-        name = await self.bot.db.get_voice_name(after.channel.id, member.id)
+    @voice_handler(kinds=(VoiceEventKind.JOIN, VoiceEventKind.MOVE))
+    async def on_voice_state_update(self, event: VoiceEvent):
+        member = event.member
+        name = await self.bot.db.get_voice_name(event.after.channel.id, member.id)
         if name:
             try:
                 await member.edit(nick=name)
@@ -1,184 +1,684 @@
+import asyncio
 import dataclasses
-import json
-from typing import List, Optional
+import datetime
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 import aiosqlite
+import humanize
+from discord.ext import commands, tasks
 
-from alexBot.classes import ButtonRole, ButtonType, FeedConfig, GuildData, MovieSuggestion, RecurringReminder, UserData
+from alexBot.classes import (
+    ButtonRole,
+    ButtonType,
+    FeedConfig,
+    GuildData,
+    Highlight,
+    MovieSuggestion,
+    RecurringReminder,
+    UserData,
+    VoiceRollup,
+)
 
+from . import maintenance, serialization
+from .cache import LRUCache
+from .instrumentation import BUCKETS_MS, QueryMonitor, instrumented
+from .migrations import migrate
 from .tools import Cog
+from .writequeue import WriteQueue
+
+if TYPE_CHECKING:
+    from bot import Bot
+
+log = logging.getLogger(__name__)
+
+# applied to every connection when it is opened. journal_mode is persistent in the file,
+# the rest are per-connection.
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",  # safe with WAL, only the last transaction can be lost on power loss
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8192",  # 8 MiB page cache
+    "PRAGMA mmap_size=67108864",  # 64 MiB
+    "PRAGMA busy_timeout=5000",
+]
+
+# tables holding one json blob per id, cached in memory by Data. see migrations._base_tables for why they aren't typed
+TABLE_KEYS = {
+    'guilds': 'guildId',
+    'users': 'userId',
+}
+CACHE_DEFAULT_WEIGHT = 256  # rough size of a serialized entry we haven't written yet
+DAY = 24 * 60 * 60  # voice rollups are by unix day
+
+_D = TypeVar("_D", GuildData, UserData)
+
+# tables with one row per object, and the columns (besides the `id` primary key) they are stored in
+ROW_TABLES = {
+    FeedConfig: ('rssFeeds', ('tagId', 'feedUrl')),
+    ButtonRole: ('buttonRoles', ('role', 'message', 'type', 'label', 'emoji')),
+    MovieSuggestion: ('movieSuggestions', ('title', 'watched', 'suggestor', 'watchdate')),
+    RecurringReminder: ('recurringReminders', ('target', 'message', 'UTC_minute', 'require_clearing')),
+    Highlight: ('highlights', ('guildId', 'userId', 'keyword')),
+}
+
+_R = TypeVar("_R", FeedConfig, ButtonRole, MovieSuggestion, RecurringReminder, Highlight)
+
+
+def _from_row(cls: Type[_R], columns: Tuple[str, ...], row: Tuple) -> _R:
+    """build a dataclass from a row, converting the columns sqlite can't store natively"""
+    types = {field.name: field.type for field in dataclasses.fields(cls)}
+    values = {}
+    for column, value in zip(columns, row):
+        if value is not None and types[column] in (bool, ButtonType):
+            value = types[column](value)
+        values[column] = value
+    return cls(**values)
 
 
 class Data(Cog):
+    """
+    owns the connections to the database. there is a single writer connection, guarded by `write_lock`,
+    and a small pool of read only connections. WAL mode lets the readers run while a write is in progress.
+
+    feeds, button roles, movies, reminders and voice names are read into memory once at startup; reads of them
+    return copies of that state, and writes update it after they are committed.
+
+    all writes go through `queue`, which commits them in batches. GuildData and UserData are also kept in an
+    in memory LRU cache; saving those only updates the cache and queues the write without waiting for it.
+    """
+
+    def __init__(self, bot: "Bot"):
+        super().__init__(bot)
+        self.path: str = bot.config.db or 'configs.db'
+        self.writer: Optional[aiosqlite.Connection] = None
+        self.write_lock = asyncio.Lock()
+        self.readers: "asyncio.Queue[aiosqlite.Connection]" = asyncio.Queue()
+        self._connections: List[aiosqlite.Connection] = []
+        self.cache: LRUCache[Tuple[str, int], Union[GuildData, UserData]] = LRUCache(
+            getattr(bot.config, 'db_cache_bytes', 4 * 1024 * 1024), CACHE_DEFAULT_WEIGHT
+        )
+        self.dirty: Dict[Tuple[str, int], Union[GuildData, UserData]] = {}
+        # locks for update_guild / update_user. entries go away once nobody holds or waits on them.
+        self._locks: "weakref.WeakValueDictionary[Tuple[str, int], asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.queue = WriteQueue(
+            self.write,
+            getattr(bot.config, 'db_commit_interval', 50) / 1000,
+            getattr(bot.config, 'db_commit_batch', 500),
+        )
+        # the small tables, preloaded in cog_load. rows are keyed by id, voice names by (channelId, userId).
+        self.rows: Dict[type, Dict[int, Any]] = {cls: {} for cls in ROW_TABLES}
+        self.voice_names: Dict[Tuple[int, int], str] = {}
+        self.monitor = QueryMonitor(getattr(bot.config, 'db_slow_query_ms', 100))
+
+    async def cog_load(self):
+        version = await asyncio.to_thread(migrate, self.path)
+        log.info(f"{self.path} is at schema version {version}")
+        self.writer = await self._connect()
+        for _ in range(getattr(self.bot.config, 'db_readers', 4)):
+            self.readers.put_nowait(await self._connect(readonly=True))
+        log.info(f"opened {len(self._connections)} connections to {self.path}")
+        await self._preload()
+        self.queue.start()
+        self.maintenance_loop.change_interval(
+            time=datetime.time(hour=getattr(self.bot.config, 'db_maintenance_hour', 10), tzinfo=datetime.timezone.utc)
+        )
+        self.maintenance_loop.start()
+
+    async def cog_unload(self):
+        self.maintenance_loop.cancel()
+        # anything saved but not yet committed goes in the final commit, whatever happened to its queued write
+        for (table, id), data in list(self.dirty.items()):
+            self._save_cached(table, id, data)
+        await self.queue.stop()
+        async with self.write_lock:
+            for conn in self._connections:
+                await conn.close()
+            self._connections.clear()
+            self.writer = None
+            self.readers = asyncio.Queue()
+
+    async def _connect(self, readonly: bool = False) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.path)
+        for pragma in PRAGMAS:
+            await conn.execute(pragma)
+        if readonly:
+            await conn.execute("PRAGMA query_only=1")
+        self._connections.append(conn)
+        return conn
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        borrow a reader connection from the pool. waits if all of them are in use.
+        """
+        conn = await self.readers.get()
+        try:
+            yield conn
+        finally:
+            self.readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        hold the writer connection for one transaction. commits on exit, rolls back if the block raises.
+        """
+        async with self.write_lock:
+            try:
+                yield self.writer
+            except BaseException:
+                await self.writer.rollback()
+                raise
+            else:
+                await self.writer.commit()
+
+    async def _load_cached(self, table: str, id: int, cls: Type[_D]) -> _D:
+        key = (table, id)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        if key in self.dirty:
+            # evicted before it was flushed, the dirty copy is the newest one
+            data = self.dirty[key]
+            self.cache.put(key, data, CACHE_DEFAULT_WEIGHT)
+            return data
+        async with self.read() as conn:
+            async with conn.execute(f"SELECT data FROM {table} WHERE {TABLE_KEYS[table]}=?", (id,)) as cur:
+                row = await cur.fetchone()
+        if key in self.cache:
+            # saved while we were reading, that copy wins
+            return self.cache.get(key)
+        if row:
+            data = serialization.loads(cls, row[0])
+            self.cache.put(key, data, len(row[0]))
+        else:
+            data = cls()
+            self.cache.put(key, data, CACHE_DEFAULT_WEIGHT)
+        return data
+
+    def _save_cached(self, table: str, id: int, data: Union[GuildData, UserData]):
+        key = (table, id)
+        self.cache.put(key, data)
+        self.dirty[key] = data
+        self.queue.submit(
+            f"REPLACE INTO {table} ({TABLE_KEYS[table]}, data) VALUES (?,?)",
+            lambda: (id, self._serialize(key, data)),
+            key=key,
+            wait=False,
+            on_commit=lambda: self._committed(key, data),
+        )
+
+    def _serialize(self, key: Tuple[str, int], data: Union[GuildData, UserData]) -> str:
+        raw = serialization.dumps(data)
+        self.cache.reweigh(key, len(raw))
+        return raw
+
+    def _committed(self, key: Tuple[str, int], data: Union[GuildData, UserData]):
+        if self.dirty.get(key) is data:
+            del self.dirty[key]
+
+    def invalidate(self, table: str, id: int):
+        """
+        drop a cached entry so the next get reads it from the database again. pending writes are kept.
+        """
+        self.cache.pop((table, id))
+
+    @instrumented
+    async def flush(self):
+        """
+        commit every queued write now, instead of waiting for the write queue.
+        """
+        await self.queue.commit()
+
+    def cache_stats(self) -> Dict[str, int]:
+        return {**self.cache.stats(), "dirty": len(self.dirty)}
+
+    def write_stats(self) -> Dict[str, Union[int, float]]:
+        return self.queue.stats()
+
+    @commands.group(name="db", invoke_without_command=True)
+    @commands.is_owner()
+    async def db_stats(self, ctx: commands.Context):
+        """latency of every Data method, plus cache and write queue stats."""
+        paginator = commands.Paginator()
+        paginator.add_line(
+            f"{'method':<24} {'calls':>7} {'errors':>6} {'avg':>7} {'p50':>6} {'p95':>6} {'max':>8} {'rows':>7}  top caller"
+        )
+        for name, stats in sorted(self.monitor.stats.items(), key=lambda item: item[1].total_ms, reverse=True):
+            caller, calls = stats.callers.most_common(1)[0]
+            paginator.add_line(
+                f"{name:<24} {stats.count:>7} {stats.errors:>6} {stats.avg_ms:>7.2f} {stats.percentile(0.5):>6} "
+                f"{stats.percentile(0.95):>6} {stats.max_ms:>8.2f} {stats.rows:>7}  {caller} ({calls})"
+            )
+        paginator.add_line(f"buckets (ms): {', '.join(str(bound) for bound in BUCKETS_MS)}, inf")
+        paginator.add_line()
+        paginator.add_line(f"cache: {self.cache_stats()}")
+        paginator.add_line(f"writes: {self.write_stats()}")
+        for page in paginator.pages:
+            await ctx.send(page)
+
+    @db_stats.command(name="slow")
+    @commands.is_owner()
+    async def db_slow(self, ctx: commands.Context):
+        """the slowest recent Data calls, over the db_slow_query_ms threshold."""
+        if not self.monitor.slow_log:
+            await ctx.send(f"no calls slower than {self.monitor.slow_ms}ms")
+            return
+        paginator = commands.Paginator()
+        for entry in reversed(self.monitor.slow_log):
+            paginator.add_line(
+                f"{entry.when:%H:%M:%S} {entry.ms:>8.1f}ms {entry.name} from {entry.caller}, "
+                f"{'failed' if entry.failed else f'{entry.rows} rows'} {entry.args}"
+            )
+        for page in paginator.pages:
+            await ctx.send(page)
+
+    @db_stats.command(name="reset")
+    @commands.is_owner()
+    async def db_reset(self, ctx: commands.Context):
+        """clear the latency histograms and the slow call log."""
+        self.monitor.reset()
+        await ctx.send("reset database stats")
+
+    async def snapshot(self) -> str:
+        """
+        take an online snapshot into db_backup_dir, keeping the newest db_backup_keep of them.
+        """
+        await self.flush()
+        target = await asyncio.to_thread(
+            maintenance.snapshot,
+            self.path,
+            getattr(self.bot.config, 'db_backup_dir', 'backups'),
+            getattr(self.bot.config, 'db_backup_keep', 7),
+        )
+        log.info(f"snapshot of {self.path} saved to {target}")
+        return str(target)
+
+    async def compact(self) -> Dict[str, Union[int, float, str]]:
+        """
+        incremental vacuum and analyze. holds the write lock so queued writes wait instead of hitting a busy database.
+        """
+        await self.flush()
+        async with self.write_lock:
+            return await asyncio.to_thread(maintenance.compact, self.path)
+
+    async def size_report(self) -> Dict[str, Union[int, float, str]]:
+        return await asyncio.to_thread(maintenance.size_report, self.path)
+
+    @tasks.loop(time=datetime.time(hour=10, tzinfo=datetime.timezone.utc))
+    async def maintenance_loop(self):
+        """nightly snapshot, then compaction, at db_maintenance_hour UTC."""
+        try:
+            await self.snapshot()
+            await self.compact()
+        except Exception as e:
+            log.exception(e)
+
+    @db_stats.command(name="size")
+    @commands.is_owner()
+    async def db_size(self, ctx: commands.Context):
+        """database size, fragmentation, and the snapshots on disk."""
+        report = await self.size_report()
+        snapshots = maintenance.list_snapshots(self.path, getattr(self.bot.config, 'db_backup_dir', 'backups'))
+        await ctx.send(
+            f"size: {humanize.naturalsize(report['size_bytes'])}, free: {humanize.naturalsize(report['free_bytes'])} "
+            f"({report['fragmentation']:.1%}), wal: {humanize.naturalsize(report['wal_bytes'])}, "
+            f"auto vacuum: {report['auto_vacuum']}\n"
+            f"{len(snapshots)} snapshots{f', newest is `{snapshots[-1].name}`' if snapshots else ''}"
+        )
+
+    @db_stats.command(name="snapshot")
+    @commands.is_owner()
+    async def db_snapshot(self, ctx: commands.Context):
+        """take a snapshot of the database now."""
+        async with ctx.typing():
+            target = await self.snapshot()
+        await ctx.send(f"saved snapshot to `{target}`")
+
+    @db_stats.command(name="compact")
+    @commands.is_owner()
+    async def db_compact(self, ctx: commands.Context):
+        """run the vacuum and analyze step of the nightly maintenance now."""
+        async with ctx.typing():
+            report = await self.compact()
+        await ctx.send(
+            f"compacted, now {humanize.naturalsize(report['size_bytes'])} with {report['fragmentation']:.1%} free"
+        )
+
+    @instrumented
     async def get_guild_data(self, guildId: int) -> GuildData:
         """
         used to retrive a GuildData from the database. see save_guild_data to save it back.
+        the returned object is shared with the cache, save it back after changing it.
         """
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            async with conn.execute("SELECT data FROM guilds WHERE guildId=?", (guildId,)) as cur:
-                data = await cur.fetchone()
-                if not data:
-                    return GuildData()
-                raw = json.loads(data[0])
-                return GuildData.from_dict(raw)
+        return await self._load_cached('guilds', guildId, GuildData)
 
+    @instrumented
     async def save_guild_data(self, guildId: int, data: GuildData):
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            await conn.execute(
-                "REPLACE INTO guilds (guildId, data) VALUES (?,?)", (guildId, json.dumps(dataclasses.asdict(data)))
-            )
-            await conn.commit()
+        """
+        replaces the cached GuildData. the write is queued, this doesn't wait for it.
+        """
+        self._save_cached('guilds', guildId, data)
 
+    @instrumented
     async def get_user_data(self, userId: int) -> UserData:
         """
-        used to retrive a GuildData from the database. see save_guild_data to save it back.
+        used to retrive a UserData from the database. see save_user_data to save it back.
+        the returned object is shared with the cache, save it back after changing it.
         """
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            async with conn.execute("SELECT data FROM users WHERE userId=?", (userId,)) as cur:
-                data = await cur.fetchone()
-                if not data:
-                    return UserData()
-                raw = json.loads(data[0])
-                return UserData.from_dict(raw)
+        return await self._load_cached('users', userId, UserData)
 
+    @instrumented
     async def save_user_data(self, userId: int, data: UserData):
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            await conn.execute(
-                "REPLACE INTO users (userId, data) VALUES (?,?)", (userId, json.dumps(dataclasses.asdict(data)))
-            )
-            await conn.commit()
+        """
+        replaces the cached UserData. the write is queued, this doesn't wait for it.
+        """
+        self._save_cached('users', userId, data)
+
+    def _lock(self, key: Tuple[str, int]) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    @asynccontextmanager
+    async def _update(self, table: str, id: int, cls: Type[_D]) -> AsyncIterator[_D]:
+        async with self._lock((table, id)):
+            current = await self._load_cached(table, id, cls)
+            before = serialization.dumps(current)
+            # work on a copy, so a block that raises halfway leaves the cached object untouched
+            data = serialization.loads(cls, before)
+            yield data
+            if serialization.dumps(data) != before:
+                self._save_cached(table, id, data)
+
+    def update_guild(self, guildId: int) -> AsyncContextManager[GuildData]:
+        """
+        read-modify-write a GuildData: `async with db.update_guild(id) as gd:`.
+        other update_guild blocks for the same guild wait until this one exits. changes are saved when the block
+        exits normally and are discarded if it raises. all changes land in the same queued write.
+        """
+        return self._update('guilds', guildId, GuildData)
+
+    def update_user(self, userId: int) -> AsyncContextManager[UserData]:
+        """
+        read-modify-write a UserData: `async with db.update_user(id) as ud:`. see update_guild.
+        """
+        return self._update('users', userId, UserData)
+
+    async def _preload(self):
+        """
+        read the small tables into memory. after this, reads of them never touch the database.
+        """
+        for cls, (table, columns) in ROW_TABLES.items():
+            async with self.read() as conn:
+                async with conn.execute(f"SELECT id, {', '.join(columns)} FROM {table}") as cur:
+                    rows = [_from_row(cls, ('id', *columns), row) for row in await cur.fetchall()]
+            self.rows[cls] = {row.id: row for row in rows}
+        async with self.read() as conn:
+            async with conn.execute("SELECT channelId, userId, name FROM voiceNames") as cur:
+                self.voice_names = {(row[0], row[1]): row[2] for row in await cur.fetchall()}
+        log.info(
+            f"preloaded {sum(len(rows) for rows in self.rows.values())} rows and {len(self.voice_names)} voice names"
+        )
+
+    def _select_rows(self, cls: Type[_R]) -> List[_R]:
+        # copies, so callers can change them freely without touching the preloaded state
+        return [dataclasses.replace(row) for row in self.rows[cls].values()]
+
+    async def _insert_row(self, obj: _R) -> _R:
+        table, columns = ROW_TABLES[type(obj)]
+        obj.id = await self.queue.submit(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [getattr(obj, column) for column in columns],
+        )
+        self.rows[type(obj)][obj.id] = dataclasses.replace(obj)
+        return obj
 
+    async def _update_row(self, obj: _R):
+        table, columns = ROW_TABLES[type(obj)]
+        await self.queue.submit(
+            f"UPDATE {table} SET {', '.join(f'{column}=?' for column in columns)} WHERE id=?",
+            [*(getattr(obj, column) for column in columns), obj.id],
+            key=(table, obj.id),
+        )
+        self.rows[type(obj)][obj.id] = dataclasses.replace(obj)
+
+    async def _delete_row(self, cls: Type[_R], id: int):
+        table, _ = ROW_TABLES[cls]
+        await self.queue.submit(f"DELETE FROM {table} WHERE id=?", (id,), key=(table, id))
+        self.rows[cls].pop(id, None)
+
+    @instrumented
     async def get_feeds(self) -> List[FeedConfig]:
         """
         fetch all feeds
         """
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            async with conn.execute("SELECT data FROM rssFeeds") as cur:
-                data = await cur.fetchall()
-                feeds = []
-                for row in data:
-                    feeds.append(FeedConfig(**json.loads(row[0])))
-                return feeds
+        return self._select_rows(FeedConfig)
 
-    async def save_feeds(self, feeds: List[FeedConfig]):
+    @instrumented
+    async def add_feed(self, feed: FeedConfig) -> FeedConfig:
         """
-        deletes all feeds, then saves the all of them again
+        saves a new feed, and sets its id.
         """
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            await conn.execute("DELETE FROM rssFeeds")
-            for feed in feeds:
-                await conn.execute("INSERT INTO rssFeeds (data) VALUES (?)", (json.dumps(dataclasses.asdict(feed)),))
-            await conn.commit()
+        return await self._insert_row(feed)
 
+    @instrumented
+    async def delete_feed(self, feedId: int):
+        await self._delete_row(FeedConfig, feedId)
+
+    @instrumented
     async def get_feed_data(self, feedId: str) -> Optional[int]:
         """
         used to get the latest feed entry ID from the database. see save_feed_data to save it back.
         """
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
+        async with self.read() as conn:
             async with conn.execute("SELECT data FROM rssFeedLastPosted WHERE channelfeed=?", (feedId,)) as cur:
                 data = await cur.fetchone()
                 if not data:
                     return None
                 return int(data[0])
 
+    @instrumented
     async def save_feed_data(self, feedId: str, data: int):
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            await conn.execute("REPLACE INTO rssFeedLastPosted (channelfeed, data) VALUES (?,?)", (feedId, str(data)))
-            await conn.commit()
+        await self.queue.submit(
+            "REPLACE INTO rssFeedLastPosted (channelfeed, data) VALUES (?,?)",
+            (feedId, str(data)),
+            key=('rssFeedLastPosted', feedId),
+        )
 
+    @instrumented
     async def get_roles_data(self) -> List[ButtonRole]:
         """
-        fetch all roles for a givin guild
+        fetch all button roles
         """
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            async with conn.execute("SELECT data FROM buttonRoles") as cur:
-                data = await cur.fetchall()
-                roles = []
-                for row in data:
-                    roles.append(ButtonRole(**json.loads(row[0])))
-                if not data:
-                    return []
-                for role in roles:
-                    role.type = ButtonType(role.type)
-                return roles
+        return self._select_rows(ButtonRole)
 
-    async def save_roles_data(self, data: List[ButtonRole]):
+    @instrumented
+    async def add_role(self, role: ButtonRole) -> ButtonRole:
         """
-        deletes all roles, then saves the all of them again
+        saves a new button role, and sets its id.
         """
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            await conn.execute("DELETE FROM buttonRoles")
-            for role in data:
-                await conn.execute("INSERT INTO buttonRoles (data) VALUES (?)", (json.dumps(dataclasses.asdict(role)),))
-            await conn.commit()
+        return await self._insert_row(role)
 
+    @instrumented
+    async def update_role(self, role: ButtonRole):
+        await self._update_row(role)
+
+    @instrumented
+    async def delete_role(self, roleId: int):
+        await self._delete_row(ButtonRole, roleId)
+
+    @instrumented
     async def get_movies_data(self) -> List[MovieSuggestion]:
         """
-        fetch all movies for a givin guild
+        fetch all movies
         """
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            async with conn.execute("SELECT data FROM movieSuggestions") as cur:
-                data = await cur.fetchall()
-                movies = []
-                for row in data:
-                    movies.append(MovieSuggestion(**json.loads(row[0])))
-                if not data:
-                    return []
-                return movies
-
-    async def save_movies_data(self, data: List[MovieSuggestion]):
-        """
-        deletes all movies, then saves the all of them again
-        """
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            await conn.execute("DELETE FROM movieSuggestions")
-            for movie in data:
-                await conn.execute(
-                    "INSERT INTO movieSuggestions (data) VALUES (?)", (json.dumps(dataclasses.asdict(movie)),)
-                )
-            await conn.commit()
-
-    async def get_recurring_reminders(self):
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            async with conn.execute("SELECT data FROM recurringReminders") as cur:
-                data = await cur.fetchall()
-                reminders = []
-                for row in data:
-                    reminders.append(RecurringReminder(**json.loads(row[0])))
-                if not data:
-                    return []
-                return reminders
-
-    async def save_recurring_reminders(self, reminders: List[RecurringReminder]):
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            await conn.execute("DELETE FROM recurringReminders")
-            for reminder in reminders:
-                await conn.execute(
-                    "INSERT INTO recurringReminders (data) VALUES (?)", (json.dumps(dataclasses.asdict(reminder)),)
-                )
-            await conn.commit()
-
-    async def get_voice_name(self, channelId: int, memherId: int):
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
+        return self._select_rows(MovieSuggestion)
+
+    @instrumented
+    async def add_movie(self, movie: MovieSuggestion) -> MovieSuggestion:
+        """
+        saves a new movie suggestion, and sets its id.
+        """
+        return await self._insert_row(movie)
+
+    @instrumented
+    async def update_movie(self, movie: MovieSuggestion):
+        await self._update_row(movie)
+
+    @instrumented
+    async def delete_movie(self, movieId: int):
+        await self._delete_row(MovieSuggestion, movieId)
+
+    @instrumented
+    async def get_recurring_reminders(self) -> List[RecurringReminder]:
+        return self._select_rows(RecurringReminder)
+
+    @instrumented
+    async def add_recurring_reminder(self, reminder: RecurringReminder) -> RecurringReminder:
+        """
+        saves a new recurring reminder, and sets its id.
+        """
+        return await self._insert_row(reminder)
+
+    @instrumented
+    async def delete_recurring_reminder(self, reminderId: int):
+        await self._delete_row(RecurringReminder, reminderId)
+
+    @instrumented
+    async def get_highlights(self, guildId: Optional[int] = None) -> List[Highlight]:
+        """
+        fetch every highlight subscription, or only those of one guild
+        """
+        return [h for h in self._select_rows(Highlight) if guildId is None or h.guildId == guildId]
+
+    @instrumented
+    async def add_highlight(self, highlight: Highlight) -> Highlight:
+        """
+        saves a new highlight subscription, and sets its id.
+        """
+        return await self._insert_row(highlight)
+
+    @instrumented
+    async def delete_highlight(self, highlightId: int):
+        await self._delete_row(Highlight, highlightId)
+
+    @instrumented
+    async def log_voice_session(
+        self, guildId: int, userId: Optional[int], channelId: Optional[int], started: float, ended: float
+    ):
+        """
+        append a finished voice session (unix timestamps) to the log, and add it to that day's rollup.
+        userId None is the guild's call as a whole.
+        """
+        userId = userId or 0
+        seconds = ended - started
+        await asyncio.gather(
+            self.queue.submit(
+                "INSERT INTO voiceSessions (guildId, userId, channelId, started, ended) VALUES (?,?,?,?,?)",
+                (guildId, userId, channelId, started, ended),
+            ),
+            self.queue.submit(
+                """INSERT INTO voiceDaily (guildId, userId, day, channelId, seconds, sessions, longest)
+                   VALUES (?,?,?,?,?,1,?)
+                   ON CONFLICT (guildId, userId, day, channelId) DO UPDATE
+                   SET seconds=seconds + excluded.seconds, sessions=sessions + 1, longest=MAX(longest, excluded.longest)""",
+                (guildId, userId, int(started // DAY), channelId or 0, seconds, seconds),
+            ),
+        )
+
+    @instrumented
+    async def record_voice_peak(self, guildId: int, day: int, peak: int):
+        """raise a guild's record of most people in voice at once on `day`, if `peak` beats it."""
+        await self.queue.submit(
+            """INSERT INTO voicePeaks (guildId, day, peak) VALUES (?,?,?)
+               ON CONFLICT (guildId, day) DO UPDATE SET peak=MAX(peak, excluded.peak)""",
+            (guildId, day, peak),
+            key=('voicePeaks', guildId, day),
+        )
+
+    @instrumented
+    async def get_voice_rollups(
+        self, guildId: int, userId: Optional[int], sinceDay: int, untilDay: int
+    ) -> List[VoiceRollup]:
+        """the daily rollups for a user (or the guild's call, userId None) in a guild, for days in [sinceDay, untilDay)"""
+        async with self.read() as conn:
             async with conn.execute(
-                "SELECT name FROM voiceNames WHERE channelId=? AND userId=?", (channelId, memherId)
+                """SELECT day, channelId, seconds, sessions, longest FROM voiceDaily
+                   WHERE guildId=? AND userId=? AND day >= ? AND day < ?""",
+                (guildId, userId or 0, sinceDay, untilDay),
             ) as cur:
-                data = await cur.fetchone()
-                if not data:
-                    return None
-                return data[0]
+                return [VoiceRollup(*row) for row in await cur.fetchall()]
+
+    @instrumented
+    async def get_voice_durations(self, guildId: int, userId: Optional[int], since: float, until: float) -> List[float]:
+        """the lengths in seconds of the sessions that started in [since, until), shortest first"""
+        async with self.read() as conn:
+            async with conn.execute(
+                """SELECT ended - started AS length FROM voiceSessions
+                   WHERE guildId=? AND userId=? AND started >= ? AND started < ? ORDER BY length""",
+                (guildId, userId or 0, since, until),
+            ) as cur:
+                return [row[0] for row in await cur.fetchall()]
+
+    @instrumented
+    async def get_voice_sessions(self, guildId: int, since: float, until: float) -> List[Tuple[int, float, float]]:
+        """(userId, started, ended) of every member's session in a guild that started in [since, until)"""
+        async with self.read() as conn:
+            async with conn.execute(
+                """SELECT userId, started, ended FROM voiceSessions
+                   WHERE guildId=? AND userId != 0 AND started >= ? AND started < ?""",
+                (guildId, since, until),
+            ) as cur:
+                return await cur.fetchall()
 
+    @instrumented
+    async def get_voice_peak(self, guildId: int, sinceDay: int, untilDay: int) -> Tuple[int, Optional[int]]:
+        """the most people in voice at once in a guild over [sinceDay, untilDay), and the day it happened"""
+        async with self.read() as conn:
+            async with conn.execute(
+                "SELECT peak, day FROM voicePeaks WHERE guildId=? AND day >= ? AND day < ? ORDER BY peak DESC LIMIT 1",
+                (guildId, sinceDay, untilDay),
+            ) as cur:
+                row = await cur.fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    @instrumented
+    async def get_voice_name(self, channelId: int, memherId: int) -> Optional[str]:
+        return self.voice_names.get((channelId, memherId))
+
+    @instrumented
     async def save_voice_name(self, channelId: int, memherId: int, name: str):
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            await conn.execute(
-                "REPLACE INTO voiceNames (channelId, userId, name) VALUES (?,?,?)", (channelId, memherId, name)
-            )
-            await conn.commit()
+        await self.queue.submit(
+            "REPLACE INTO voiceNames (channelId, userId, name) VALUES (?,?,?)",
+            (channelId, memherId, name),
+            key=('voiceNames', channelId, memherId),
+        )
+        self.voice_names[(channelId, memherId)] = name
 
+    @instrumented
     async def delete_voice_name(self, channelId: int, memherId: int):
-        async with aiosqlite.connect(self.bot.config.db or 'configs.db') as conn:
-            await conn.execute("DELETE FROM voiceNames WHERE channelId=? AND userId=?", (channelId, memherId))
-            await conn.commit()
+        await self.queue.submit(
+            "DELETE FROM voiceNames WHERE channelId=? AND userId=?",
+            (channelId, memherId),
+            key=('voiceNames', channelId, memherId),
+        )
+        self.voice_names.pop((channelId, memherId), None)
 
 
 async def setup(bot):
@@ -0,0 +1,173 @@
+"""
+shared http sessions for the whole bot.
+
+every cog used to open (and tear down) its own aiohttp session per request, which meant a fresh dns lookup,
+tcp and tls handshake every time. instead the bot owns a few named pools, each one long lived session with
+keep-alive, cached dns, a per-host connection cap, timeouts and a retry policy. cogs ask for a pool by name:
+
+    async with self.bot.http_clients['default'].get(url) as resp:
+        ...
+
+or pass the pool to the get_json / get_text / get_xml helpers in tools, which can also cache responses (see
+responsecache.py). all the pools share one response cache.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, replace
+from typing import AsyncIterator, Dict, FrozenSet, Optional, Union
+
+import aiohttp
+
+from .responsecache import ResponseCache
+
+log = logging.getLogger(__name__)
+
+# only these are retried on their own; anything else might have already done its thing on the other end
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    limit: int = 100  # open connections, across all hosts
+    limit_per_host: int = 10
+    dns_ttl: int = 300  # seconds to cache dns answers
+    keepalive: float = 30  # seconds an idle connection is kept for reuse
+    timeout: float = 30  # for the whole request, in seconds
+    connect_timeout: float = 10
+    retries: int = 2  # extra attempts after the first
+    backoff: float = 0.5  # seconds before the first retry, doubled each time after
+    retry_statuses: FrozenSet[int] = field(default_factory=lambda: frozenset({429, 500, 502, 503, 504}))
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+# pools every cog can count on, before config overrides. anything else asked for gets the default settings.
+DEFAULT_POOLS: Dict[str, PoolConfig] = {
+    'default': PoolConfig(),
+    # home assistant is on the lan and either answers right away or is down
+    'homeassistant': PoolConfig(limit_per_host=4, timeout=10, connect_timeout=3, retries=1),
+    # video sites and their apis (fxtwitter, reddit's json), which can be slow
+    'media': PoolConfig(limit_per_host=4, timeout=60, retries=1, headers={'User-Agent': 'AlexBot:v1.0.0'}),
+}
+
+
+class HTTPPool:
+    """one named, long lived aiohttp session and the retry policy its requests go through."""
+
+    def __init__(self, name: str, config: PoolConfig, cache: Optional[ResponseCache] = None):
+        self.name = name
+        self.config = config
+        self.cache = cache if cache is not None else ResponseCache()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """the underlying session, for things that want one directly (webhooks, streaming)."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.config.limit,
+                limit_per_host=self.config.limit_per_host,
+                ttl_dns_cache=self.config.dns_ttl,
+                keepalive_timeout=self.config.keepalive,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.config.timeout, sock_connect=self.config.connect_timeout),
+                headers=self.config.headers,
+            )
+        return self._session
+
+    def _delay(self, attempt: int, resp: Optional[aiohttp.ClientResponse]) -> float:
+        if resp is not None:
+            try:
+                return min(float(resp.headers['Retry-After']), self.config.timeout)
+            except (KeyError, ValueError):
+                pass
+        return self.config.backoff * 2**attempt
+
+    @asynccontextmanager
+    async def request(
+        self, method: str, url: str, *, retry: Optional[bool] = None, **kwargs
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        like `session.request`, but connection errors, timeouts and retryable statuses are tried again.
+        `retry` defaults to whether the method is idempotent.
+        """
+        attempts = 1 + (
+            self.config.retries if (method.upper() in IDEMPOTENT_METHODS if retry is None else retry) else 0
+        )
+        self.requests += 1
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                resp = await self.session.request(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if last:
+                    self.failures += 1
+                    raise
+                delay = self._delay(attempt, None)
+                log.debug(f"{self.name}: {method} {url} failed ({e!r}), retrying in {delay}s")
+            else:
+                if last or resp.status not in self.config.retry_statuses:
+                    try:
+                        yield resp
+                    finally:
+                        resp.release()
+                    return
+                delay = self._delay(attempt, resp)
+                log.debug(f"{self.name}: {method} {url} got {resp.status}, retrying in {delay}s")
+                resp.release()
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    async def cached_text(self, url: str, ttl: float, **kwargs) -> str:
+        """the body of GET `url`, through the response cache. see ResponseCache.fetch."""
+        return await self.cache.fetch(self, url, ttl, **kwargs)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "retries": self.retries, "failures": self.failures}
+
+
+class HTTPClients:
+    """the bot's http pools, by name. pools are created on first use and live until `close`."""
+
+    def __init__(
+        self, overrides: Optional[Dict[str, Dict[str, Union[int, float]]]] = None, cache_bytes: int = 8 * 1024 * 1024
+    ):
+        self.configs = dict(DEFAULT_POOLS)
+        for name, settings in (overrides or {}).items():
+            self.configs[name] = replace(self.configs.get(name, DEFAULT_POOLS['default']), **settings)
+        self.pools: Dict[str, HTTPPool] = {}
+        self.cache = ResponseCache(cache_bytes)
+
+    def __getitem__(self, name: str) -> HTTPPool:
+        pool = self.pools.get(name)
+        if pool is None:
+            pool = self.pools[name] = HTTPPool(name, self.configs.get(name, self.configs['default']), self.cache)
+        return pool
+
+    @property
+    def default(self) -> HTTPPool:
+        return self['default']
+
+    async def close(self):
+        await asyncio.gather(*(pool.close() for pool in self.pools.values()))
+        self.pools.clear()
+        self.cache.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: pool.stats() for name, pool in self.pools.items()}
@@ -0,0 +1,147 @@
+import datetime
+import sys
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from discord.ext import commands
+
+_F = TypeVar("_F", bound=Callable[..., Awaitable[Any]])
+
+# upper bounds of the latency histogram buckets, in milliseconds. the last bucket is everything slower.
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+# the cog the current task is running for. set by the routers and by Cog's command hooks, or found by calling_cog.
+current_cog: ContextVar[Optional[str]] = ContextVar('current_cog', default=None)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_ms: float = 0
+    max_ms: float = 0
+    rows: int = 0
+    errors: int = 0  # calls that raised or were cancelled
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(BUCKETS_MS) + 1))
+    callers: Counter = field(default_factory=Counter)
+
+    def record(self, ms: float, rows: int, caller: str, failed: bool = False):
+        self.count += 1
+        self.errors += failed
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.rows += rows
+        self.callers[caller] += 1
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0
+
+    def percentile(self, p: float) -> float:
+        """the upper bound of the bucket holding the p-th percentile; max_ms for the overflow bucket."""
+        target = p * self.count
+        seen = 0
+        for i, amount in enumerate(self.buckets):
+            seen += amount
+            if seen >= target and amount:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return 0
+
+
+@dataclass
+class SlowQuery:
+    when: datetime.datetime
+    name: str
+    caller: str
+    ms: float
+    rows: int
+    args: str
+    failed: bool = False
+
+
+class QueryMonitor:
+    """
+    per method latency histograms and a log of slow calls, for the Data cog.
+    """
+
+    def __init__(self, slow_ms: float = 100, slow_log_size: int = 100):
+        self.slow_ms = slow_ms
+        self.stats: Dict[str, QueryStats] = defaultdict(QueryStats)
+        self.slow_log: Deque[SlowQuery] = deque(maxlen=slow_log_size)
+
+    def record(self, name: str, ms: float, rows: int, caller: str, args: tuple, failed: bool = False):
+        self.stats[name].record(ms, rows, caller, failed)
+        if ms >= self.slow_ms:
+            self.slow_log.append(
+                SlowQuery(
+                    datetime.datetime.now(datetime.timezone.utc), name, caller, ms, rows, repr(args)[:100], failed
+                )
+            )
+
+    def reset(self):
+        self.stats.clear()
+        self.slow_log.clear()
+
+
+def calling_cog(owner: type, depth: int = 12) -> str:
+    """
+    the cog this call is made for: `current_cog` if the task has it, else the name of the first cog up the call
+    stack that isn't an `owner`, which is then remembered for the rest of the task. call before the first await,
+    while the awaiting coroutines are still on the stack.
+    """
+    name = current_cog.get()
+    if name is not None:
+        return name
+    frame = sys._getframe(2)
+    for _ in range(depth):
+        if frame is None:
+            break
+        obj = frame.f_locals.get('self')
+        if isinstance(obj, commands.Cog) and not isinstance(obj, owner):
+            current_cog.set(obj.qualified_name)
+            return obj.qualified_name
+        frame = frame.f_back
+    return "unknown"
+
+
+def _count_rows(result: Any) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, (list, tuple, dict)):
+        return len(result)
+    return 1
+
+
+def instrumented(func: _F) -> _F:
+    """
+    time a coroutine method of an object with a `monitor: QueryMonitor`, and record who called it.
+    calls that raise or are cancelled are recorded too, as failed.
+    """
+
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        monitor: Optional[QueryMonitor] = getattr(self, 'monitor', None)
+        if monitor is None:
+            return await func(self, *args, **kwargs)
+        caller = calling_cog(type(self))
+        started = time.perf_counter()
+        result = None
+        failed = True
+        try:
+            result = await func(self, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            monitor.record(func.__name__, ms, _count_rows(result), caller, args, failed)
+
+    return wrapper
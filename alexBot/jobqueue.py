@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Union
+
+log = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """the job queue, or this key's share of it, is full. try again later."""
+
+
+@dataclass(eq=False)
+class Job:
+    key: Hashable
+    run: Callable[[], Awaitable[Any]]
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class FairJobQueue:
+    """
+    a bounded job queue worked by a fixed number of tasks.
+
+    jobs are queued per key (a guild id, usually) and taken round robin between the keys, so one busy guild
+    can't starve the others. `max_pending` bounds the whole queue and `max_per_key` each key's share of it;
+    submitting past either raises QueueFull instead of letting work pile up.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 20, max_per_key: int = 5):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_per_key = max_per_key
+        # keys in the order they get their next turn
+        self.queues: "OrderedDict[Hashable, Deque[Job]]" = OrderedDict()
+        self.pending = 0
+        self.running = 0
+        self._available = asyncio.Semaphore(0)
+        self._tasks: List[asyncio.Task] = []
+
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker(), name=f"job worker {i}") for i in range(self.workers)]
+
+    async def stop(self):
+        """cancel the workers, and anything they're running. queued jobs are dropped."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.queues.clear()
+        self.pending = 0
+
+    def submit(self, key: Hashable, run: Callable[[], Awaitable[Any]]) -> Job:
+        queue = self.queues.get(key)
+        if self.pending >= self.max_pending or (queue is not None and len(queue) >= self.max_per_key):
+            self.rejected += 1
+            raise QueueFull()
+        job = Job(key, run)
+        if queue is None:
+            queue = self.queues[key] = deque()
+        queue.append(job)
+        self.pending += 1
+        self._available.release()
+        return job
+
+    def position(self, job: Job) -> int:
+        """its place in line: 1 if it's next once a worker frees up, 0 if it'll start right away (or has)."""
+        queue = self.queues.get(job.key)
+        if queue is None or job not in queue:
+            return 0
+        index = queue.index(job)
+        ahead = 0
+        before = True  # keys ahead of this one in the rotation get one more turn in than the keys behind it
+        for key, other in self.queues.items():
+            if key == job.key:
+                ahead += index
+                before = False
+            else:
+                ahead += min(len(other), index + 1 if before else index)
+        # idle workers are about to take the jobs at the front
+        return max(0, ahead + 1 - (self.workers - self.running))
+
+    def _next(self) -> Job:
+        key, queue = self.queues.popitem(last=False)
+        job = queue.popleft()
+        if queue:
+            self.queues[key] = queue  # back of the rotation
+        self.pending -= 1
+        return job
+
+    async def _worker(self):
+        while True:
+            await self._available.acquire()
+            job = self._next()
+            self.running += 1
+            self.total_wait += time.monotonic() - job.queued_at
+            try:
+                await job.run()
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                log.exception(e)
+            finally:
+                self.running -= 1
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        started = self.completed + self.failed
+        return {
+            "pending": self.pending,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_s": round(self.total_wait / started, 2) if started else 0.0,
+        }
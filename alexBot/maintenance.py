@@ -0,0 +1,88 @@
+"""
+blocking database maintenance helpers. the Data cog runs these in a worker thread.
+"""
+import datetime
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Union
+
+log = logging.getLogger(__name__)
+
+
+def snapshot(path: str, directory: str, keep: int = 7) -> Path:
+    """
+    copy the live database into `directory` through the sqlite backup API, and delete all but the newest `keep`
+    snapshots. the copy is taken in a single step, which in WAL mode is one read transaction: it sees a consistent
+    state and doesn't block writers. (a step-wise backup would restart every time another connection commits.)
+    """
+    target_dir = Path(directory)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(path).stem
+    target = target_dir / f"{stem}-{datetime.datetime.utcnow():%Y%m%d-%H%M%S}.db"
+    partial = target.with_suffix(".db.partial")
+
+    source = sqlite3.connect(path)
+    try:
+        dest = sqlite3.connect(partial)
+        try:
+            source.backup(dest)
+        finally:
+            dest.close()
+    finally:
+        source.close()
+    os.replace(partial, target)  # only complete snapshots ever have the .db name
+
+    snapshots = sorted(target_dir.glob(f"{stem}-*.db"))
+    for old in snapshots[:-keep] if keep > 0 else []:
+        old.unlink()
+    return target
+
+
+def list_snapshots(path: str, directory: str) -> List[Path]:
+    return sorted(Path(directory).glob(f"{Path(path).stem}-*.db"))
+
+
+def size_report(path: str) -> Dict[str, Union[int, float, str]]:
+    """how big the database is, and how much of it is free pages waiting to be vacuumed."""
+    conn = sqlite3.connect(path)
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        conn.close()
+    wal = Path(f"{path}-wal")
+    return {
+        "size_bytes": page_size * page_count,
+        "free_bytes": page_size * freelist,
+        "fragmentation": round(freelist / page_count, 4) if page_count else 0.0,
+        "wal_bytes": wal.stat().st_size if wal.exists() else 0,
+        "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(auto_vacuum, str(auto_vacuum)),
+    }
+
+
+def compact(path: str, pages: int = 0) -> Dict[str, Union[int, float, str]]:
+    """
+    give free pages back to the filesystem and refresh the query planner's statistics.
+    the first run switches the database to incremental auto vacuum, which needs one full VACUUM. after that, only
+    `pages` free pages (0 for all of them) are released per run.
+    """
+    before = size_report(path)
+    conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            log.info(f"switching {path} to incremental auto vacuum")
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        else:
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    finally:
+        conn.close()
+    after = size_report(path)
+    log.info(f"compacted {path}: {before['size_bytes']} -> {after['size_bytes']} bytes")
+    return after
@@ -0,0 +1,165 @@
+"""
+numbered schema migrations for configs.db. the number of applied migrations is kept in `PRAGMA user_version`.
+add new migrations to the end of MIGRATIONS; never edit or reorder ones that have already shipped.
+"""
+import json
+import logging
+import sqlite3
+from typing import Callable, List
+
+log = logging.getLogger(__name__)
+
+
+def _base_tables(conn: sqlite3.Connection):
+    # guilds and users deliberately stay one json blob per id, unlike the list tables below. they're only ever read
+    # and written whole, by primary key, through Data's cache and the compiled serializer, and never queried by
+    # field; their decoders tolerate missing and unknown keys, so adding a setting needs no migration. typed columns
+    # would mean a migration for every new setting and buy no lookup the primary key doesn't already give.
+    conn.execute("CREATE TABLE IF NOT EXISTS guilds(guildId BIGINT PRIMARY KEY, data STRING)")
+    conn.execute("CREATE TABLE IF NOT EXISTS users(userId BIGINT PRIMARY KEY, data STRING)")
+    conn.execute("CREATE TABLE IF NOT EXISTS rssFeedLastPosted(channelfeed STRING PRIMARY KEY, data STRING)")
+    conn.execute("CREATE TABLE IF NOT EXISTS voiceNames (channelId BIGINT, userId BIGINT, name TEXT)")
+
+
+# tables that used to hold one json blob per row, and the columns they have now
+_TYPED_TABLES = {
+    'buttonRoles': (
+        ['role', 'message', 'type', 'label', 'emoji'],
+        """CREATE TABLE IF NOT EXISTS buttonRoles(id INTEGER PRIMARY KEY,
+                                                  role BIGINT NOT NULL,
+                                                  message BIGINT NOT NULL,
+                                                  type INTEGER NOT NULL,
+                                                  label TEXT,
+                                                  emoji TEXT)""",
+    ),
+    'movieSuggestions': (
+        ['title', 'watched', 'suggestor', 'watchdate'],
+        """CREATE TABLE IF NOT EXISTS movieSuggestions(id INTEGER PRIMARY KEY,
+                                                       title TEXT NOT NULL,
+                                                       watched BOOLEAN NOT NULL DEFAULT 0,
+                                                       suggestor BIGINT NOT NULL,
+                                                       watchdate TEXT NOT NULL DEFAULT '')""",
+    ),
+    'rssFeeds': (
+        ['tagId', 'feedUrl'],
+        """CREATE TABLE IF NOT EXISTS rssFeeds(id INTEGER PRIMARY KEY,
+                                               tagId BIGINT,
+                                               feedUrl TEXT NOT NULL)""",
+    ),
+    'recurringReminders': (
+        ['target', 'message', 'UTC_minute', 'require_clearing'],
+        """CREATE TABLE IF NOT EXISTS recurringReminders(id INTEGER PRIMARY KEY,
+                                                         target BIGINT NOT NULL,
+                                                         message TEXT NOT NULL,
+                                                         UTC_minute INTEGER NOT NULL,
+                                                         require_clearing BOOLEAN NOT NULL DEFAULT 0)""",
+    ),
+}
+
+
+def _typed_list_tables(conn: sqlite3.Connection):
+    for table, (columns, create) in _TYPED_TABLES.items():
+        if [row[1] for row in conn.execute(f"PRAGMA table_info({table})")] != ['data']:
+            # either missing, or already converted by an older setup.py
+            conn.execute(create)
+            continue
+        rows = [json.loads(row[0]) for row in conn.execute(f"SELECT data FROM {table}")]
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(create)
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [[row.get(column) for column in columns] for row in rows],
+        )
+        log.info(f"converted {len(rows)} json rows in {table}")
+
+
+def _indexes(conn: sqlite3.Connection):
+    # voiceNames had no key, so REPLACE never replaced anything. keep the newest name per channel and user.
+    conn.execute(
+        """CREATE TABLE voiceNames_new(channelId BIGINT NOT NULL,
+                                       userId BIGINT NOT NULL,
+                                       name TEXT NOT NULL,
+                                       PRIMARY KEY (channelId, userId))"""
+    )
+    conn.execute(
+        """INSERT INTO voiceNames_new (channelId, userId, name)
+           SELECT channelId, userId, name FROM voiceNames
+           WHERE rowid IN (SELECT MAX(rowid) FROM voiceNames GROUP BY channelId, userId) AND name IS NOT NULL"""
+    )
+    conn.execute("DROP TABLE voiceNames")
+    conn.execute("ALTER TABLE voiceNames_new RENAME TO voiceNames")
+    conn.execute("CREATE INDEX IF NOT EXISTS movieSuggestions_suggestor ON movieSuggestions(suggestor)")
+    conn.execute("CREATE INDEX IF NOT EXISTS recurringReminders_target ON recurringReminders(target)")
+
+
+def _highlights(conn: sqlite3.Connection):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS highlights(id INTEGER PRIMARY KEY,
+                                                 guildId BIGINT NOT NULL,
+                                                 userId BIGINT NOT NULL,
+                                                 keyword TEXT NOT NULL,
+                                                 UNIQUE (guildId, userId, keyword))"""
+    )
+
+
+def _voice_sessions(conn: sqlite3.Connection):
+    # every finished voice session, only ever appended to. userId 0 is the guild's call as a whole.
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS voiceSessions(id INTEGER PRIMARY KEY,
+                                                    guildId BIGINT NOT NULL,
+                                                    userId BIGINT NOT NULL,
+                                                    channelId BIGINT,
+                                                    started REAL NOT NULL,
+                                                    ended REAL NOT NULL)"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS voiceSessions_range ON voiceSessions(guildId, userId, started)")
+    # the same sessions summed per day (unix days, by start time) and channel, kept up to date as they're appended
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS voiceDaily(guildId BIGINT NOT NULL,
+                                                 userId BIGINT NOT NULL,
+                                                 day INTEGER NOT NULL,
+                                                 channelId BIGINT NOT NULL,
+                                                 seconds REAL NOT NULL,
+                                                 sessions INTEGER NOT NULL,
+                                                 longest REAL NOT NULL,
+                                                 PRIMARY KEY (guildId, userId, day, channelId)) WITHOUT ROWID"""
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS voicePeaks(guildId BIGINT NOT NULL,
+                                                 day INTEGER NOT NULL,
+                                                 peak INTEGER NOT NULL,
+                                                 PRIMARY KEY (guildId, day)) WITHOUT ROWID"""
+    )
+
+
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _base_tables,
+    _typed_list_tables,
+    _indexes,
+    _highlights,
+    _voice_sessions,
+]
+
+
+def migrate(path: str) -> int:
+    """
+    apply every migration the database at `path` hasn't seen yet, each in its own transaction.
+    blocking; returns the resulting schema version.
+    """
+    conn = sqlite3.connect(path, isolation_level=None)  # we handle the transactions
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version={number}")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            log.info(f"applied migration {number} ({migration.__name__[1:]}) to {path}")
+            version = number
+        return version
+    finally:
+        conn.close()
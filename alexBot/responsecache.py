@@ -0,0 +1,147 @@
+"""
+an in-memory cache of GET response bodies, for the get_text / get_json / get_xml helpers in tools.
+
+callers opt in per request with a ttl, so each endpoint decides how stale it can be. on top of that:
+ - identical requests in flight at the same time share one fetch (singleflight), even with a ttl of 0.
+ - the cache is bounded by the size of the bodies it holds; the least recently used go first.
+ - responses with an ETag or Last-Modified are kept past their ttl, and revalidated with a conditional
+   request instead of downloaded again. a 304 costs a round trip but no body.
+ - error responses are raised as aiohttp.ClientResponseError and never cached, except that a 5xx while
+   revalidating serves the stale entry instead.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Hashable, Optional, Union
+
+import aiohttp
+
+if TYPE_CHECKING:
+    from alexBot.httpclients import HTTPPool
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    text: str
+    expires: float  # time.monotonic() after which it has to be revalidated
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.text)
+
+    @property
+    def revalidatable(self) -> bool:
+        return self.etag is not None or self.last_modified is not None
+
+
+def request_key(pool: str, url: str, kwargs: dict) -> Hashable:
+    """
+    requests for the same url with the same params and headers, through the same pool, are the same request.
+    pools send different default headers, so the same url through another pool may get a different answer.
+    """
+    return (pool, url, repr(sorted(kwargs.items(), key=lambda item: item[0])))
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self.inflight: Dict[Hashable, asyncio.Task] = {}
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.revalidated = 0
+        self.stale = 0
+
+    async def fetch(self, pool: "HTTPPool", url: str, ttl: float, *, revalidate: bool = True, **kwargs) -> str:
+        """
+        the body of GET `url`, from the cache if it's younger than `ttl` seconds.
+        raises aiohttp.ClientResponseError if the server answers with an error.
+        """
+        key = request_key(pool.name, url, kwargs)
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires > time.monotonic():
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry.text
+
+        task = self.inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self.inflight[key] = asyncio.ensure_future(self._load(pool, key, url, ttl, revalidate, kwargs))
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # one caller giving up shouldn't cancel the fetch for everyone else waiting on it
+        return await asyncio.shield(task)
+
+    async def _load(self, pool: "HTTPPool", key: Hashable, url: str, ttl: float, revalidate: bool, kwargs: dict):
+        entry = self.entries.get(key) if revalidate else None
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            if entry.etag is not None:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified is not None:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        async with pool.get(url, headers=headers, **kwargs) as resp:
+            if resp.status == 304 and entry is not None:
+                self.revalidated += 1
+                entry.expires = time.monotonic() + ttl
+                self.entries.move_to_end(key)
+                return entry.text
+            if resp.status != 200:
+                if resp.status >= 500 and entry is not None:
+                    # the server's having a bad time; what we had is better than nothing
+                    self.stale += 1
+                    log.debug(f"{url} answered {resp.status}, serving the stale copy")
+                    return entry.text
+                # raised rather than returned, so every coalesced waiter sees it as the error it is
+                raise aiohttp.ClientResponseError(
+                    resp.request_info, resp.history, status=resp.status, message=resp.reason, headers=resp.headers
+                )
+            text = await resp.text()
+            etag = resp.headers.get('ETag') if revalidate else None
+            last_modified = resp.headers.get('Last-Modified') if revalidate else None
+
+        new = CachedResponse(text, time.monotonic() + ttl, etag, last_modified)
+        if ttl > 0 or new.revalidatable:
+            self._store(key, new)
+        return text
+
+    def _store(self, key: Hashable, entry: CachedResponse):
+        if entry.size > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old.size
+        self.entries[key] = entry
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted.size
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "revalidated": self.revalidated,
+            "stale": self.stale,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+        }
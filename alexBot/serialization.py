@@ -0,0 +1,126 @@
+"""
+fast (de)serialization of the dataclasses we store as json in the database.
+
+uses orjson when it is installed, and the stdlib json module otherwise. both write plain json, so rows written
+by either (or by the old `json.dumps(dataclasses.asdict(...))` code) can always be read back.
+
+instead of `dataclasses.asdict`, which deep copies everything through a generic recursive walk, each dataclass
+gets an encoder compiled once from its fields. decoders ignore unknown keys and fall back to the field defaults
+for missing ones, so older rows keep loading after fields are added or removed.
+"""
+import dataclasses
+import enum
+import json
+from typing import Any, Callable, Dict, Type, TypeVar, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_T = TypeVar("_T")
+
+_encoders: Dict[type, Callable[[Any], dict]] = {}
+_decoders: Dict[type, Callable[[dict], Any]] = {}
+
+
+def _compile_encoder(cls: type) -> Callable[[Any], dict]:
+    namespace = {}
+    items = []
+    for field in dataclasses.fields(cls):
+        if dataclasses.is_dataclass(field.type):
+            namespace[f"_enc_{field.name}"] = get_encoder(field.type)
+            items.append(f"{field.name!r}: _enc_{field.name}(obj.{field.name})")
+        elif isinstance(field.type, type) and issubclass(field.type, enum.Enum):
+            items.append(f"{field.name!r}: obj.{field.name}.value")
+        else:
+            items.append(f"{field.name!r}: obj.{field.name}")
+    source = f"def encode(obj):\n    return {{{', '.join(items)}}}\n"
+    exec(source, namespace)
+    return namespace["encode"]
+
+
+def _compile_decoder(cls: Type[_T]) -> Callable[[dict], _T]:
+    namespace = {"cls": cls}
+    lines = ["def decode(data):", "    kwargs = {}"]
+    for field in dataclasses.fields(cls):
+        lines.append(f"    if {field.name!r} in data:")
+        if dataclasses.is_dataclass(field.type) or (isinstance(field.type, type) and issubclass(field.type, enum.Enum)):
+            namespace[f"_dec_{field.name}"] = (
+                get_decoder(field.type) if dataclasses.is_dataclass(field.type) else field.type
+            )
+            lines.append(f"        value = data[{field.name!r}]")
+            lines.append(f"        kwargs[{field.name!r}] = None if value is None else _dec_{field.name}(value)")
+        else:
+            lines.append(f"        kwargs[{field.name!r}] = data[{field.name!r}]")
+    lines.append("    return cls(**kwargs)")
+    exec("\n".join(lines) + "\n", namespace)
+    return namespace["decode"]
+
+
+def get_encoder(cls: type) -> Callable[[Any], dict]:
+    """the compiled `obj -> dict` function for a dataclass"""
+    try:
+        return _encoders[cls]
+    except KeyError:
+        encoder = _encoders[cls] = _compile_encoder(cls)
+        return encoder
+
+
+def get_decoder(cls: Type[_T]) -> Callable[[dict], _T]:
+    """the compiled `dict -> obj` function for a dataclass"""
+    try:
+        return _decoders[cls]
+    except KeyError:
+        decoder = _decoders[cls] = _compile_decoder(cls)
+        return decoder
+
+
+if orjson is not None:
+
+    def dumps(obj: Any) -> str:
+        """serialize a stored dataclass to a json string"""
+        return orjson.dumps(obj).decode()
+
+    def _loads(raw: Union[str, bytes]) -> Any:
+        return orjson.loads(raw)
+
+else:
+
+    def dumps(obj: Any) -> str:
+        """serialize a stored dataclass to a json string"""
+        return json.dumps(get_encoder(type(obj))(obj), separators=(',', ':'))
+
+    def _loads(raw: Union[str, bytes]) -> Any:
+        return json.loads(raw)
+
+
+def loads(cls: Type[_T], raw: Union[str, bytes]) -> _T:
+    """parse a json string written by `dumps` (or the old asdict path) back into `cls`"""
+    return get_decoder(cls)(_loads(raw))
+
+
+if __name__ == "__main__":
+    # microbenchmark against the old `json.dumps(asdict(...))` / `from_dict(json.loads(...))` path.
+    # run with `python -m alexBot.serialization`
+    import timeit
+
+    from alexBot.classes import GuildData, UserData
+
+    samples = [GuildData(), UserData()]
+    for sample in samples:
+        cls = type(sample)
+        raw = json.dumps(dataclasses.asdict(sample))
+        results = {
+            "asdict dumps": timeit.timeit(lambda: json.dumps(dataclasses.asdict(sample)), number=20000),
+            "from_dict loads": timeit.timeit(lambda: cls.from_dict(json.loads(raw)), number=20000),
+            "compiled dumps (stdlib)": timeit.timeit(
+                lambda: json.dumps(get_encoder(cls)(sample), separators=(',', ':')), number=20000
+            ),
+            "compiled loads (stdlib)": timeit.timeit(lambda: get_decoder(cls)(json.loads(raw)), number=20000),
+            f"dumps ({'orjson' if orjson else 'stdlib'})": timeit.timeit(lambda: dumps(sample), number=20000),
+            f"loads ({'orjson' if orjson else 'stdlib'})": timeit.timeit(lambda: loads(cls, raw), number=20000),
+        }
+        print(f"{cls.__name__}, 20000 iterations:")
+        for name, seconds in results.items():
+            print(f"  {name:<26} {seconds * 1000:8.1f} ms")
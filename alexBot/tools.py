@@ -1,9 +1,33 @@
+import asyncio
+import dataclasses
 import datetime
+import json
 import math
 import posixpath
 import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
 from functools import wraps
-from typing import TYPE_CHECKING, Callable, Generator, Iterable, Tuple, TypeVar, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    ClassVar,
+    Collection,
+    Dict,
+    FrozenSet,
+    Generator,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 from urllib.parse import urlparse
 
 import discord
@@ -11,6 +35,8 @@ from jishaku.paginators import PaginatorInterface
 from pytz import timezone
 
 if TYPE_CHECKING:
+    from alexBot.classes import GuildData
+    from alexBot.httpclients import HTTPPool
     from bot import Bot
 
 from logging import getLogger
@@ -19,6 +45,8 @@ import aiohttp
 import xmltodict
 from discord.ext import commands
 
+from alexBot.instrumentation import current_cog
+
 log = getLogger(__name__)
 
 _T = TypeVar("_T")
@@ -47,22 +75,305 @@ class Cog(commands.Cog):
     def __init__(self, bot: "Bot"):
         self.bot: "Bot" = bot
 
+    # tell the Data instrumentation which cog a command's database calls are for
+    async def cog_before_invoke(self, ctx: commands.Context):
+        current_cog.set(self.qualified_name)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        current_cog.set(self.qualified_name)
+        return True
+
+
+class RoutedEvent:
+    """
+    the base of what a router hands its handlers. the guild data is fetched at most once per event,
+    by whichever handler asks for it first.
+    """
+
+    __slots__ = ('bot', '_guild_data')
+
+    guild: Optional[discord.Guild]
+
+    def __init__(self, bot: "Bot"):
+        self.bot = bot
+        self._guild_data: Optional[asyncio.Future] = None
+
+    def guild_data(self) -> "Awaitable[GuildData]":
+        if self._guild_data is None:
+            self._guild_data = asyncio.ensure_future(self.bot.db.get_guild_data(self.guild.id))
+        return self._guild_data
+
+
+_E = TypeVar("_E", bound=RoutedEvent)
+IdFilter = Optional[Union[Collection[int], Callable[[Any], Collection[int]]]]
+
+
+@dataclass
+class HandlerFilter(Generic[_E]):
+    """
+    what a handler decorator records about its handler. the fields named in `id_fields` are sets of ids, or functions
+    taking the cog and returning one, which `resolve` turns into frozensets once, when the cog is added.
+    """
+
+    id_fields: ClassVar[Tuple[str, ...]] = ()
+
+    def resolve(self, cog: commands.Cog) -> "HandlerFilter[_E]":
+        resolved = {}
+        for name in self.id_fields:
+            ids = getattr(self, name)
+            if ids is not None:
+                resolved[name] = frozenset(ids(cog) if callable(ids) else ids)
+        return dataclasses.replace(self, **resolved)
+
+    def matches(self, cog: commands.Cog, event: _E) -> bool:
+        raise NotImplementedError
+
+
+@dataclass
+class HandlerRoute(Generic[_E]):
+    cog: commands.Cog
+    callback: Callable[[_E], Awaitable[Any]]
+    filter: HandlerFilter[_E]  # resolved
+    calls: int = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.cog.qualified_name}.{self.callback.__name__}"
+
+
+class HandlerRouter(Generic[_E]):
+    """
+    one listener for every cog. subclasses turn the gateway event into an `_E`, index their routes so an event is only
+    checked against handlers that could match it, and say how to report a failing handler; this does the rest.
+    only matching handlers get a task, and each runs as its cog for the instrumentation.
+    """
+
+    marker: ClassVar[str]  # the attribute the handler decorator sets on the function
+    received_name: ClassVar[str] = "events"  # what the count of events is called in stats
+    task_name: ClassVar[str] = "router"
+
+    def __init__(self, bot: "Bot"):
+        self.bot = bot
+        self.routes: List[HandlerRoute[_E]] = []
+        self.received = 0
+        self.scheduled = 0
+
+    def register(self, cog: commands.Cog):
+        for name in dir(type(cog)):
+            f: Optional[HandlerFilter[_E]] = getattr(getattr(type(cog), name, None), self.marker, None)
+            if f is None:
+                continue
+            route = HandlerRoute(cog, getattr(cog, name), f.resolve(cog))
+            self.routes.append(route)
+            self.index(route)
+
+    def unregister(self, cog: commands.Cog):
+        self.routes = [r for r in self.routes if r.cog is not cog]
+        for index in self.indexes():
+            for key in list(index):
+                index[key] = [r for r in index[key] if r.cog is not cog]
+                if not index[key]:
+                    del index[key]
+
+    def index(self, route: HandlerRoute[_E]):
+        raise NotImplementedError
+
+    def indexes(self) -> Iterable[Dict[Any, List[HandlerRoute[_E]]]]:
+        """every index `index` adds to, for unregister to clean up"""
+        raise NotImplementedError
+
+    def candidates(self, event: _E) -> Iterable[HandlerRoute[_E]]:
+        raise NotImplementedError
+
+    def on_error_args(self, event: _E) -> Tuple[Any, ...]:
+        """the event name and arguments to hand bot.on_error when a handler fails, same as a failing listener"""
+        raise NotImplementedError
+
+    def schedule(self, event: _E) -> _E:
+        self.received += 1
+        for route in self.candidates(event):
+            try:
+                if not route.filter.matches(route.cog, event):
+                    continue
+            except Exception as e:
+                log.exception(e)
+                continue
+            route.calls += 1
+            self.scheduled += 1
+            asyncio.create_task(self._run(route, event), name=f"{self.task_name}: {route.name}")
+        return event
+
+    async def _run(self, route: HandlerRoute[_E], event: _E):
+        current_cog.set(route.cog.qualified_name)
+        try:
+            await route.callback(event)
+        except Exception:
+            await self.bot.on_error(*self.on_error_args(event))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            self.received_name: self.received,
+            "scheduled": self.scheduled,
+            "handlers": {route.name: route.calls for route in self.routes},
+        }
+
+
+class MessageContext(RoutedEvent):
+    """everything the message handlers share about one message"""
+
+    __slots__ = ('message', 'guild', 'channel', 'author', '_content_lower')
+
+    def __init__(self, bot: "Bot", message: discord.Message):
+        super().__init__(bot)
+        self.message = message
+        self.guild: Optional[discord.Guild] = message.guild
+        self.channel = message.channel
+        self.author: Union[discord.User, discord.Member] = message.author
+        self._content_lower: Optional[str] = None
+
+    @property
+    def content_lower(self) -> str:
+        if self._content_lower is None:
+            self._content_lower = self.message.content.lower()
+        return self._content_lower
+
+    @property
+    def is_voice_message(self) -> bool:
+        return self.message.flags.voice and len(self.message.attachments) == 1
+
+
+_Predicate = Callable[[Any, MessageContext], bool]
+
+
+@dataclass
+class MessageFilter(HandlerFilter[MessageContext]):
+    guilds: IdFilter = None
+    channels: IdFilter = None
+    authors: IdFilter = None
+    guild_only: bool = False
+    dm_only: bool = False
+    ignore_bots: bool = False
+    predicate: Optional[_Predicate] = None
+
+    id_fields: ClassVar[Tuple[str, ...]] = ('guilds', 'channels', 'authors')
+
+    def matches(self, cog: commands.Cog, ctx: MessageContext) -> bool:
+        if self.guild_only and ctx.guild is None:
+            return False
+        if self.dm_only and ctx.guild is not None:
+            return False
+        if self.ignore_bots and ctx.author.bot:
+            return False
+        if self.guilds is not None and (ctx.guild is None or ctx.guild.id not in self.guilds):
+            return False
+        if self.channels is not None and ctx.channel.id not in self.channels:
+            return False
+        if self.authors is not None and ctx.author.id not in self.authors:
+            return False
+        return self.predicate is None or self.predicate(cog, ctx)
+
+
+def message_handler(
+    *,
+    guilds: IdFilter = None,
+    channels: IdFilter = None,
+    authors: IdFilter = None,
+    guild_only: bool = False,
+    dm_only: bool = False,
+    ignore_bots: bool = False,
+    predicate: Optional[_Predicate] = None,
+):
+    """
+    mark a cog method `async def handler(self, ctx: MessageContext)` to be called by the bot's MessageRouter.
 
-async def get_text(session: aiohttp.ClientSession, url: str) -> str:
+    guilds, channels and authors are sets of ids the message has to come from, or functions taking the cog and
+    returning one (evaluated once, when the cog is added). predicate(cog, ctx) runs last, and should be cheap.
+    the router never schedules a handler whose filters don't match.
+    """
+
+    def decorator(func: Callable[[Any, MessageContext], Awaitable[Any]]):
+        func.__message_filter__ = MessageFilter(guilds, channels, authors, guild_only, dm_only, ignore_bots, predicate)
+        return func
+
+    return decorator
+
+
+class MessageRouter(HandlerRouter[MessageContext]):
+    """one on_message for every cog. handlers are indexed by the guild and channel ids they filter on."""
+
+    marker = '__message_filter__'
+    received_name = "messages"
+
+    def __init__(self, bot: "Bot"):
+        super().__init__(bot)
+        self.by_guild: Dict[int, List[HandlerRoute[MessageContext]]] = defaultdict(list)
+        self.by_channel: Dict[int, List[HandlerRoute[MessageContext]]] = defaultdict(list)
+        self.unindexed: List[HandlerRoute[MessageContext]] = []
+
+    def index(self, route: HandlerRoute[MessageContext]):
+        f: MessageFilter = route.filter
+        if f.channels is not None:
+            for channel in f.channels:
+                self.by_channel[channel].append(route)
+        elif f.guilds is not None:
+            for guild in f.guilds:
+                self.by_guild[guild].append(route)
+        else:
+            self.unindexed.append(route)
+
+    def indexes(self) -> Iterable[Dict[Any, List[HandlerRoute[MessageContext]]]]:
+        return (self.by_guild, self.by_channel)
+
+    def unregister(self, cog: commands.Cog):
+        super().unregister(cog)
+        self.unindexed = [r for r in self.unindexed if r.cog is not cog]
+
+    def candidates(self, ctx: MessageContext) -> List[HandlerRoute[MessageContext]]:
+        routes = list(self.unindexed)
+        if ctx.guild is not None and ctx.guild.id in self.by_guild:
+            routes += self.by_guild[ctx.guild.id]
+        if ctx.channel.id in self.by_channel:
+            routes += self.by_channel[ctx.channel.id]
+        return routes
+
+    def on_error_args(self, ctx: MessageContext) -> Tuple[Any, ...]:
+        return ('on_message', ctx.message)
+
+    def dispatch(self, message: discord.Message) -> MessageContext:
+        return self.schedule(MessageContext(self.bot, message))
+
+
+# one of the bot's shared pools (bot.http_clients[name]) or a plain session
+Fetcher = Union["HTTPPool", aiohttp.ClientSession]
+
+
+# the get_* helpers take `ttl` to go through the pool's response cache: a response younger than that many seconds is
+# reused, and identical requests in flight at once share one fetch. ttl=0 only shares in flight requests.
+# leave it out (the default) to always fetch. caching needs one of the bot's pools, not a plain session.
+# with a ttl, error statuses raise aiohttp.ClientResponseError instead of handing back the error page.
+
+
+async def get_text(session: Fetcher, url: str, *, ttl: Optional[float] = None, **kwargs) -> str:
     log.debug(f"fetched url: {url}")
-    async with session.get(url) as content:
+    if ttl is not None:
+        return await session.cached_text(url, ttl, **kwargs)
+    async with session.get(url, **kwargs) as content:
         return await content.text()
 
 
-async def get_json(session: aiohttp.ClientSession, url: str, **kwargs) -> dict:
+async def get_json(session: Fetcher, url: str, *, ttl: Optional[float] = None, **kwargs) -> dict:
     log.debug(f"fetched json: {url}")
+    if ttl is not None:
+        return json.loads(await session.cached_text(url, ttl, **kwargs))
     async with session.get(url, **kwargs) as content:
         return await content.json()
 
 
-async def get_xml(session: aiohttp.ClientSession, url: str) -> dict:
+async def get_xml(session: Fetcher, url: str, *, ttl: Optional[float] = None, **kwargs) -> dict:
     log.debug(f"fetched xml: {url}")
-    async with session.get(url) as content:
+    if ttl is not None:
+        return xmltodict.parse(await session.cached_text(url, ttl, **kwargs))
+    async with session.get(url, **kwargs) as content:
         return xmltodict.parse(await content.text())
 
 
@@ -108,6 +419,100 @@ def timing(log=None):
     return inner_function
 
 
+class KeywordMatcher:
+    """
+    an Aho-Corasick automaton over a set of keywords. finds every keyword in a text in one pass over it, so
+    matching costs the same for three keywords or three thousand. case insensitive; matches are returned lowercase.
+    """
+
+    __slots__ = ('goto', 'fail', 'out', 'keywords')
+
+    def __init__(self, keywords: Iterable[str] = ()):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        outs: List[Set[str]] = [set()]
+        self.keywords: FrozenSet[str] = frozenset(word.lower() for word in keywords if word)
+
+        for word in self.keywords:
+            state = 0
+            for char in word:
+                nxt = self.goto[state].get(char)
+                if nxt is None:
+                    nxt = self.goto[state][char] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    outs.append(set())
+                state = nxt
+            outs[state].add(word)
+
+        # breadth first, so a state's fallback (always shallower) is finished before the state itself
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(char, 0) if state else 0
+                outs[nxt] |= outs[self.fail[nxt]]
+        self.out: List[FrozenSet[str]] = [frozenset(o) for o in outs]
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def _states(self, text: str) -> Generator[int, None, None]:
+        goto, fail = self.goto, self.fail
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            yield state
+
+    def find(self, text: str) -> Set[str]:
+        """every keyword that appears in text"""
+        found = set()
+        out = self.out
+        for state in self._states(text):
+            if out[state]:
+                found |= out[state]
+        return found
+
+    def search(self, text: str) -> bool:
+        """whether any keyword appears in text. stops at the first one"""
+        out = self.out
+        return any(out[state] for state in self._states(text))
+
+
+class KeywordSet:
+    """
+    a KeywordMatcher over one or more keyword lists, usually from the config. the automaton is rebuilt when one
+    of the lists is replaced or changes length, which is cheap to check on every message.
+    """
+
+    def __init__(self, *sources: Callable[[], Sequence[str]]):
+        self.sources = sources
+        self._key: Optional[Tuple[Tuple[int, int], ...]] = None
+        self._matcher = KeywordMatcher()
+
+    @property
+    def matcher(self) -> KeywordMatcher:
+        lists = [source() for source in self.sources]
+        key = tuple((id(words), len(words)) for words in lists)
+        if key != self._key:
+            self._matcher = KeywordMatcher(word for words in lists for word in words)
+            self._key = key
+            log.debug(f"rebuilt keyword matcher, {len(self._matcher)} keywords")
+        return self._matcher
+
+    def find(self, text: str) -> Set[str]:
+        return self.matcher.find(text)
+
+    def search(self, text: str) -> bool:
+        return self.matcher.search(text)
+
+
 def grouper(iterable: Iterable[_T], n: int) -> Generator[Iterable[_T], None, None]:
     """
     given a iterable, yield that iterable back in chunks of size n. last item will be any size.
@@ -0,0 +1,131 @@
+"""
+shrinking videos to fit an upload limit with ffmpeg. blocking; Video_DL runs these in its executor.
+
+ffmpeg reads the download where it is and writes the result straight to its destination. the first try is a
+single capped-CRF pass, which is fast and usually looks better than a bitrate target. only if that comes out too
+big do we fall back to a bitrate-targeted two-pass encode, whose first pass writes nothing but its stats.
+"""
+import json
+import logging
+import os
+import subprocess
+from dataclasses import dataclass
+from typing import List, Optional
+
+log = logging.getLogger(__name__)
+
+AUDIO_BITRATE = 64 * 1000  # 64 Kbits
+CONTAINER_OVERHEAD = 0.03  # share of the file that isn't audio or video
+MIN_VIDEO_BITRATE = 100 * 1000  # below this, the video isn't worth watching
+CRF = 26
+PRESET = 'veryfast'
+# codecs discord plays inline; anything else gets re-encoded even if it already fits
+PLAYABLE_VIDEO_CODECS = {'h264'}
+PLAYABLE_AUDIO_CODECS = {'aac', 'mp3'}
+
+
+class TranscodeError(Exception):
+    pass
+
+
+@dataclass
+class Probe:
+    duration: float
+    size: int
+    video_codec: Optional[str]
+    audio_codec: Optional[str]
+    width: int
+    height: int
+
+    @property
+    def playable(self) -> bool:
+        return self.video_codec in PLAYABLE_VIDEO_CODECS and self.audio_codec in (None, *PLAYABLE_AUDIO_CODECS)
+
+
+def probe(path: str) -> Probe:
+    """duration, size and codecs of a video, from one ffprobe call."""
+    try:
+        output = subprocess.run(
+            ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path],
+            check=True,
+            capture_output=True,
+        ).stdout
+    except subprocess.CalledProcessError as e:
+        raise TranscodeError(f"ffprobe failed: {e.stderr.decode(errors='replace').strip()}")
+    data = json.loads(output)
+    video = next((s for s in data.get('streams', []) if s.get('codec_type') == 'video'), {})
+    audio = next((s for s in data.get('streams', []) if s.get('codec_type') == 'audio'), {})
+    try:
+        duration = float(data['format']['duration'])
+    except (KeyError, ValueError):
+        raise TranscodeError("could not find the video's duration")
+    return Probe(
+        duration=duration,
+        size=int(data['format'].get('size') or os.path.getsize(path)),
+        video_codec=video.get('codec_name'),
+        audio_codec=audio.get('codec_name'),
+        width=int(video.get('width') or 0),
+        height=int(video.get('height') or 0),
+    )
+
+
+def video_bitrate(limit: float, duration: float, audio: bool = True) -> int:
+    """the video bitrate that makes `duration` seconds fit in `limit` bytes."""
+    total = limit * 8 * (1 - CONTAINER_OVERHEAD) / max(duration, 1)
+    return int(total - (AUDIO_BITRATE if audio else 0))
+
+
+def scale_filter(bitrate: int, height: int) -> List[str]:
+    """fewer pixels when there are few bits to spend on them."""
+    if bitrate < 600 * 1000:
+        target = 480
+    elif bitrate < 1500 * 1000:
+        target = 720
+    else:
+        return []
+    return ['-vf', f'scale=-2:{target}'] if height > target else []
+
+
+def _ffmpeg(args: List[str]):
+    try:
+        subprocess.run(['ffmpeg', '-hide_banner', '-v', 'error', '-y', *args], check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        raise TranscodeError(f"ffmpeg failed: {e.stderr.decode(errors='replace').strip()[-500:]}")
+
+
+def shrink(source: str, dest: str, limit: float, max_length: Optional[float] = None) -> Probe:
+    """
+    encode `source` into `dest` so it's at most `limit` bytes and plays in discord.
+    returns the probe of the result.
+    """
+    info = probe(source)
+    if max_length is not None and info.duration > max_length:
+        raise TranscodeError(f"video is {info.duration:.0f}s long, the limit is {max_length:.0f}s")
+    has_audio = info.audio_codec is not None
+    bitrate = video_bitrate(limit, info.duration, has_audio)
+    if bitrate < MIN_VIDEO_BITRATE:
+        raise TranscodeError(f"video is too long to fit in {limit:.0f} bytes")
+
+    common = ['-c:v', 'libx264', '-preset', PRESET, '-pix_fmt', 'yuv420p', *scale_filter(bitrate, info.height)]
+    audio = ['-c:a', 'aac', '-b:a', str(AUDIO_BITRATE)] if has_audio else ['-an']
+    output = ['-movflags', '+faststart', dest]
+
+    # single pass, quality based, but capped so it can't go far over the budget
+    _ffmpeg(
+        ['-i', source, *common, '-crf', str(CRF), '-maxrate', str(bitrate), '-bufsize', str(bitrate * 2), *audio]
+        + output
+    )
+    size = os.path.getsize(dest)
+    if size <= limit:
+        log.debug(f"crf pass fit {info.size} bytes into {size}")
+        return probe(dest)
+
+    log.debug(f"crf pass came out at {size} bytes, over {limit:.0f}; encoding in two passes")
+    passlog = os.path.join(os.path.dirname(os.path.abspath(dest)), 'ffmpeg2pass')
+    target = ['-b:v', str(bitrate), '-maxrate', str(bitrate), '-bufsize', str(bitrate * 2)]
+    _ffmpeg(['-i', source, *common, *target, '-pass', '1', '-passlogfile', passlog, '-an', '-f', 'null', os.devnull])
+    _ffmpeg(['-i', source, *common, *target, '-pass', '2', '-passlogfile', passlog, *audio] + output)
+    size = os.path.getsize(dest)
+    if size > limit:
+        raise TranscodeError(f"two pass encode came out at {size} bytes, over {limit:.0f}")
+    return probe(dest)
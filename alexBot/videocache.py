@@ -0,0 +1,250 @@
+"""
+an on-disk cache of the videos Video_DL has downloaded (and shrunk), so a link posted again skips yt-dlp and ffmpeg.
+
+entries are addressed by content keys: the canonical url, and the extractor's own id once we know it, so
+different links to the same video share an entry. each entry also records the upload limit it was shrunk for.
+the cache is bounded by total bytes (least recently used goes first) and by age.
+
+the slow methods (load, put, evict, save) are called from worker threads, so every method takes the cache's lock.
+apart from the initial load, that lock only guards the in-memory index: file moves, deletes and metadata writes
+happen under a second lock the event loop never takes. `get` only notes what it used, leaving the mtime bump that
+keeps the lru order across restarts to evict, and the methods that change an entry leave writing it out to `save`.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Union
+from urllib.parse import parse_qs, urlsplit
+
+log = logging.getLogger(__name__)
+
+
+def canonical_url(url: str) -> str:
+    """
+    the same link, however it was pasted: https, no www. or m., no query string or fragment, no trailing slash.
+    every site Video_DL handles identifies the video in the path; the query is tracking junk.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    for prefix in ('www.', 'm.'):
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+    return f"https://{host}{parts.path.rstrip('/')}"
+
+
+def attachment_expiry(url: str) -> Optional[float]:
+    """when a discord cdn attachment url stops working, from its `ex` parameter (hex unix time)."""
+    try:
+        return int(parse_qs(urlsplit(url).query)['ex'][0], 16)
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+@dataclass
+class CachedVideo:
+    digest: str  # file name in the cache directory
+    keys: List[str]
+    title: str
+    size: int
+    limit: Optional[int]  # the upload limit this was shrunk to fit, None if it's the original download
+    created: float = field(default_factory=time.time)
+    attachment_url: Optional[str] = None  # where we already uploaded it, while that url is valid
+
+    def fits(self, limit: int) -> bool:
+        return self.size <= limit and (self.limit is None or self.limit == limit)
+
+    def reusable_attachment(self, margin: float = 60) -> Optional[str]:
+        if self.attachment_url is None:
+            return None
+        expires = attachment_expiry(self.attachment_url)
+        return self.attachment_url if expires is not None and expires > time.time() + margin else None
+
+
+class VideoCache:
+    def __init__(self, directory: Union[str, Path], max_bytes: int, ttl: float):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: Dict[str, CachedVideo] = {}  # digest: entry
+        self.by_key: Dict[str, List[CachedVideo]] = {}
+        self.last_used: Dict[str, float] = {}
+        self.touched: Set[str] = set()  # used since the last evict, which bumps their files' mtime
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()  # the in-memory index
+        self._files = threading.Lock()  # the files; taken before _lock, never from the event loop
+
+    def _path(self, digest: str, suffix: str = '.mp4') -> Path:
+        return self.directory / f"{digest}{suffix}"
+
+    def _index(self, entry: CachedVideo):
+        self.entries[entry.digest] = entry
+        for key in entry.keys:
+            self.by_key.setdefault(key, []).append(entry)
+
+    def _save(self, entry: CachedVideo, text: Optional[str] = None):
+        tmp = self._path(entry.digest, '.json.tmp')
+        tmp.write_text(text if text is not None else json.dumps(asdict(entry)))
+        os.replace(tmp, self._path(entry.digest, '.json'))
+
+    def load(self):
+        """read the entries already on disk, dropping broken or expired ones."""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for meta in self.directory.glob('*.json'):
+                try:
+                    entry = CachedVideo(**json.loads(meta.read_text()))
+                    video = self._path(entry.digest)
+                    used = video.stat().st_mtime
+                except (OSError, ValueError, TypeError) as e:
+                    log.warning(f"dropping broken video cache entry {meta.name}: {e}")
+                    self._delete(meta.stem)
+                    continue
+                self._index(entry)
+                self.last_used[entry.digest] = used
+        self.evict()
+        log.info(f"video cache has {len(self.entries)} videos, {self.total_bytes} bytes")
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.size for entry in self.entries.values())
+
+    def get(self, keys: Iterable[str], limit: int) -> Optional[CachedVideo]:
+        """a fresh entry under any of `keys` that can be uploaded where the limit is `limit`."""
+        with self._lock:
+            now = time.time()
+            for key in keys:
+                for entry in self.by_key.get(key, ()):
+                    if now - entry.created < self.ttl and entry.fits(limit):
+                        self.hits += 1
+                        self.last_used[entry.digest] = now
+                        self.touched.add(entry.digest)
+                        return entry
+            self.misses += 1
+            return None
+
+    def path(self, entry: CachedVideo) -> Path:
+        return self._path(entry.digest)
+
+    def put(self, keys: List[str], limit: Optional[int], source: Union[str, Path], title: str) -> CachedVideo:
+        """move the finished video at `source` into the cache."""
+        keys = list(dict.fromkeys(keys))
+        digest = hashlib.sha256(f"{keys[0]}\0{limit}".encode()).hexdigest()[:32]
+        # the move may be a copy between filesystems, so do it before taking the lock
+        partial = self._path(digest, f'.{threading.get_ident()}.partial')
+        self.directory.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(source), partial)
+        with self._files:
+            os.replace(partial, self._path(digest))
+            entry = CachedVideo(digest, keys, title, self._path(digest).stat().st_size, limit)
+            self._save(entry)
+            with self._lock:
+                if digest in self.entries:
+                    self._remove(self.entries[digest])
+                self._index(entry)
+                self.last_used[digest] = time.time()
+        self.evict()
+        return entry
+
+    # add_keys, set_attachment and forget_attachment only change the index, so they're fine on the event loop. they
+    # return what changed, for the caller to `save` from a worker thread.
+
+    def add_keys(self, entry: CachedVideo, keys: Iterable[str]) -> List[CachedVideo]:
+        with self._lock:
+            new = [key for key in keys if key not in entry.keys]
+            if not new or self.entries.get(entry.digest) is not entry:
+                return []
+            entry.keys += new
+            for key in new:
+                self.by_key.setdefault(key, []).append(entry)
+            return [entry]
+
+    def set_attachment(self, entry: CachedVideo, url: Optional[str]) -> List[CachedVideo]:
+        with self._lock:
+            if self.entries.get(entry.digest) is not entry:
+                return []
+            entry.attachment_url = url
+            return [entry]
+
+    def forget_attachment(self, url: str) -> List[CachedVideo]:
+        """the upload at `url` was deleted, so it can't be reused."""
+        with self._lock:
+            changed = [entry for entry in self.entries.values() if entry.attachment_url == url]
+            for entry in changed:
+                entry.attachment_url = None
+            return changed
+
+    def save(self, entries: Iterable[CachedVideo]):
+        """write changed entries' metadata to disk. call from a worker thread."""
+        with self._files:
+            for entry in entries:
+                with self._lock:
+                    if self.entries.get(entry.digest) is not entry:
+                        continue  # evicted or replaced since; don't bring its file back
+                    text = json.dumps(asdict(entry))
+                self._save(entry, text)
+
+    def _delete(self, digest: str):
+        for suffix in ('.mp4', '.json'):
+            try:
+                self._path(digest, suffix).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _remove(self, entry: CachedVideo):
+        """drop an entry from the index. its files are left for the caller to delete."""
+        self.entries.pop(entry.digest, None)
+        self.last_used.pop(entry.digest, None)
+        for key in entry.keys:
+            others = [e for e in self.by_key.get(key, []) if e is not entry]
+            if others:
+                self.by_key[key] = others
+            else:
+                self.by_key.pop(key, None)
+        self.touched.discard(entry.digest)
+
+    def evict(self):
+        """
+        drop expired entries, then the least recently used until we're within the byte budget. also saves the lru
+        order to disk, as the mtimes of the videos used since last time. call from a worker thread.
+        """
+        with self._lock:
+            now = time.time()
+            doomed = [e for e in self.entries.values() if now - e.created >= self.ttl]
+            for entry in doomed:
+                self._remove(entry)
+            total = self.total_bytes
+            for digest in sorted(self.entries, key=lambda d: self.last_used.get(d, 0)):
+                if total <= self.max_bytes:
+                    break
+                total -= self.entries[digest].size
+                doomed.append(self.entries[digest])
+                self._remove(self.entries[digest])
+            touched, self.touched = self.touched, set()
+        with self._files:
+            for entry in doomed:
+                # put may have stored the same video again since; its files are the new entry's now
+                if entry.digest not in self.entries:
+                    self._delete(entry.digest)
+            for digest in touched:
+                try:
+                    os.utime(self._path(digest))
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "videos": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,136 @@
+"""
+number crunching over a guild's voice session log, for the voice leaderboard and histogram commands.
+
+sessions are held as numpy columns (who, start, end) rather than a list of objects, so totals, medians and heatmaps
+over tens of thousands of sessions are a handful of array operations. times are unix timestamps, in UTC.
+"""
+import math
+from dataclasses import dataclass
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+# upper edges of the session length histogram's bins, in seconds
+LENGTH_BINS = [5 * 60, 15 * 60, 30 * 60, HOUR, 2 * HOUR, 4 * HOUR, math.inf]
+LENGTH_LABELS = ["<5m", "5-15m", "15-30m", "30-60m", "1-2h", "2-4h", "4h+"]
+SHADES = " ░▒▓█"
+
+
+@dataclass
+class SessionColumns:
+    userId: np.ndarray  # int64, discord ids don't fit in a float
+    started: np.ndarray  # float64
+    ended: np.ndarray  # float64
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Tuple[int, float, float]]) -> "SessionColumns":
+        return cls(
+            np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows)),
+            np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.userId)
+
+    @property
+    def nbytes(self) -> int:
+        return self.userId.nbytes + self.started.nbytes + self.ended.nbytes
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self.ended - self.started
+
+    def append(self, userId: int, started: float, ended: float) -> "SessionColumns":
+        return SessionColumns(
+            np.append(self.userId, np.int64(userId)),
+            np.append(self.started, started),
+            np.append(self.ended, ended),
+        )
+
+
+@dataclass
+class LeaderboardRow:
+    userId: int
+    seconds: float
+    sessions: int
+    median: float
+
+
+def group_medians(groups: np.ndarray, values: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """the median of `values` within each group. `groups` are 0..n-1 and `counts` how many values each has."""
+    ordered = values[np.lexsort((values, groups))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+
+
+def leaderboard(sessions: SessionColumns, n: int = 10) -> List[LeaderboardRow]:
+    """the `n` people with the most time in voice, most first"""
+    if not len(sessions):
+        return []
+    users, groups = np.unique(sessions.userId, return_inverse=True)
+    lengths = sessions.lengths
+    totals = np.bincount(groups, weights=lengths)
+    counts = np.bincount(groups)
+    medians = group_medians(groups, lengths, counts)
+    top = np.argsort(-totals, kind='stable')[:n]
+    return [LeaderboardRow(int(users[i]), float(totals[i]), int(counts[i]), float(medians[i])) for i in top]
+
+
+def time_in_voice(sessions: SessionColumns, boundaries: np.ndarray) -> np.ndarray:
+    """
+    person-seconds spent in voice between each pair of consecutive `boundaries`.
+
+    the running total of time in voice up to t is the sum over sessions started before t of (t - start), minus the
+    same over sessions ended before t. with the starts and ends sorted, both sums come from a binary search and a
+    prefix sum, so this is O((sessions + boundaries) log sessions) and no session is looked at twice.
+    """
+
+    def integral(points: np.ndarray) -> np.ndarray:
+        points = np.sort(points)
+        prefix = np.concatenate(([0.0], np.cumsum(points)))
+        before = np.searchsorted(points, boundaries)
+        return before * boundaries - prefix[before]
+
+    return np.diff(integral(sessions.started) - integral(sessions.ended))
+
+
+def hour_heatmap(sessions: SessionColumns, since: float, until: float) -> np.ndarray:
+    """person-seconds in voice per (weekday, hour of day), as a 7x24 array. weekday 0 is monday."""
+    heat = np.zeros((7, 24))
+    if not len(sessions):
+        return heat
+    boundaries = np.arange(since // HOUR * HOUR, until + HOUR, HOUR, dtype=np.float64)
+    seconds = time_in_voice(sessions, boundaries)
+    hours = boundaries[:-1].astype(np.int64)
+    weekday = (hours // DAY + 3) % 7  # the epoch was a thursday
+    np.add.at(heat, (weekday, hours // HOUR % 24), seconds)
+    return heat
+
+
+def length_histogram(sessions: SessionColumns) -> np.ndarray:
+    """how many sessions fall in each of LENGTH_BINS"""
+    return np.histogram(sessions.lengths, bins=[0, *LENGTH_BINS])[0]
+
+
+def render_heatmap(heat: np.ndarray) -> str:
+    """a 7 row, 24 column block of shades, darker for more time in voice"""
+    top = heat.max()
+    levels = np.zeros(heat.shape, dtype=np.int64) if top <= 0 else np.ceil(heat / top * (len(SHADES) - 1))
+    lines = ["    " + "".join(str(h // 10) if h % 6 == 0 else " " for h in range(24))]
+    lines.append("    " + "".join(str(h % 10) if h % 6 == 0 else " " for h in range(24)))
+    for day, row in zip(WEEKDAYS, levels.astype(np.int64)):
+        lines.append(f"{day} " + "".join(SHADES[level] for level in row))
+    return "\n".join(lines)
+
+
+def render_bars(labels: Iterable[str], counts: Sequence[int], width: int = 20) -> str:
+    labels = list(labels)
+    top = max(max(counts), 1)
+    pad = max(len(label) for label in labels)
+    return "\n".join(
+        f"{label:>{pad}} {'█' * round(count / top * width):<{width}} {count}" for label, count in zip(labels, counts)
+    )
@@ -0,0 +1,223 @@
+"""
+one on_voice_state_update for every cog.
+
+the bot classifies each voice state update once (join, leave, move, or a change in place), keeps the voice
+occupancy index (see voiceoccupancy) up to date from the updates themselves, and hands the resulting VoiceEvent to the
+cog methods marked with `@voice_handler` whose filters match. handlers don't scan member lists or fetch the
+guild's data themselves: the counts are on the event, and the guild data is fetched at most once per event.
+"""
+import enum
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    ClassVar,
+    Collection,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import discord
+from discord.ext import commands
+
+from alexBot.tools import HandlerFilter, HandlerRouter, RoutedEvent, IdFilter, HandlerRoute
+from alexBot.voiceoccupancy import VoiceOccupancy
+
+if TYPE_CHECKING:
+    from bot import Bot
+
+log = logging.getLogger(__name__)
+
+# the parts of a voice state that can change without moving channels
+VOICE_FLAGS = ('self_mute', 'self_deaf', 'mute', 'deaf', 'self_stream', 'self_video', 'suppress')
+
+
+class VoiceEventKind(enum.Enum):
+    JOIN = enum.auto()  # wasn't in voice in this guild, now is
+    LEAVE = enum.auto()  # was in voice, now isn't
+    MOVE = enum.auto()  # from one channel to another
+    UPDATE = enum.auto()  # same channel, something in VOICE_FLAGS changed
+
+
+class VoiceEvent(RoutedEvent):
+    """everything the voice handlers share about one voice state update"""
+
+    __slots__ = (
+        'member',
+        'before',
+        'after',
+        'kind',
+        'changes',
+        'before_humans',
+        'after_humans',
+        'guild_humans',
+    )
+
+    def __init__(
+        self,
+        bot: "Bot",
+        member: discord.Member,
+        before: discord.VoiceState,
+        after: discord.VoiceState,
+        kind: VoiceEventKind,
+        changes: FrozenSet[str],
+        before_humans: int,
+        after_humans: int,
+        guild_humans: int,
+    ):
+        super().__init__(bot)
+        self.member = member
+        self.before = before
+        self.after = after
+        self.kind = kind
+        self.changes = changes  # which of VOICE_FLAGS changed
+        self.before_humans = before_humans  # humans left in the channel they came from, after this update
+        self.after_humans = after_humans  # humans in the channel they're in now, them included
+        self.guild_humans = guild_humans  # humans in any voice channel in the guild, after this update
+
+    @property
+    def guild(self) -> discord.Guild:
+        return self.member.guild
+
+    @property
+    def channel(self) -> Union[discord.VoiceChannel, discord.StageChannel]:
+        """where they are now, or where they were if they left"""
+        return self.after.channel or self.before.channel
+
+    @property
+    def channel_changed(self) -> bool:
+        return self.kind is not VoiceEventKind.UPDATE
+
+    @property
+    def first_in(self) -> bool:
+        """a human arrived in an empty channel"""
+        return (
+            self.channel_changed and self.after.channel is not None and not self.member.bot and self.after_humans == 1
+        )
+
+    @property
+    def last_out(self) -> bool:
+        """the last human left a channel"""
+        return (
+            self.channel_changed and self.before.channel is not None and not self.member.bot and self.before_humans == 0
+        )
+
+    @property
+    def afk_move(self) -> bool:
+        """they went (or were sent) to the guild's afk channel"""
+        return self.channel_changed and self.after.channel is not None and self.after.channel == self.guild.afk_channel
+
+
+_Predicate = Callable[[Any, VoiceEvent], bool]
+
+
+@dataclass
+class VoiceFilter(HandlerFilter[VoiceEvent]):
+    kinds: Optional[Collection[VoiceEventKind]] = None
+    guilds: IdFilter = None
+    ignore_bots: bool = False
+    predicate: Optional[_Predicate] = None
+
+    id_fields: ClassVar[Tuple[str, ...]] = ('guilds',)
+
+    def matches(self, cog: commands.Cog, event: VoiceEvent) -> bool:
+        if self.ignore_bots and event.member.bot:
+            return False
+        if self.guilds is not None and event.guild.id not in self.guilds:
+            return False
+        return self.predicate is None or self.predicate(cog, event)
+
+
+def voice_handler(
+    *,
+    kinds: Optional[Collection[VoiceEventKind]] = None,
+    guilds: IdFilter = None,
+    ignore_bots: bool = False,
+    predicate: Optional[_Predicate] = None,
+):
+    """
+    mark a cog method `async def handler(self, event: VoiceEvent)` to be called by the bot's VoiceEventRouter.
+
+    kinds are the VoiceEventKinds to be called for (all of them by default). guilds is a set of ids, or a function
+    taking the cog and returning one (evaluated once, when the cog is added). predicate(cog, event) runs last,
+    and should be cheap.
+    """
+
+    def decorator(func: Callable[[Any, VoiceEvent], Awaitable[Any]]):
+        func.__voice_filter__ = VoiceFilter(frozenset(kinds) if kinds else None, guilds, ignore_bots, predicate)
+        return func
+
+    return decorator
+
+
+class VoiceEventRouter(HandlerRouter[VoiceEvent]):
+    """
+    classifies voice state updates and fans them out to the `@voice_handler`s, indexed by event kind.
+    the occupancy index is kept from the updates, so no event scans a member list.
+    """
+
+    marker = '__voice_filter__'
+    task_name = "voice router"
+
+    def __init__(self, bot: "Bot"):
+        super().__init__(bot)
+        self.by_kind: Dict[VoiceEventKind, List[HandlerRoute[VoiceEvent]]] = defaultdict(list)
+        self.occupancy = VoiceOccupancy()
+
+    def index(self, route: HandlerRoute[VoiceEvent]):
+        for kind in route.filter.kinds or VoiceEventKind:
+            self.by_kind[kind].append(route)
+
+    def indexes(self) -> Iterable[Dict[Any, List[HandlerRoute[VoiceEvent]]]]:
+        return (self.by_kind,)
+
+    def candidates(self, event: VoiceEvent) -> List[HandlerRoute[VoiceEvent]]:
+        return self.by_kind.get(event.kind, [])
+
+    def on_error_args(self, event: VoiceEvent) -> Tuple[Any, ...]:
+        return ('on_voice_state_update', event.member, event.before, event.after)
+
+    def rebuild(self):
+        """count everyone from scratch. on ready, since updates may have been missed while disconnected."""
+        self.occupancy.rebuild(self.bot.guilds)
+
+    def classify(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState) -> VoiceEvent:
+        """turn an update into a VoiceEvent, updating the counts on the way"""
+        if before.channel is None:
+            kind = VoiceEventKind.JOIN
+        elif after.channel is None:
+            kind = VoiceEventKind.LEAVE
+        elif before.channel != after.channel:
+            kind = VoiceEventKind.MOVE
+        else:
+            kind = VoiceEventKind.UPDATE
+        occupancy = self.occupancy
+        if kind is not VoiceEventKind.UPDATE:
+            occupancy.moved(member, before.channel, after.channel)
+        changes = frozenset(flag for flag in VOICE_FLAGS if getattr(before, flag) != getattr(after, flag))
+        return VoiceEvent(
+            self.bot,
+            member,
+            before,
+            after,
+            kind,
+            changes,
+            occupancy.humans_in(before.channel.id) if before.channel is not None else 0,
+            occupancy.humans_in(after.channel.id) if after.channel is not None else 0,
+            occupancy.humans_in_guild(member.guild.id),
+        )
+
+    def dispatch(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState) -> VoiceEvent:
+        return self.schedule(self.classify(member, before, after))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "occupancy": self.occupancy.stats()}
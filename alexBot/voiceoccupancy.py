@@ -0,0 +1,181 @@
+"""
+who is in which voice channel, kept up to date from voice state and channel events.
+
+everything here is counted as it changes rather than worked out from member lists when asked, so "is anyone in
+voice in this guild", "how many humans are in this channel" and "which channels are empty" are dictionary lookups.
+empty channels are kept per category and per guild, so finding one nearby only looks at the channels that are empty.
+"""
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set, Tuple, Union
+
+import discord
+
+log = logging.getLogger(__name__)
+
+VoiceLike = Union[discord.VoiceChannel, discord.StageChannel]
+# (guild id, category id), category None for channels outside any category
+Place = Tuple[int, Optional[int]]
+
+
+def is_voice(channel) -> bool:
+    return isinstance(channel, (discord.VoiceChannel, discord.StageChannel))
+
+
+class VoiceOccupancy:
+    """the per channel, per guild and per category counts. fed by the VoiceEventRouter and the bot's channel events."""
+
+    def __init__(self):
+        self.where: Dict[int, Place] = {}  # every voice channel we know of
+        self.members: Dict[int, int] = {}  # channel: everyone in it, bots included. only channels with someone in
+        self.humans: Dict[int, int] = {}  # channel: humans in it. only channels with a human in
+        self.busy: Dict[int, Set[int]] = defaultdict(set)  # guild: channels with a human in
+        self.guild_humans: Dict[int, int] = {}  # guild: humans in any of its voice channels
+        # empty channels, by place and by guild
+        self.empty: Dict[Place, Set[int]] = defaultdict(set)
+        self.empty_in_guild: Dict[int, Set[int]] = defaultdict(set)
+
+    def rebuild(self, guilds: Iterable[discord.Guild]):
+        """count everyone from scratch. on ready, since updates may have been missed while disconnected."""
+        for mapping in (self.where, self.members, self.humans, self.busy, self.guild_humans):
+            mapping.clear()
+        self.empty.clear()
+        self.empty_in_guild.clear()
+        for guild in guilds:
+            self.add_guild(guild)
+
+    def add_guild(self, guild: discord.Guild):
+        for channel in (*guild.voice_channels, *guild.stage_channels):
+            if channel.id in self.where:
+                continue  # already counted
+            self.add_channel(channel)
+            for member in channel.members:
+                self._count(member, channel, +1)
+
+    def remove_guild(self, guild: discord.Guild):
+        for channelId, (guildId, _) in list(self.where.items()):
+            if guildId == guild.id:
+                self.remove_channel(channelId)
+        self.busy.pop(guild.id, None)
+        self.guild_humans.pop(guild.id, None)
+        self.empty_in_guild.pop(guild.id, None)
+
+    def add_channel(self, channel: VoiceLike):
+        """start tracking a voice channel. channels come in empty; members are counted as they join."""
+        if channel.id in self.where:
+            return
+        place = self.where[channel.id] = (channel.guild.id, channel.category_id)
+        self.empty[place].add(channel.id)
+        self.empty_in_guild[place[0]].add(channel.id)
+
+    def remove_channel(self, channelId: int):
+        place = self.where.pop(channelId, None)
+        if place is None:
+            return
+        guildId = place[0]
+        self.empty[place].discard(channelId)
+        self.empty_in_guild[guildId].discard(channelId)
+        self.members.pop(channelId, None)
+        humans = self.humans.pop(channelId, 0)
+        if humans:
+            self.busy[guildId].discard(channelId)
+            self._add_guild_humans(guildId, -humans)
+
+    def update_channel(self, channel: VoiceLike):
+        """a channel was edited; follow it if it moved category."""
+        place = self.where.get(channel.id)
+        if place is None:
+            self.add_channel(channel)
+            return
+        new = (channel.guild.id, channel.category_id)
+        if new == place:
+            return
+        self.where[channel.id] = new
+        if channel.id in self.empty[place]:
+            self.empty[place].discard(channel.id)
+            self.empty[new].add(channel.id)
+
+    def moved(self, member: discord.Member, before: Optional[VoiceLike], after: Optional[VoiceLike]):
+        """someone left `before` and/or joined `after`"""
+        if before is not None:
+            self._count(member, before, -1)
+        if after is not None:
+            self._count(member, after, +1)
+
+    def _count(self, member: discord.Member, channel: VoiceLike, delta: int):
+        self.add_channel(channel)
+        place = self.where[channel.id]
+        guildId = place[0]
+
+        members = self.members.get(channel.id, 0) + delta
+        if members > 0:
+            self.members[channel.id] = members
+            self.empty[place].discard(channel.id)
+            self.empty_in_guild[guildId].discard(channel.id)
+        else:
+            self.members.pop(channel.id, None)
+            self.empty[place].add(channel.id)
+            self.empty_in_guild[guildId].add(channel.id)
+
+        if member.bot:
+            return
+        humans = self.humans.get(channel.id, 0) + delta
+        if humans > 0:
+            self.humans[channel.id] = humans
+            self.busy[guildId].add(channel.id)
+        else:
+            self.humans.pop(channel.id, None)
+            self.busy[guildId].discard(channel.id)
+        self._add_guild_humans(guildId, delta)
+
+    def _add_guild_humans(self, guildId: int, delta: int):
+        humans = self.guild_humans.get(guildId, 0) + delta
+        if humans > 0:
+            self.guild_humans[guildId] = humans
+        else:
+            self.guild_humans.pop(guildId, None)
+            self.busy.pop(guildId, None)
+
+    def humans_in(self, channelId: int) -> int:
+        return self.humans.get(channelId, 0)
+
+    def members_in(self, channelId: int) -> int:
+        return self.members.get(channelId, 0)
+
+    def humans_in_guild(self, guildId: int) -> int:
+        return self.guild_humans.get(guildId, 0)
+
+    def anyone_in_voice(self, guildId: int) -> bool:
+        return guildId in self.guild_humans
+
+    def busy_channels(self, guildId: int) -> Set[int]:
+        """the channels in a guild with a human in. don't change the set."""
+        return self.busy.get(guildId, set())
+
+    def find_empty(
+        self, guild: discord.Guild, member: discord.Member, category: Optional[int] = None
+    ) -> Optional[VoiceLike]:
+        """
+        the topmost empty voice channel `member` can see, in `category` if there is one there, else anywhere in the
+        guild, in the order discord shows them. only the empty channels are sorted, and whether one can be seen
+        depends on the member, so that's checked here, stopping at the first match.
+        """
+        candidates = []
+        if category is not None:
+            candidates.append(self.empty.get((guild.id, category), set()))
+        candidates.append(self.empty_in_guild.get(guild.id, set()))
+        for channelIds in candidates:
+            channels = [channel for channel in map(guild.get_channel, channelIds) if channel is not None]
+            channels.sort(key=lambda c: (c.position, c.id))
+            for channel in channels:
+                if channel.permissions_for(member).view_channel:
+                    return channel
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "channels": len(self.where),
+            "occupied": len(self.members),
+            "busy": len(self.humans),
+            "guilds_in_voice": len(self.guild_humans),
+        }
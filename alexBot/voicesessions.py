@@ -0,0 +1,228 @@
+"""
+voice sessions, tracked in memory.
+
+a session is someone (or, for a guild's call as a whole, anyone) being in voice. leaving doesn't end it right away:
+it goes into a grace period, and coming back before that runs out carries on the same session. only when the grace
+period expires is the session finished and handed off to be saved. the grace timers all live on one timer wheel
+ticked by a single task, instead of a sleeping coroutine per leave.
+
+new sessions are handed off too, so their start can be saved: after a restart, `join` (or `reconcile`) can be
+given that saved start to carry on a session that was running before.
+"""
+import asyncio
+import datetime
+import enum
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+# (guild id, user id). user id None is the guild's call as a whole: running while anyone is in any of its channels.
+SessionKey = Tuple[int, Optional[int]]
+
+
+class TimerWheel:
+    """
+    many timers on one task. timers go in one of `slots` buckets by when they're due and the wheel checks one bucket
+    per tick, so scheduling and cancelling are O(1) no matter how many timers are pending.
+    """
+
+    def __init__(self, slots: int = 64, resolution: float = 1.0):
+        self.resolution = resolution
+        self.slots: List[Dict[Hashable, list]] = [{} for _ in range(slots)]  # key: [rounds left, callback]
+        self.where: Dict[Hashable, int] = {}  # key: slot
+        self.tick = 0
+        self._started = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.where
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable[[], None]):
+        """call `callback` in `delay` seconds (rounded up to the next tick). replaces any timer already on `key`."""
+        self.cancel(key)
+        ticks = max(1, math.ceil(delay / self.resolution))
+        slot = (self.tick + ticks) % len(self.slots)
+        self.slots[slot][key] = [(ticks - 1) // len(self.slots), callback]
+        self.where[key] = slot
+
+    def cancel(self, key: Hashable) -> bool:
+        slot = self.where.pop(key, None)
+        if slot is None:
+            return False
+        del self.slots[slot][key]
+        return True
+
+    def advance(self):
+        """move one tick forward and run whatever is due."""
+        self.tick += 1
+        bucket = self.slots[self.tick % len(self.slots)]
+        due = []
+        for key, timer in list(bucket.items()):
+            if timer[0] > 0:
+                timer[0] -= 1
+                continue
+            del bucket[key]
+            del self.where[key]
+            due.append(timer[1])
+        for callback in due:
+            try:
+                callback()
+            except Exception as e:
+                log.exception(e)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.resolution)
+            # catch up on ticks missed to a busy loop, rather than letting every timer drift
+            while self.tick < (time.monotonic() - self._started) / self.resolution:
+                self.advance()
+
+    def start(self):
+        self._started = time.monotonic() - self.tick * self.resolution
+        self._task = asyncio.create_task(self._run(), name="timer wheel")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+class SessionState(enum.Enum):
+    ACTIVE = enum.auto()
+    GRACE = enum.auto()  # left, but may still come back
+
+
+@dataclass
+class VoiceSession:
+    key: SessionKey
+    started: datetime.datetime
+    channelId: Optional[int] = None  # where the session started
+    state: SessionState = SessionState.ACTIVE
+    left: Optional[datetime.datetime] = None  # when they last left, while in the grace period
+
+    @property
+    def guildId(self) -> int:
+        return self.key[0]
+
+    @property
+    def userId(self) -> Optional[int]:
+        return self.key[1]
+
+    @property
+    def duration(self) -> datetime.timedelta:
+        """up to now, or up to when they left if they're in the grace period."""
+        return (self.left or datetime.datetime.now()) - self.started
+
+
+class VoiceSessionTracker:
+    """
+    the live voice sessions, by (guild, user). `join` and `leave` drive each session's state; a new session is passed
+    to `on_started`, and a session whose grace period runs out is removed and passed to `on_finished`, which is
+    where it gets saved.
+    """
+
+    def __init__(
+        self,
+        on_finished: Callable[[VoiceSession], Awaitable[None]],
+        grace: float = 30,
+        on_started: Optional[Callable[[VoiceSession], Awaitable[None]]] = None,
+    ):
+        self.on_finished = on_finished
+        self.on_started = on_started
+        self.grace = grace
+        self.sessions: Dict[SessionKey, VoiceSession] = {}
+        self.wheel = TimerWheel()
+        self._saving: Set[asyncio.Task] = set()
+
+    def get(self, key: SessionKey) -> Optional[VoiceSession]:
+        return self.sessions.get(key)
+
+    def join(
+        self, key: SessionKey, channelId: Optional[int] = None, started: Optional[datetime.datetime] = None
+    ) -> VoiceSession:
+        """`started` carries on a session that began before we were watching (a restart), instead of starting now."""
+        session = self.sessions.get(key)
+        if session is None:
+            session = self.sessions[key] = VoiceSession(key, started or datetime.datetime.now(), channelId)
+            log.debug(f"voice session started: {key}")
+            if self.on_started is not None:
+                self._background(self.on_started(session))
+        elif session.state is SessionState.GRACE:
+            self.wheel.cancel(key)
+            session.state = SessionState.ACTIVE
+            session.left = None
+            log.debug(f"voice session resumed: {key}")
+        return session
+
+    def leave(self, key: SessionKey):
+        session = self.sessions.get(key)
+        if session is None or session.state is SessionState.GRACE:
+            return
+        session.state = SessionState.GRACE
+        session.left = datetime.datetime.now()
+        self.wheel.schedule(key, self.grace, lambda: self._finish(key))
+
+    def reconcile(
+        self, live: Dict[SessionKey, Optional[int]], started: Optional[Dict[SessionKey, datetime.datetime]] = None
+    ):
+        """
+        make the sessions match who's in voice right now (key: channel id): start the missing ones, from `started`
+        where it has them, and let the stale ones lapse.
+        """
+        started = started or {}
+        for key, channelId in live.items():
+            self.join(key, channelId, started.get(key))
+        for key, session in list(self.sessions.items()):
+            if key not in live and session.state is SessionState.ACTIVE:
+                self.leave(key)
+
+    def of_user(self, userId: int) -> Iterator[VoiceSession]:
+        """someone's sessions, in every guild"""
+        return (session for (_, user), session in self.sessions.items() if user == userId)
+
+    def active(self, guildId: int) -> int:
+        """how many people are in a voice session in a guild right now"""
+        return sum(
+            1
+            for (guild, user), session in self.sessions.items()
+            if guild == guildId and user is not None and session.state is SessionState.ACTIVE
+        )
+
+    def _finish(self, key: SessionKey):
+        session = self.sessions.pop(key)
+        log.debug(f"voice session finished: {key}, {session.duration}")
+        self._background(self.on_finished(session))
+
+    def _background(self, coro: Awaitable[None]):
+        task = asyncio.ensure_future(coro)
+        self._saving.add(task)
+        task.add_done_callback(self._saved)
+
+    def _saved(self, task: asyncio.Task):
+        self._saving.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("could not save a voice session", exc_info=task.exception())
+
+    def start(self):
+        self.wheel.start()
+
+    async def stop(self):
+        """
+        stop the timers, finishing the sessions in their grace period now rather than losing them. active sessions
+        are dropped; they're rebuilt from the voice channels and their saved starts on the next start.
+        """
+        await self.wheel.stop()
+        for key, session in list(self.sessions.items()):
+            if session.state is SessionState.GRACE:
+                self._finish(key)
+        if self._saving:
+            await asyncio.gather(*self._saving, return_exceptions=True)
+        self.sessions.clear()
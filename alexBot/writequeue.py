@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncContextManager, Callable, Dict, Hashable, List, Optional, Sequence, Union
+
+import aiosqlite
+
+log = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3  # how many times a background write is tried before it's dropped
+
+
+@dataclass
+class WriteIntent:
+    sql: str
+    # either the parameters, or a function building them when the batch is committed
+    params: Union[Sequence[Any], Callable[[], Sequence[Any]]]
+    waiters: List[asyncio.Future] = field(default_factory=list)
+    on_commit: Optional[Callable[[], None]] = None
+    attempts: int = 0  # failed tries so far
+
+
+class WriteQueue:
+    """
+    collects writes from all over the bot and commits them together (group commit).
+
+    a batch is committed once `batch_size` writes are waiting, or `interval` seconds after the first one arrived,
+    whichever comes first. writes submitted with the same key replace each other while they are still queued,
+    so only the newest one is executed. if a batch fails, its writes are retried one at a time so a bad write only
+    fails itself; a background write that keeps failing is dropped after MAX_ATTEMPTS tries.
+    """
+
+    def __init__(
+        self,
+        transaction: Callable[[], AsyncContextManager[aiosqlite.Connection]],
+        interval: float = 0.05,
+        batch_size: int = 500,
+    ):
+        self.transaction = transaction
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pending: "OrderedDict[Hashable, WriteIntent]" = OrderedDict()
+        self._wake = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.commits = 0
+        self.written = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.last_commit_ms = 0.0
+        self.max_commit_ms = 0.0
+        self.total_commit_ms = 0.0
+        self.max_depth = 0
+
+    def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        stop the background task and commit whatever is still queued. the task is asked to exit rather than
+        cancelled, so a batch it's committing right now finishes first.
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            self._full.set()
+            await self._task
+            self._task = None
+        # failed background writes go back in the queue, so give them the tries they have left
+        for _ in range(MAX_ATTEMPTS):
+            if not self.pending:
+                break
+            await self.commit()
+
+    def submit(
+        self,
+        sql: str,
+        params: Union[Sequence[Any], Callable[[], Sequence[Any]]],
+        key: Optional[Hashable] = None,
+        wait: bool = True,
+        on_commit: Optional[Callable[[], None]] = None,
+    ) -> Optional["asyncio.Future[Optional[int]]"]:
+        """
+        queue a write. when `wait` is true, returns a future resolving to the cursor's lastrowid once the batch
+        holding it is committed (or failing with the batch's exception). `on_commit` is called after the commit.
+        """
+        if key is None:
+            key = object()  # never coalesced
+        intent = WriteIntent(sql, params, on_commit=on_commit)
+        if key in self.pending:
+            intent.waiters = self.pending[key].waiters
+            self.coalesced += 1
+        self.pending[key] = intent
+        future = None
+        if wait:
+            future = asyncio.get_running_loop().create_future()
+            intent.waiters.append(future)
+        self.max_depth = max(self.max_depth, len(self.pending))
+        self._wake.set()
+        if len(self.pending) >= self.batch_size:
+            self._full.set()
+        return future
+
+    async def _run(self):
+        while not self._stopping:
+            await self._wake.wait()
+            try:
+                # let more writes join the batch, unless it's already full
+                await asyncio.wait_for(self._full.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.commit()
+            except Exception as e:
+                log.exception(e)
+
+    async def commit(self):
+        """commit everything queued right now, in one transaction."""
+        self._wake.clear()
+        self._full.clear()
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, OrderedDict()
+        intents = list(batch.values())
+        started = time.perf_counter()
+        try:
+            rowids = await self._execute(intents)
+        except (asyncio.CancelledError, KeyboardInterrupt, SystemExit):
+            # the transaction was rolled back; don't lose the writes with it
+            self._requeue(batch)
+            raise
+        except Exception as e:
+            self.failures += 1
+            if len(batch) == 1:
+                self._failed(*next(iter(batch.items())), e)
+                if self.pending:
+                    self._wake.set()
+            else:
+                log.warning(f"a batch of {len(intents)} writes failed ({e!r}), retrying them one at a time")
+                await self._replay(batch)
+            return
+
+        elapsed = (time.perf_counter() - started) * 1000
+        self.commits += 1
+        self.written += len(intents)
+        self.last_commit_ms = elapsed
+        self.max_commit_ms = max(self.max_commit_ms, elapsed)
+        self.total_commit_ms += elapsed
+        log.debug(f"committed {len(intents)} writes in {elapsed:.1f}ms")
+
+        for intent, rowid in zip(intents, rowids):
+            self._resolve(intent, rowid)
+
+    async def _execute(self, intents: List[WriteIntent]) -> List[Optional[int]]:
+        rowids = []
+        async with self.transaction() as conn:
+            for intent in intents:
+                params = intent.params() if callable(intent.params) else intent.params
+                cursor = await conn.execute(intent.sql, params)
+                rowids.append(cursor.lastrowid)
+        return rowids
+
+    async def _replay(self, batch: "OrderedDict[Hashable, WriteIntent]"):
+        """commit each write of a failed batch in its own transaction, so only the ones that raise fail."""
+        left = OrderedDict(batch)
+        for key, intent in batch.items():
+            try:
+                (rowid,) = await self._execute([intent])
+            except (asyncio.CancelledError, KeyboardInterrupt, SystemExit):
+                self._requeue(left)
+                raise
+            except Exception as e:
+                self._failed(key, intent, e)
+            else:
+                self.written += 1
+                self._resolve(intent, rowid)
+            del left[key]
+        if self.pending:
+            self._wake.set()
+
+    def _requeue(self, batch: "OrderedDict[Hashable, WriteIntent]"):
+        """
+        put writes that never committed back at the front of the queue. a write queued since under the same key
+        is newer and replaces the old one, taking over its waiters.
+        """
+        for key, intent in self.pending.items():
+            if key in batch:
+                intent.waiters = batch[key].waiters + intent.waiters
+            batch[key] = intent
+        self.pending = batch
+        self._wake.set()
+
+    def _failed(self, key: Hashable, intent: WriteIntent, e: Exception):
+        intent.attempts += 1
+        for waiter in intent.waiters:
+            if not waiter.done():
+                waiter.set_exception(e)
+        if intent.waiters:
+            return  # whoever waited on it has the error
+        if intent.attempts >= MAX_ATTEMPTS:
+            log.error(f"dropping a background write after {intent.attempts} tries: {intent.sql}", exc_info=e)
+        else:
+            # nobody will retry a background write, so we do. something newer may have replaced it already.
+            self.pending.setdefault(key, intent)
+
+    @staticmethod
+    def _resolve(intent: WriteIntent, rowid: Optional[int]):
+        if intent.on_commit is not None:
+            intent.on_commit()
+        for waiter in intent.waiters:
+            if not waiter.done():
+                waiter.set_result(rowid)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {
+            "queue_depth": len(self.pending),
+            "max_queue_depth": self.max_depth,
+            "commits": self.commits,
+            "written": self.written,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "last_commit_ms": round(self.last_commit_ms, 2),
+            "avg_commit_ms": round(self.total_commit_ms / self.commits, 2) if self.commits else 0.0,
+            "max_commit_ms": round(self.max_commit_ms, 2),
+        }
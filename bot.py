@@ -8,12 +8,15 @@ import sys
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-import aiohttp
 import discord
 from discord import app_commands
 from discord.ext import commands
 
 import config
+from alexBot.httpclients import HTTPClients
+from alexBot.tools import MessageRouter
+from alexBot.voiceevents import VoiceEventRouter
+from alexBot.voiceoccupancy import is_voice
 
 if TYPE_CHECKING:
     from alexBot.data import Data
@@ -58,7 +61,9 @@ allowed_mentions = discord.AllowedMentions.none()
 class Bot(commands.Bot):
     def __init__(self, **kwargs):
         super().__init__(command_prefix=config.prefix, intents=intents, allowed_mentions=allowed_mentions, **kwargs)
-        self.session = None
+        self.http_clients = HTTPClients(
+            getattr(config, 'http_pools', None), getattr(config, 'http_cache_bytes', 8 * 1024 * 1024)
+        )
         self.config: config = config
         self.location = config.location
         self.db: "Data" = None
@@ -71,12 +76,14 @@ class Bot(commands.Bot):
             name="voice", description="Voice related commands", guild_only=True
         )
         self.tree.add_command(self.voiceCommandsGroup)
+        self.router = MessageRouter(self)
+        self.voice_events = VoiceEventRouter(self)
 
     async def on_ready(self):
         log.info(f'Logged on as {self.user} ({self.user.id})')
         self.owner = (await self.application_info()).owner
         log.info(f'owner is {self.owner} ({self.owner.id})')
-        self.session = aiohttp.ClientSession()
+        self.voice_events.rebuild()
 
     async def cogSetup(self):
         await self.load_extension("alexBot.data")
@@ -90,6 +97,10 @@ class Bot(commands.Bot):
                 log.error(f'Could not load extension {cog} due to {e.__class__.__name__}: {e}')
                 log.exception(e)
 
+    async def close(self):
+        await super().close()
+        await self.http_clients.close()
+
     @staticmethod
     def clean_mentions(content: str) -> str:
         content = content.replace('`', '\'')
@@ -116,12 +127,49 @@ class Bot(commands.Bot):
         content = self.clean_links(content)
         return content
 
+    async def add_cog(self, cog: commands.Cog, /, **kwargs):
+        await super().add_cog(cog, **kwargs)
+        self.router.register(cog)
+        self.voice_events.register(cog)
+
+    async def remove_cog(self, name: str, /, **kwargs):
+        cog = await super().remove_cog(name, **kwargs)
+        if cog is not None:
+            self.router.unregister(cog)
+            self.voice_events.unregister(cog)
+        return cog
+
     async def on_message(self, message: discord.Message):
+        self.router.dispatch(message)
         if message.author.bot:
             return
         else:
             await self.process_commands(message)
 
+    async def on_voice_state_update(
+        self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState
+    ):
+        self.voice_events.dispatch(member, before, after)
+
+    # keep the voice occupancy index's list of channels current; who is in them comes from the voice state updates
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        if is_voice(channel):
+            self.voice_events.occupancy.add_channel(channel)
+
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        if is_voice(channel):
+            self.voice_events.occupancy.remove_channel(channel.id)
+
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        if is_voice(after):
+            self.voice_events.occupancy.update_channel(after)
+
+    async def on_guild_join(self, guild: discord.Guild):
+        self.voice_events.occupancy.add_guild(guild)
+
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.voice_events.occupancy.remove_guild(guild)
+
     async def on_command(self, ctx):
         # thanks dogbot ur a good
         content = ctx.message.content
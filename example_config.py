@@ -74,6 +74,29 @@ listenServers = [272885620769161216]
 listens = ['alex', 'alaska']
 
 db = "configs.db"
+db_readers = 4  # number of pooled read only connections to the database
+db_cache_bytes = 4 * 1024 * 1024  # approximate memory budget for cached guild and user data
+db_commit_interval = 50  # milliseconds to gather writes into one transaction
+db_commit_batch = 500  # commit early once this many writes are waiting
+db_slow_query_ms = 100  # Data calls slower than this are kept in the slow call log
+db_backup_dir = "backups"  # where nightly snapshots of the database go
+db_backup_keep = 7  # how many snapshots to keep
+db_maintenance_hour = 10  # hour (UTC) to snapshot and compact the database, pick a quiet one
+video_download_workers = 2  # videos downloaded at once
+video_encode_workers = 1  # videos transcoded at once
+video_max_queued = 20  # videos waiting for a worker, before new links are turned away
+video_max_queued_per_guild = 5  # same, for each guild
+video_scratch_dir = None  # where each video job gets its own directory, None for the system temp directory
+video_cache_dir = "video_cache"  # downloaded videos are kept here, so links posted again aren't fetched again
+video_cache_bytes = 2 * 1024**3  # the cache drops the least recently used videos past this size
+video_cache_ttl = 7 * 24 * 60 * 60  # and anything older than this, in seconds
+video_reuse_attachments = True  # link our earlier upload of a video instead of uploading it again, while it's valid
+
+# per pool overrides of the shared http clients' settings (see alexBot/httpclients.py for the pools and fields)
+http_pools = {
+    # 'homeassistant': {'timeout': 5, 'retries': 0},
+}
+http_cache_bytes = 8 * 1024 * 1024  # memory for cached api responses, shared by all the pools
 
 neosTZData = r"..\neostz\data.json"
 
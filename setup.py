@@ -1,5 +1,4 @@
 # creates databases in mongodb
-import sqlite3
 import sys
 
 
@@ -31,11 +30,12 @@ for i in [config.token]:
     except AssertionError:
         leave("please fill in the config file.")
 
-cur = sqlite3.connect('configs.db').cursor()
+from alexBot.migrations import migrate
 
-
-# build tables
-with open('schema.sql', 'r') as f:
-    cur.executescript(f.read())
+# build and upgrade tables. the bot also does this on startup.
+# each migration's statements run one at a time inside its own BEGIN IMMEDIATE / COMMIT (not executescript, which
+# commits first and then runs in autocommit), so a failure leaves the database at the last complete version.
+version = migrate(getattr(config, 'db', None) or 'configs.db')
+print(f"database is at schema version {version}")
 
 print("Done!")